@@ -11,6 +11,13 @@ CONFIG_FILE = DATA_DIR / "config.json"
 INSTRUMENTS_FILE = DATA_DIR / "instruments.json"
 MERGED_FILE = DATA_DIR / "merged.json"
 CSV_FILE = DATA_DIR / "inscripciones.csv"
+JOURNAL_FILE = DATA_DIR / "inscripciones.journal"
+SQLITE_FILE = DATA_DIR / "inscripciones.db"
+LOCK_FILE = DATA_DIR / "inscripciones.lock"
+CAMBIOS_FILE = DATA_DIR / "cambios.log"
+SNAPSHOT_FILE = DATA_DIR / "inscripciones.snap"  # registros e índices ya parseados (arranque rápido)
+SHEETS_TOKEN_FILE = DATA_DIR / ".sheets_token.json"  # token de acceso a Google Sheets hasta que vence
+SHEETS_SYNC_FILE = DATA_DIR / ".sheets_sync.json"  # último seq del log de cambios subido a cada hoja
 DATA_DIR = BASE_DIR / "data"
 INSCRIPCIONES_FILE = CSV_FILE
 
@@ -19,6 +26,9 @@ INSCRIPCIONES_FILE = CSV_FILE
 CERTIFICATES_DIR = DATA_DIR / "certificates"
 REPORTS_DIR = DATA_DIR / "reports"
 LOGS_DIR = DATA_DIR / "logs"
+BACKUPS_DIR = DATA_DIR / "backups"
+ARCHIVO_DIR = DATA_DIR / "archivo"  # particiones de ciclos lectivos cerrados
+ANALITICA_DIR = DATA_DIR / "analitica"  # snapshot columnar para estadísticas
 
 # Archivos de configuración (para compatibilidad)
 SMTP_CONFIG_FILE = CONFIG_FILE
@@ -32,6 +42,7 @@ DATA_DIR.mkdir(exist_ok=True)
 CERTIFICATES_DIR.mkdir(exist_ok=True)
 REPORTS_DIR.mkdir(exist_ok=True)
 LOGS_DIR.mkdir(exist_ok=True)
+BACKUPS_DIR.mkdir(exist_ok=True)
 
 
 CSV_FIELDS = [
@@ -44,6 +55,14 @@ CSV_FIELDS = [
     "en_lista_espera"
 ]
 
+# Datos del estudiante (tabla de alumnos, clave dni); el resto de CSV_FIELDS es
+# propio de cada inscripción. El CSV sigue siendo plano (una fila por materia).
+CAMPOS_ALUMNO = [
+    "dni", "nombre", "apellido", "fecha_nacimiento", "edad", "legajo",
+    "direccion", "telefono", "email", "nombre_padre", "nombre_madre",
+    "telefono_emergencia", "saeta", "obra_social", "seguro_escolar"
+]
+
 # Configuración por defecto
 DEFAULT_CONFIG = {
     "app": {
@@ -51,6 +70,13 @@ DEFAULT_CONFIG = {
         "require_seguro_escolar": True,
         "auto_backup": True,
         "backup_interval_days": 7,
+        "backup_retencion": 10,  # snapshots comprimidos a conservar en data/backups
+        "journal_max_entradas": 200,  # operaciones en el journal antes de compactar al CSV
+        "storage_backend": "csv",  # "csv" o "sqlite" (data/inscripciones.db)
+        "lock_timeout_segundos": 10,  # espera máxima por el lock de escritura entre puestos
+        "csv_workers": 0,  # procesos para leer CSV grandes (0 = según CPUs)
+        "csv_paralelo_min_mb": 8,  # tamaño desde el que el CSV se lee en paralelo
+        "ciclo_mes_inicio": 1,  # mes desde el que las inscripciones cuentan para el ciclo siguiente (1 = año calendario)
         "debug": False,
         "auto_refresh": True
     },
@@ -73,7 +99,10 @@ DEFAULT_CONFIG = {
         "auto_sync": True,  # ← Cambiar a True para que sincronice automáticamente
         "has_header_row": False,  # ← SI GOOGLE SHEETS TIENE HEADER EN LA FILA 1, cambiar a True
         "sync_mode": "incremental",  # ← "incremental" o "full" - incremental es más eficiente
-        "sync_window_hours": 24  # ← Ventana de tiempo para sync incremental (horas)
+        "sync_window_hours": 24,  # ← Ventana de tiempo para sync incremental (horas)
+        "token_cache": True,  # ← Guardar el token de acceso en data/.sheets_token.json hasta que vence
+        "metadata_ttl": 300,  # ← Segundos que se reutilizan los títulos/sheetId de las hojas sin consultarlos
+        "verify_mode": "count"  # ← Verificación tras escribir: "off", "count" (solo columna A) o "full" (relee lo escrito)
     },
     "pdf": {
         "logo_path": "",
@@ -0,0 +1,157 @@
+"""
+Particiones por ciclo lectivo.
+
+data/inscripciones.csv es la partición activa (ciclo actual y posteriores, más
+las filas sin fecha). Los ciclos cerrados se mueven con
+csv_handler.archivar_ciclos_anteriores() a data/archivo/inscripciones_<ciclo>.csv.gz,
+que son de solo lectura: guardar, buscar, cupos y la sincronización con Sheets
+trabajan únicamente sobre la partición activa.
+
+El ciclo de una inscripción sale de fecha_inscripcion: el año calendario, o el
+siguiente si la fecha cae desde app.ciclo_mes_inicio en adelante (para
+inscripciones que se abren antes de fin de año).
+
+Las particiones se leen recién cuando se consultan (historial, búsquedas con
+incluir_archivo) y quedan en memoria mientras el archivo no cambie.
+"""
+import csv
+import gzip
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set, Tuple
+
+from config.settings import ARCHIVO_DIR, CSV_FIELDS, settings
+from database.schema import lector_csv
+from models.registro import Registro, parsear_fecha
+
+_PREFIJO = "inscripciones_"
+_SUFIJO = ".csv.gz"
+
+
+def mes_inicio_ciclo() -> int:
+    try:
+        mes = int(settings.get("app.ciclo_mes_inicio", 1) or 1)
+    except (TypeError, ValueError):
+        mes = 1
+    return mes if 1 <= mes <= 12 else 1
+
+
+def ciclo_de_fecha(fecha: datetime) -> int:
+    mes_inicio = mes_inicio_ciclo()
+    return fecha.year + (1 if mes_inicio > 1 and fecha.month >= mes_inicio else 0)
+
+
+def ciclo_de(registro: Mapping[str, Any]) -> Optional[int]:
+    """Ciclo lectivo de una inscripción (None si no tiene fecha válida)."""
+    fecha = registro.fecha if isinstance(registro, Registro) else parsear_fecha(registro.get("fecha_inscripcion"))
+    return ciclo_de_fecha(fecha) if fecha is not None else None
+
+
+def ciclo_actual() -> int:
+    return ciclo_de_fecha(datetime.now())
+
+
+def ruta_particion(ciclo: int) -> Path:
+    return ARCHIVO_DIR / f"{_PREFIJO}{ciclo}{_SUFIJO}"
+
+
+def listar_particiones() -> List[Tuple[int, Path]]:
+    """[(ciclo, ruta)] de las particiones archivadas, de la más vieja a la más nueva."""
+    particiones = []
+    if not ARCHIVO_DIR.exists():
+        return particiones
+    for path in ARCHIVO_DIR.iterdir():
+        nombre = path.name
+        if nombre.startswith(_PREFIJO) and nombre.endswith(_SUFIJO):
+            try:
+                particiones.append((int(nombre[len(_PREFIJO):-len(_SUFIJO)]), path))
+            except ValueError:
+                continue
+    particiones.sort()
+    return particiones
+
+
+class ArchivoCiclos:
+    """Lectura (con cache) y escritura de las particiones de ciclos cerrados."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # ruta -> (firma del archivo, registros, dni -> [registros])
+        self._cache: Dict[Path, Tuple[Tuple[int, int], List[Registro], Dict[str, List[Registro]]]] = {}
+
+    def _cargar(self, path: Path) -> Tuple[List[Registro], Dict[str, List[Registro]]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return [], {}
+        firma = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            previo = self._cache.get(path)
+            if previo is not None and previo[0] == firma:
+                return previo[1], previo[2]
+            registros: List[Registro] = []
+            por_dni: Dict[str, List[Registro]] = {}
+            with gzip.open(path, "rt", encoding="utf-8-sig", newline="") as f:
+                filas, _ = lector_csv(f)
+                for fila in filas:
+                    r = Registro(fila)
+                    registros.append(r)
+                    dni = r.get("dni", "")
+                    if dni:
+                        por_dni.setdefault(dni, []).append(r)
+            self._cache[path] = (firma, registros, por_dni)
+            print(f"[ARCHIVO] Cargados {len(registros)} registros desde {path.name}")
+            return registros, por_dni
+
+    def registros(self, ciclo: int) -> List[Registro]:
+        """Registros archivados de un ciclo (compartidos, no modificar)."""
+        return self._cargar(ruta_particion(ciclo))[0]
+
+    def iter_registros(self) -> Iterator[Registro]:
+        for _, path in listar_particiones():
+            yield from self._cargar(path)[0]
+
+    def por_dni(self, dni: str) -> List[Registro]:
+        resultado: List[Registro] = []
+        for _, path in listar_particiones():
+            resultado.extend(self._cargar(path)[1].get(str(dni), []))
+        return resultado
+
+    def ids(self) -> Set[str]:
+        return {str(r.get("id", "")) for r in self.iter_registros() if r.get("id")}
+
+    def agregar(self, ciclo: int, registros: List[Mapping[str, Any]]) -> int:
+        """
+        Suma registros a la partición de 'ciclo' (reemplazando los de igual id) y
+        la reescribe comprimida de forma atómica. Devuelve el total de la partición.
+        """
+        destino = ruta_particion(ciclo)
+        with self._lock:
+            nuevos = {str(r.get("id", "")) for r in registros}
+            combinados: List[Mapping[str, Any]] = [
+                r for r in self._cargar(destino)[0] if str(r.get("id", "")) not in nuevos
+            ]
+            combinados.extend(registros)
+            ARCHIVO_DIR.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix="tmp_archivo_", dir=str(ARCHIVO_DIR))
+            os.close(fd)
+            try:
+                with gzip.open(tmp_path, "wt", encoding="utf-8", newline="") as f:
+                    writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+                    writer.writeheader()
+                    for r in combinados:
+                        writer.writerow({k: ("" if r.get(k) is None else r.get(k)) for k in CSV_FIELDS})
+                with open(tmp_path, "rb") as f:
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, destino)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._cache.pop(destino, None)
+            return len(combinados)
+
+
+archivo = ArchivoCiclos()
@@ -0,0 +1,236 @@
+"""
+Log de cambios (change data capture) de las inscripciones: data/cambios.log.
+
+Una línea JSON por mutación, con número de secuencia creciente entre procesos:
+    {"seq": 42, "ts": "...", "op": "insert"|"update"|"delete", "id": "...",
+     "campos": {campo: valor_nuevo}}
+En "insert" campos trae los valores no vacíos, en "update" solo los que cambiaron
+y en "delete" queda vacío. A diferencia del journal, este archivo no se compacta:
+los consumidores (sync, contadores, refresco de la UI) guardan el último seq que
+procesaron y piden cambios_desde(seq).
+
+Las secuencias se asignan bajo un lock de archivo (database/file_lock.py), así que
+son únicas y crecientes aunque escriban varios puestos.
+"""
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from database.file_lock import BloqueoArchivo
+
+# una sola instancia por archivo en el proceso (comparten el lock de archivo)
+_instancias: Dict[str, "RegistroCambios"] = {}
+
+
+def obtener_registro_cambios(path, lock_timeout: float = 10.0) -> "RegistroCambios":
+    """Instancia compartida de RegistroCambios para 'path' (la usan ambos backends)."""
+    clave = os.path.abspath(str(path))
+    if clave not in _instancias:
+        _instancias[clave] = RegistroCambios(path, lock_timeout)
+    return _instancias[clave]
+
+
+def diferencias(anterior: Optional[Mapping[str, Any]], nuevo: Mapping[str, Any],
+                campos: Iterable[str]) -> Dict[str, Any]:
+    """Campos de 'nuevo' que difieren de 'anterior' (todos los no vacíos si no hay anterior)."""
+    cambios = {}
+    for campo in campos:
+        valor = "" if nuevo.get(campo) is None else str(nuevo.get(campo))
+        previo = "" if anterior is None or anterior.get(campo) is None else str(anterior.get(campo))
+        if valor != previo:
+            cambios[campo] = valor
+    return cambios
+
+
+def cambio_upsert(anterior: Optional[Mapping[str, Any]], nuevo: Mapping[str, Any],
+                  campos: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """Cambio insert/update que produce guardar 'nuevo' sobre 'anterior' (None si no cambia nada)."""
+    rid = str(nuevo.get("id", "") or "")
+    if not rid:
+        return None
+    difs = diferencias(anterior, nuevo, campos)
+    if anterior is None:
+        return {"op": "insert", "id": rid, "campos": difs}
+    if difs:
+        return {"op": "update", "id": rid, "campos": difs}
+    return None
+
+
+def cambios_por_reemplazo(anteriores: Iterable[Mapping[str, Any]], nuevos: Iterable[Mapping[str, Any]],
+                          campos: List[str]) -> List[Dict[str, Any]]:
+    """Diferencias por id (primera fila de cada id) entre dos listas completas de registros."""
+    def por_id(registros):
+        mapa: Dict[str, Mapping[str, Any]] = {}
+        for r in registros:
+            rid = str(r.get("id", "") or "")
+            if rid and rid not in mapa:
+                mapa[rid] = r
+        return mapa
+
+    previos = por_id(anteriores)
+    siguientes = por_id(nuevos)
+    cambios = [{"op": "delete", "id": rid} for rid in previos if rid not in siguientes]
+    for rid, r in siguientes.items():
+        cambio = cambio_upsert(previos.get(rid), r, campos)
+        if cambio:
+            cambios.append(cambio)
+    return cambios
+
+
+def rebasar(registros: List[Mapping[str, Any]], cambios: Iterable[Mapping[str, Any]],
+             actuales: Mapping[str, Mapping[str, Any]]) -> List[Mapping[str, Any]]:
+    """
+    Reaplica sobre una lista completa armada a partir de un estado anterior
+    (p.ej. la hoja descargada durante una sincronización) los ids tocados por
+    'cambios' posteriores: para esos ids gana la fila de 'actuales' (id -> estado
+    actual), o se quita si ya no existe. Las altas que la lista no tenía van al final.
+    """
+    tocados = {str(c.get("id", "") or "") for c in cambios}
+    tocados.discard("")
+    if not tocados:
+        return list(registros)
+    pendientes = {rid: actuales[rid] for rid in tocados if rid in actuales}
+    resultado: List[Mapping[str, Any]] = []
+    for r in registros:
+        rid = str(r.get("id", "") or "")
+        if rid not in tocados:
+            resultado.append(r)
+        elif rid in pendientes:
+            resultado.append(pendientes.pop(rid))
+    resultado.extend(pendientes.values())
+    return resultado
+
+
+class RegistroCambios:
+    """Archivo de cambios append-only con secuencia monótona y lectura por seq."""
+
+    def __init__(self, path, lock_timeout: float = 10.0):
+        self.path = Path(path)
+        self._bloqueo = BloqueoArchivo(self.path.with_suffix(self.path.suffix + ".lock"), lock_timeout)
+        # (tamaño del archivo, último seq) de la última lectura
+        self._cache = (-1, 0)
+
+    # ---------------- lectura ----------------
+
+    def _ultima_linea_completa(self, f, tam: int) -> bytes:
+        """Última línea terminada en '\n', leyendo el archivo desde el final (una línea cortada se ignora)."""
+        datos = b""
+        pos = tam
+        while pos > 0:
+            inicio = max(0, pos - 4096)
+            f.seek(inicio)
+            datos = f.read(pos - inicio) + datos
+            pos = inicio
+            corte = datos.rfind(b"\n")
+            if corte < 0:
+                continue
+            cuerpo = datos[:corte].rstrip(b"\r\n")
+            previo = cuerpo.rfind(b"\n")
+            if previo >= 0 or pos == 0:
+                return cuerpo[previo + 1:]
+        return b""
+
+    def ultimo_seq(self) -> int:
+        """Secuencia de la última línea escrita (0 si el log está vacío)."""
+        try:
+            tam = os.path.getsize(self.path)
+        except OSError:
+            return 0
+        if tam == self._cache[0]:
+            return self._cache[1]
+        with open(self.path, "rb") as f:
+            linea = self._ultima_linea_completa(f, tam)
+        try:
+            seq = int(json.loads(linea.decode("utf-8")).get("seq", 0)) if linea else 0
+        except Exception:
+            seq = 0
+        self._cache = (tam, seq)
+        return seq
+
+    def _seq_en(self, f, offset: int) -> Optional[int]:
+        """Seq de la primera línea completa que empieza después de 'offset' (o en 0); None al final."""
+        f.seek(offset)
+        if offset:
+            f.readline()  # descartar la línea parcial
+        while True:
+            linea = f.readline()
+            if not linea or not linea.endswith(b"\n"):
+                return None
+            try:
+                return int(json.loads(linea.decode("utf-8"))["seq"])
+            except Exception:
+                continue
+
+    def cambios_desde(self, seq: int, limite: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Cambios con seq > 'seq', en orden. Ubica el punto de partida por búsqueda
+        binaria sobre el archivo (las líneas están ordenadas por seq).
+        """
+        if not self.path.exists():
+            return []
+        resultado: List[Dict[str, Any]] = []
+        with open(self.path, "rb") as f:
+            tam = os.path.getsize(self.path)
+            bajo, alto = 0, tam
+            while bajo < alto:
+                medio = (bajo + alto) // 2
+                s = self._seq_en(f, medio)
+                if s is None or s > seq:
+                    alto = medio
+                else:
+                    bajo = medio + 1
+            f.seek(max(0, bajo - 1))
+            if bajo > 1:
+                f.readline()
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break
+                try:
+                    cambio = json.loads(linea.decode("utf-8"))
+                except Exception:
+                    continue
+                if int(cambio.get("seq", 0)) <= seq:
+                    continue
+                resultado.append(cambio)
+                if limite is not None and len(resultado) >= limite:
+                    break
+        return resultado
+
+    # ---------------- escritura ----------------
+
+    def agregar(self, cambios: List[Dict[str, Any]]) -> int:
+        """
+        Agrega cambios {"op","id","campos"} con seq consecutivos y fsync.
+        Devuelve el último seq asignado.
+        """
+        if not cambios:
+            return self.ultimo_seq()
+        with self._bloqueo:
+            seq = self.ultimo_seq()
+            ts = datetime.now().isoformat()
+            lineas = []
+            for cambio in cambios:
+                seq += 1
+                lineas.append(json.dumps({
+                    "seq": seq,
+                    "ts": ts,
+                    "op": cambio.get("op"),
+                    "id": str(cambio.get("id", "")),
+                    "campos": cambio.get("campos") or {},
+                }, ensure_ascii=False) + "\n")
+            datos = "".join(lineas).encode("utf-8")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                if f.tell() and not self._termina_en_salto():
+                    datos = b"\n" + datos
+                f.write(datos)
+                f.flush()
+                os.fsync(f.fileno())
+            return seq
+
+    def _termina_en_salto(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
@@ -2,66 +2,109 @@
 Handler de CSV con funciones completas y seguras.
 Reemplaza/normaliza las operaciones de carga/guardado de inscripciones.
 """
+import atexit
+import codecs
 import csv
-import tempfile
-import shutil
+import io
+import multiprocessing
 import os
 import traceback
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Iterable
 
-from config.settings import CSV_FILE, CSV_FIELDS, DATA_DIR
+from config.settings import CAMBIOS_FILE, CSV_FILE, CSV_FIELDS, JOURNAL_FILE, LOCK_FILE, SNAPSHOT_FILE, settings
+from database.archivo import archivo, ciclo_actual, ciclo_de
+from database.change_log import obtener_registro_cambios
+from database.record_store import RecordStore, escribir_csv_atomico
+from database.schema import SCHEMA_VERSION, canonizar_encabezado, lector_csv, version_csv, version_encabezado
+from models.registro import Registro
+from services import backup
 
 # Asegurar que el directorio existe
 CSV_FILE.parent.mkdir(parents=True, exist_ok=True)
 
 
-def _guardar_backup_csv(registros: List[Dict[str, Any]]) -> Tuple[bool, str]:
-    """Guarda backup de todos los registros en inscripciones_backup.csv"""
+def _lock_timeout() -> float:
     try:
-        backup_path = DATA_DIR / "inscripciones_backup.csv"
-        with open(backup_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
-            writer.writeheader()
-            for r in registros:
-                # asegurarnos de que todos los valores sean strings
-                row = {k: ("" if r.get(k) is None else r.get(k)) for k in CSV_FIELDS}
-                writer.writerow(row)
-        return True, "Backup guardado"
-    except Exception as e:
-        print(f"[WARN] No se pudo guardar backup: {e}")
-        return False, str(e)
+        return float(settings.get("app.lock_timeout_segundos", 10) or 10)
+    except (TypeError, ValueError):
+        return 10.0
 
 
-def cargar_registros() -> List[Dict[str, Any]]:
-    """Carga todos los registros desde CSV_FILE. Devuelve lista vacía si no existe."""
-    if not CSV_FILE.exists():
-        print(f"[CSV_HANDLER] Archivo {CSV_FILE} no existe, retornando lista vacía")
-        return []
+# Store compartido: todas las lecturas de CSV_FILE se sirven desde memoria y
+# las escrituras individuales van al journal (ver database/record_store.py).
+# Las escrituras toman LOCK_FILE para que varios puestos compartan data/.
+# Cada mutación queda además en CAMBIOS_FILE con su número de secuencia, y el
+# CSV ya parseado se guarda en SNAPSHOT_FILE para arrancar sin re-parsearlo.
+_cambios = obtener_registro_cambios(CAMBIOS_FILE, _lock_timeout())
+_store = RecordStore(CSV_FILE, JOURNAL_FILE, CSV_FIELDS, lock_path=LOCK_FILE, lock_timeout=_lock_timeout(),
+                     cambios=_cambios, migrar_esquema=True, snapshot_path=SNAPSHOT_FILE)
+
+
+def _archivar_journal(datos: bytes) -> None:
+    # el journal compactado se guarda como delta comprimido (services/backup.py)
+    if backup.auto_backup_activo():
+        backup.en_segundo_plano(backup.archivar_delta, datos)
+
+
+_store.al_archivar_journal = _archivar_journal
+
 
-    registros: List[Dict[str, Any]] = []
+def _backend_sqlite():
+    """Devuelve database.sqlite_handler si app.storage_backend == "sqlite", si no None."""
+    if str(settings.get("app.storage_backend", "csv") or "csv").lower() != "sqlite":
+        return None
+    from database import sqlite_handler
+    return sqlite_handler
+
+
+def _es_csv_principal(csv_path: str) -> bool:
     try:
-        with open(CSV_FILE, "r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Normalizar keys (en caso de headers inesperados)
-                registros.append(dict(row))
-        print(f"[CSV_HANDLER] Cargados {len(registros)} registros desde {CSV_FILE}")
-    except Exception as e:
-        print(f"[ERROR] cargar_registros: no se pudo leer {CSV_FILE}: {e}")
-        import traceback
-        traceback.print_exc()
-    return registros
+        return os.path.abspath(csv_path) == os.path.abspath(str(CSV_FILE))
+    except Exception:
+        return False
+
+
+def cargar_registros() -> List[Dict[str, Any]]:
+    """
+    Devuelve todos los registros de CSV_FILE (lista vacía si no existe).
+    Se sirven desde el store en memoria; cada llamador recibe su propia copia.
+    """
+    sql = _backend_sqlite()
+    if sql:
+        return sql.cargar_registros()
+    return [r.a_dict() for r in _store.registros()]
+
+
+def cargar_registros_tipados() -> List[Registro]:
+    """
+    Todos los registros como models.registro.Registro, sin copiarlos: de solo lectura,
+    con anio_num / fecha / en_espera ya parseados. Para recorridos intensivos
+    (cupos, sincronización) donde no hace falta un dict modificable por fila.
+    """
+    sql = _backend_sqlite()
+    if sql:
+        return [Registro(r) for r in sql.iter_registros()]
+    return _store.registros()
 
 
 def guardar_todos_registros(registros: List[Dict[str, Any]], csv_path: Optional[str] = None,
-                            fieldnames: Optional[List[str]] = None) -> Tuple[bool, str]:
+                            fieldnames: Optional[List[str]] = None,
+                            desde_seq: Optional[int] = None) -> Tuple[bool, str]:
     """
     Guarda la lista completa de registros en CSV de forma atómica.
+    desde_seq: ultimo_seq() tomado antes de armar 'registros' (p.ej. al empezar a
+    descargar la hoja en un hilo de sincronización); las altas, cambios y bajas
+    hechas desde entonces en este u otro puesto se conservan en lugar de pisarse.
     Devuelve (ok, mensaje).
     """
     try:
+        sql = _backend_sqlite()
+        if sql and (csv_path is None or _es_csv_principal(csv_path)):
+            return sql.guardar_todos_registros(registros, desde_seq)
+
         if csv_path is None:
             csv_path = str(CSV_FILE.resolve())
 
@@ -73,31 +116,18 @@ def guardar_todos_registros(registros: List[Dict[str, Any]], csv_path: Optional[
 
         print(f"[CSV_HANDLER] Guardando {len(registros)} registros en {csv_path}")
         print(f"[CSV_HANDLER] Campos: {fieldnames}")
-        
-        # Asegurar directorio
-        dirn = os.path.dirname(csv_path) or "."
-        os.makedirs(dirn, exist_ok=True)
-
-        # Escribir a archivo temporal y moverlo (atomic-ish)
-        fd, tmp_path = tempfile.mkstemp(prefix="tmp_inscripciones_", dir=dirn, text=True)
-        os.close(fd)
-        try:
-            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
-                writer.writeheader()
-                for r in registros:
-                    # asegurarnos de que todos los valores sean strings (csv writer espera)
-                    row = {k: ("" if r.get(k) is None else r.get(k)) for k in fieldnames}
-                    writer.writerow(row)
-            shutil.move(tmp_path, csv_path)
+
+        if not _es_csv_principal(csv_path):
+            escribir_csv_atomico(csv_path, registros, fieldnames)
             print(f"[CSV_HANDLER] Guardado exitoso: {csv_path}")
-        finally:
-            # cleanup si queda tmp
-            try:
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-            except Exception:
-                pass
+            return True, "OK"
+
+        # CSV principal: escritura y cache bajo el lock entre puestos
+        _store.escribir_completo(registros, fieldnames, desde_seq)
+        print(f"[CSV_HANDLER] Guardado exitoso: {csv_path}")
+        if backup.auto_backup_activo():
+            # la reescritura ya quedó en el delta archivado ("reemplazo"): snapshot solo si toca
+            backup.en_segundo_plano(backup.snapshot_si_corresponde)
         return True, "OK"
     except Exception as e:
         tb = traceback.format_exc()
@@ -106,15 +136,136 @@ def guardar_todos_registros(registros: List[Dict[str, Any]], csv_path: Optional[
         return False, str(e)
 
 
+def compactar_journal() -> Tuple[bool, str]:
+    """
+    Vuelca el journal al CSV canónico (una reescritura completa); las líneas
+    compactadas se archivan como delta de respaldo en segundo plano.
+    Se llama al superar app.journal_max_entradas y al salir del proceso.
+    """
+    try:
+        if _backend_sqlite() or not _store.pendientes:
+            return True, "Sin cambios pendientes"
+        return _store.compactar()
+    except Exception as e:
+        print(f"[ERROR] compactar_journal: {e}")
+        return False, str(e)
+
+
+def migrar_esquema_csv(csv_path: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Reescribe un CSV con encabezado viejo (domicilio, mail, contacto_tutor, año)
+    en el layout de CSV_FIELDS. El CSV principal se migra solo al cargarlo.
+    """
+    try:
+        csv_path = str(csv_path or CSV_FILE)
+        version = version_csv(csv_path)
+        if version >= SCHEMA_VERSION:
+            return True, "El CSV ya está en el esquema actual"
+        if _es_csv_principal(csv_path):
+            _store.invalidar()
+            _store.registros()
+        else:
+            escribir_csv_atomico(csv_path, list(_leer_csv_en_streaming(csv_path)), CSV_FIELDS)
+        print(f"[CSV_HANDLER] {csv_path} migrado del esquema v{version} al v{SCHEMA_VERSION}")
+        return True, f"Migrado del esquema v{version} al v{SCHEMA_VERSION}"
+    except Exception as e:
+        traceback.print_exc()
+        return False, str(e)
+
+
+def archivar_ciclos_anteriores(hasta_ciclo: Optional[int] = None) -> Tuple[bool, str]:
+    """
+    Mueve las inscripciones de ciclos cerrados (por defecto, anteriores al actual;
+    con hasta_ciclo, hasta ese inclusive) a data/archivo/inscripciones_<ciclo>.csv.gz
+    y las quita de la partición activa. Las filas sin fecha quedan en la activa.
+    Los ids archivados quedan como "delete" en el log de cambios: el push
+    incremental los saca de la hoja, aunque los datos sigan en el archivo.
+    """
+    try:
+        limite = hasta_ciclo + 1 if hasta_ciclo is not None else ciclo_actual()
+
+        def de_ciclo_cerrado(r) -> bool:
+            ciclo = ciclo_de(r)
+            return ciclo is not None and ciclo < limite
+
+        def guardar(seleccion) -> None:
+            por_ciclo: Dict[int, List[Any]] = {}
+            for r in seleccion:
+                por_ciclo.setdefault(ciclo_de(r), []).append(r)
+            for ciclo, registros in sorted(por_ciclo.items()):
+                total = archivo.agregar(ciclo, registros)
+                print(f"[ARCHIVO] Ciclo {ciclo}: {len(registros)} registros archivados ({total} en total)")
+
+        sql = _backend_sqlite()
+        n = sql.extraer(de_ciclo_cerrado, guardar) if sql else _store.extraer(de_ciclo_cerrado, guardar)
+        if not n:
+            return True, "No hay inscripciones de ciclos cerrados"
+        return True, f"Archivadas {n} inscripciones de ciclos anteriores a {limite}"
+    except Exception as e:
+        traceback.print_exc()
+        return False, str(e)
+
+
+def estadisticas_bloqueo() -> Dict[str, Any]:
+    """
+    Contadores del lock de escritura entre puestos en este proceso: adquisiciones,
+    con_espera, timeouts y tiempos de espera/retención (ms).
+    """
+    return _store.bloqueo.estadisticas() if _store.bloqueo is not None else {}
+
+
+def estadisticas_concurrencia() -> Dict[str, Any]:
+    """
+    Contadores del lock de lectores/escritor del store en memoria en este
+    proceso: lecturas, escrituras, cuántas esperaron, tiempos de espera y de
+    retención de escritura (ms) y máximo de lectores simultáneos.
+    """
+    return _store.estadisticas_concurrencia()
+
+
+def ultimo_seq() -> int:
+    """Número de secuencia del último cambio registrado (0 si no hubo cambios)."""
+    return _cambios.ultimo_seq()
+
+
+def obtener_cambios_desde(seq: int, limite: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Cambios posteriores a 'seq', en orden: [{"seq", "ts", "op", "id", "campos"}].
+    op es "insert", "update" (campos = solo los modificados) o "delete".
+    El log es el mismo con ambos backends.
+    """
+    try:
+        return _cambios.cambios_desde(seq, limite)
+    except Exception as e:
+        print(f"[ERROR] obtener_cambios_desde: {e}")
+        return []
+
+
+def _compactar_si_corresponde() -> None:
+    try:
+        limite = int(settings.get("app.journal_max_entradas", 200) or 0)
+    except (TypeError, ValueError):
+        limite = 200
+    if limite and _store.pendientes >= limite:
+        compactar_journal()
+
+
+def _compactar_al_salir() -> None:
+    backup.detener()
+    compactar_journal()
+
+
+atexit.register(_compactar_al_salir)
+
+
 def guardar_registro(registro: Dict[str, Any]) -> Tuple[bool, str]:
     """
     Guarda o actualiza un registro individual.
     - Si 'id' no existe se genera con generar_id(registro)
+    - Se agrega una línea al journal en lugar de reescribir el CSV
     - Devuelve (ok,msg)
     """
     try:
-        registros = cargar_registros()
-
         # Generar id si no existe
         if not registro.get("id"):
             registro["id"] = generar_id(registro)
@@ -123,23 +274,13 @@ def guardar_registro(registro: Dict[str, Any]) -> Tuple[bool, str]:
         if not registro.get("fecha_inscripcion"):
             registro["fecha_inscripcion"] = datetime.now().isoformat()
 
-        # Buscar por id y reemplazar si existe
-        encontrado = False
-        for i, r in enumerate(registros):
-            if str(r.get("id", "")) == str(registro.get("id", "")):
-                registros[i] = registro
-                encontrado = True
-                break
-        if not encontrado:
-            registros.append(registro)
-
-        ok, msg = guardar_todos_registros(registros)
-        
-        # Guardar backup automático (no debe fallar la operación principal)
-        if ok:
-            _guardar_backup_csv(registros)
-        
-        return ok, msg
+        sql = _backend_sqlite()
+        if sql:
+            return sql.guardar_registro(registro)
+
+        _store.upsert(registro)
+        _compactar_si_corresponde()
+        return True, "OK"
     except Exception as e:
         return False, f"Error al guardar registro: {e}"
 
@@ -163,29 +304,27 @@ def generar_id(registro: Optional[Dict[str, Any]] = None) -> str:
 
 def actualizar_registro(datos: Dict[str, Any]) -> Tuple[bool, str]:
     """
-    Actualiza un registro existente por 'id'. Lanza ValueError si no existe id.
+    Actualiza un registro existente por 'id'.
     Devuelve (ok,msg).
     """
     try:
-        registros = cargar_registros()
+        sql = _backend_sqlite()
+        if sql:
+            return sql.actualizar_registro(datos)
+
         reg_id = datos.get("id")
         if not reg_id:
             return False, "El registro debe incluir 'id' para actualizar"
 
-        encontrado = False
-        for i, r in enumerate(registros):
-            if str(r.get("id", "")) == str(reg_id):
-                # Mantener columnas según CSV_FIELDS (si existen)
-                actualizado = {k: datos.get(k, r.get(k, "")) for k in (CSV_FIELDS or list(datos.keys()))}
-                registros[i] = actualizado
-                encontrado = True
-                break
-
-        if not encontrado:
+        r = _store.obtener(reg_id)
+        if r is None:
             return False, f"Registro con id '{reg_id}' no encontrado"
 
-        ok, msg = guardar_todos_registros(registros)
-        return ok, msg
+        # Mantener columnas según CSV_FIELDS (si existen)
+        actualizado = {k: datos.get(k, r.get(k, "")) for k in (CSV_FIELDS or list(datos.keys()))}
+        _store.upsert(actualizado)
+        _compactar_si_corresponde()
+        return True, "OK"
     except Exception as e:
         return False, str(e)
 
@@ -195,71 +334,374 @@ def eliminar_registro(reg_id: str) -> Tuple[bool, str]:
     Elimina un registro por ID. Devuelve (ok,msg).
     """
     try:
-        registros = cargar_registros()
-        registros_filtrados = [r for r in registros if str(r.get("id", "")) != str(reg_id)]
-        if len(registros_filtrados) == len(registros):
+        sql = _backend_sqlite()
+        if sql:
+            return sql.eliminar_registro(reg_id)
+
+        if not _store.eliminar(reg_id):
             return False, f"Registro con id '{reg_id}' no encontrado"
-        ok, msg = guardar_todos_registros(registros_filtrados)
-        return ok, msg
+        _compactar_si_corresponde()
+        return True, "OK"
+    except Exception as e:
+        return False, str(e)
+
+
+def guardar_registros_lote(registros: List[Dict[str, Any]]) -> Tuple[bool, str]:
+    """
+    Guarda o actualiza varios registros en una sola operación atómica
+    (una línea de journal / una transacción). Completa id y fecha como guardar_registro.
+    """
+    try:
+        for registro in registros:
+            if not registro.get("id"):
+                registro["id"] = generar_id(registro)
+            if not registro.get("fecha_inscripcion"):
+                registro["fecha_inscripcion"] = datetime.now().isoformat()
+
+        sql = _backend_sqlite()
+        if sql:
+            return sql.guardar_registros_lote(registros)
+
+        _store.upsert_lote(registros)
+        _compactar_si_corresponde()
+        return True, f"Guardados {len(registros)} registros"
+    except Exception as e:
+        return False, f"Error al guardar lote: {e}"
+
+
+def actualizar_registros_lote(lista_datos: List[Dict[str, Any]]) -> Tuple[bool, str]:
+    """
+    Actualiza varios registros existentes (cada uno con 'id') de una sola vez.
+    Si algún id no existe no se aplica ningún cambio.
+    """
+    try:
+        sql = _backend_sqlite()
+        if sql:
+            return sql.actualizar_registros_lote(lista_datos)
+
+        actualizados = []
+        faltantes = []
+        for datos in lista_datos:
+            reg_id = datos.get("id")
+            r = _store.obtener(reg_id) if reg_id else None
+            if r is None:
+                faltantes.append(str(reg_id or ""))
+                continue
+            actualizados.append({k: datos.get(k, r.get(k, "")) for k in (CSV_FIELDS or list(datos.keys()))})
+        if faltantes:
+            return False, f"Registros no encontrados: {', '.join(faltantes[:5])}"
+
+        _store.upsert_lote(actualizados)
+        _compactar_si_corresponde()
+        return True, f"Actualizados {len(actualizados)} registros"
+    except Exception as e:
+        return False, str(e)
+
+
+def eliminar_registros_lote(ids: List[str]) -> Tuple[bool, str]:
+    """
+    Elimina todos los registros cuyos ids (exactos) estén en 'ids', con una sola escritura.
+    """
+    try:
+        sql = _backend_sqlite()
+        if sql:
+            return sql.eliminar_registros_lote(ids)
+
+        n = _store.eliminar_lote([i for i in ids if i])
+        if not n:
+            return False, "Ningún registro encontrado para eliminar"
+        _compactar_si_corresponde()
+        return True, f"Eliminados {n} registros"
     except Exception as e:
         return False, str(e)
 
 
 def buscar_por_dni(dni: str) -> List[Dict[str, Any]]:
-    registros = cargar_registros()
-    return [r for r in registros if str(r.get("dni", "")) == str(dni)]
+    sql = _backend_sqlite()
+    if sql:
+        return sql.buscar_por_dni(dni)
+    return [r.a_dict() for r in _store.por_dni(dni)]
+
+
+def obtener_alumno(dni: str, incluir_archivo: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Datos del estudiante (CAMPOS_ALUMNO) por DNI, para autocompletar una
+    reinscripción: búsqueda por índice en la tabla de alumnos. Con
+    incluir_archivo, si no tiene inscripciones activas se buscan en los ciclos
+    archivados (la más reciente). None si el DNI no aparece.
+    """
+    dni = str(dni or "").strip()
+    if not dni:
+        return None
+    sql = _backend_sqlite()
+    alumno = sql.obtener_alumno(dni) if sql else _store.alumno(dni)
+    if alumno is None and incluir_archivo:
+        archivados = archivo.por_dni(dni)
+        if archivados:
+            ultimo = max(archivados, key=lambda r: r.get("fecha_inscripcion", ""))
+            alumno = ultimo.datos_alumno()
+    return alumno
+
+
+def actualizar_alumno(dni: str, datos: Dict[str, Any]) -> Tuple[bool, str]:
+    """
+    Cambia los datos del estudiante (campos de CAMPOS_ALUMNO en 'datos', salvo
+    el dni) en todas sus inscripciones activas con una sola escritura.
+    Devuelve (ok, mensaje).
+    """
+    try:
+        dni = str(dni or "").strip()
+        if not dni:
+            return False, "DNI vacío"
+        sql = _backend_sqlite()
+        n = sql.actualizar_alumno(dni, datos) if sql else _store.actualizar_alumno(dni, datos)
+        if not n:
+            return False, f"No hay inscripciones con DNI '{dni}'"
+        if not sql:
+            _compactar_si_corresponde()
+        return True, f"Actualizadas {n} inscripciones"
+    except Exception as e:
+        return False, str(e)
 
 
 def buscar_por_id(reg_id: str) -> Optional[Dict[str, Any]]:
-    registros = cargar_registros()
-    for r in registros:
-        if str(r.get("id", "")) == str(reg_id):
-            return r
-    return None
+    sql = _backend_sqlite()
+    if sql:
+        return sql.buscar_por_id(reg_id)
+    r = _store.obtener(reg_id)
+    return r.a_dict() if r is not None else None
+
+
+def buscar_ids_por_prefijo(prefijo: str, limite: Optional[int] = None) -> List[str]:
+    """Ids distintos que empiezan con 'prefijo' (índice ordenado, búsqueda binaria)."""
+    sql = _backend_sqlite()
+    if sql:
+        return sql.ids_con_prefijo(prefijo, limite)
+    return _store.ids_con_prefijo(prefijo, limite)
+
+
+def resolver_id(id_o_prefijo: str) -> Tuple[bool, str]:
+    """
+    Resuelve un ID completo o truncado (como el que muestra la tabla).
+    Devuelve (True, id_completo) o (False, mensaje) si no existe o el prefijo es ambiguo.
+    """
+    id_o_prefijo = str(id_o_prefijo or "").strip()
+    if not id_o_prefijo:
+        return False, "ID vacío"
+    candidatos = buscar_ids_por_prefijo(id_o_prefijo, limite=2)
+    if not candidatos:
+        return False, f"No se encontró ningún registro con ID '{id_o_prefijo}'"
+    # en orden, el id exacto (si existe) es siempre el primero con ese prefijo
+    if candidatos[0] == id_o_prefijo or len(candidatos) == 1:
+        return True, candidatos[0]
+    return False, f"El ID '{id_o_prefijo}' es ambiguo: coincide con varios registros"
 
 
 def contar_inscripciones_materia(materia: str, profesor: Optional[str] = None,
                                  comision: Optional[str] = None) -> int:
-    registros = cargar_registros()
-    count = 0
-    for r in registros:
-        if r.get("materia") != materia:
-            continue
-        if profesor and r.get("profesor") != profesor:
-            continue
-        if comision and r.get("comision") != comision:
-            continue
-        if r.get("en_lista_espera", "No") == "Sí":
-            continue
-        count += 1
-    return count
+    sql = _backend_sqlite()
+    if sql:
+        return sql.contar_inscripciones_materia(materia, profesor, comision)
+    return _store.contar(materia, profesor, comision)
 
 
 def obtener_historial_alumno(dni: str) -> List[Dict[str, Any]]:
-    registros = cargar_registros()
-    historial = [r for r in registros if str(r.get("dni", "")) == str(dni)]
+    """Inscripciones del alumno en todos los ciclos (partición activa y archivadas)."""
+    historial = buscar_por_dni(dni)
+    vistos = {str(r.get("id", "")) for r in historial}
+    for r in archivo.por_dni(dni):
+        if str(r.get("id", "")) not in vistos:
+            historial.append(r.a_dict())
     historial.sort(key=lambda x: x.get("fecha_inscripcion", ""), reverse=True)
     return historial
 
 
+def _preparar_filtros(filtros: Optional[Dict[str, Any]]) -> List[Tuple[str, frozenset]]:
+    """
+    Normaliza filtros {campo: valor} a [(campo, valores_aceptados)].
+    Un valor lista/tupla/set acepta cualquiera de sus elementos; None se ignora.
+    """
+    condiciones = []
+    for campo, valor in (filtros or {}).items():
+        if valor is None:
+            continue
+        if isinstance(valor, (list, tuple, set, frozenset)):
+            aceptados = frozenset("" if v is None else str(v) for v in valor)
+        else:
+            aceptados = frozenset([str(valor)])
+        condiciones.append((campo, aceptados))
+    return condiciones
+
+
+def _cumple(registro: Dict[str, Any], condiciones: List[Tuple[str, frozenset]]) -> bool:
+    for campo, aceptados in condiciones:
+        valor = registro.get(campo)
+        if ("" if valor is None else str(valor)) not in aceptados:
+            return False
+    return True
+
+
+def _leer_csv_en_streaming(csv_path: str) -> Iterator[Dict[str, Any]]:
+    """Lee el CSV fila a fila sin cargarlo completo (con las claves canónicas)."""
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        filas, _ = lector_csv(f)
+        yield from filas
+
+
+# ---------------- carga en paralelo ----------------
+
+def _parsear_bloque(datos: bytes, columnas: List[str], pares: List[Tuple[str, str]]) -> List[Registro]:
+    """Proceso del pool: filas completas de un bloque del CSV -> Registro."""
+    registros = []
+    for fila in csv.DictReader(io.StringIO(datos.decode("utf-8"), newline=""), fieldnames=columnas):
+        for vieja, nueva in pares:
+            if not fila.get(nueva):
+                fila[nueva] = fila.get(vieja, "")
+        registros.append(Registro(fila))
+    return registros
+
+
+def _fin_de_fila(datos: bytes, desde: int, comillas_pares: bool) -> int:
+    """
+    Offset siguiente al primer salto de línea >= desde que cierra un registro.
+    Un salto está dentro de un campo si antes hay una cantidad impar de comillas
+    ('comillas_pares' indica la paridad hasta 'desde'). -1 si no hay.
+    """
+    pos = desde
+    while True:
+        salto = datos.find(b"\n", pos)
+        if salto < 0:
+            return -1
+        if datos.count(b'"', pos, salto) % 2 == 0:
+            if comillas_pares:
+                return salto + 1
+        else:
+            comillas_pares = not comillas_pares
+            if comillas_pares:
+                return salto + 1
+        pos = salto + 1
+
+
+def _bloques(datos: bytes, inicio: int, cantidad: int) -> List[Tuple[int, int]]:
+    """Divide datos[inicio:] en hasta 'cantidad' bloques que terminan en fin de registro."""
+    bloques = []
+    tam = max(1, (len(datos) - inicio) // cantidad)
+    desde = inicio
+    while desde < len(datos):
+        objetivo = desde + tam
+        if objetivo >= len(datos) or len(bloques) == cantidad - 1:
+            bloques.append((desde, len(datos)))
+            break
+        pares = datos.count(b'"', desde, objetivo) % 2 == 0
+        fin = _fin_de_fila(datos, objetivo, pares)
+        if fin < 0:
+            bloques.append((desde, len(datos)))
+            break
+        bloques.append((desde, fin))
+        desde = fin
+    return bloques
+
+
+def _workers_csv() -> int:
+    try:
+        workers = int(settings.get("app.csv_workers", 0) or 0)
+    except (TypeError, ValueError):
+        workers = 0
+    return workers if workers > 0 else min(os.cpu_count() or 1, 8)
+
+
+def cargar_csv_paralelo(csv_path, workers: Optional[int] = None) -> Tuple[List[Registro], int]:
+    """
+    Lee un CSV completo como Registro, en orden. Los archivos de al menos
+    app.csv_paralelo_min_mb se parten en bloques (en límites de registro, respetando
+    campos entre comillas) que se parsean en un pool de procesos; los chicos, o
+    con un solo worker, se leen en serie. Devuelve (registros, versión del esquema).
+
+    Solo para importaciones explícitas (respaldo de Sheets, exportaciones): el store
+    principal se carga en serie. Los workers se crean con "spawn", no con fork
+    desde un hilo del proceso con Tk; el ejecutable necesita freeze_support() en main.py.
+    """
+    workers = workers or _workers_csv()
+    try:
+        minimo = float(settings.get("app.csv_paralelo_min_mb", 8) or 0) * 1024 * 1024
+    except (TypeError, ValueError):
+        minimo = 8 * 1024 * 1024
+    if workers <= 1 or os.path.getsize(csv_path) < minimo:
+        with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+            filas, version = lector_csv(f)
+            return [Registro(r) for r in filas], version
+
+    with open(csv_path, "rb") as f:
+        datos = f.read()
+    inicio = 3 if datos.startswith(codecs.BOM_UTF8) else 0
+    fin_encabezado = _fin_de_fila(datos, inicio, True)
+    if fin_encabezado < 0:
+        fin_encabezado = len(datos)
+    encabezado = next(csv.reader(io.StringIO(datos[inicio:fin_encabezado].decode("utf-8"), newline="")), [])
+    version = version_encabezado(encabezado)
+    columnas, pares = canonizar_encabezado(encabezado)
+
+    bloques = _bloques(datos, fin_encabezado, workers * 4)
+    registros: List[Registro] = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futuros = [pool.submit(_parsear_bloque, datos[a:b], columnas, pares) for a, b in bloques]
+        for futuro in futuros:
+            registros.extend(futuro.result())
+    print(f"[CSV_HANDLER] {len(registros)} registros leídos de {os.path.basename(str(csv_path))} "
+          f"en {len(bloques)} bloques ({workers} procesos)")
+    return registros, version
+
+
+def _filtrar(origen: Iterable[Dict[str, Any]], condiciones: List[Tuple[str, frozenset]],
+             campos: Optional[List[str]]) -> Iterator[Dict[str, Any]]:
+    for r in origen:
+        if condiciones and not _cumple(r, condiciones):
+            continue
+        if campos is not None:
+            yield {k: ("" if r.get(k) is None else r.get(k)) for k in campos}
+        else:
+            yield r.a_dict() if isinstance(r, Registro) else dict(r)
+
+
+def iter_registros(filtros: Optional[Dict[str, Any]] = None, campos: Optional[Iterable[str]] = None,
+                   csv_path: Optional[str] = None, incluir_archivo: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre las inscripciones de a una, sin armar la lista completa.
+    - filtros: {campo: valor} (igualdad de texto) o {campo: [valores]}; se evalúan
+      antes de copiar la fila, y un filtro por un único 'dni' usa el índice del store
+    - campos: si se indica, cada fila trae solo esas columnas
+    - csv_path: leer otro CSV (p.ej. inscripciones_sheets.csv) directo del disco
+    - incluir_archivo: seguir con los ciclos archivados (database/archivo.py)
+    Cada fila entregada es un dict nuevo que el llamador puede modificar.
+    """
+    condiciones = _preparar_filtros(filtros)
+    campos = list(campos) if campos else None
+
+    if csv_path is None or _es_csv_principal(csv_path):
+        sql = _backend_sqlite()
+        dnis = dict(condiciones).get("dni")
+        if sql:
+            yield from sql.iter_registros(filtros, campos)
+        elif dnis is not None and len(dnis) == 1:
+            yield from _filtrar(_store.por_dni(next(iter(dnis))), condiciones, campos)
+        else:
+            # la lista del store es una instantánea: no cambia mientras se recorre
+            yield from _filtrar(_store.registros(), condiciones, campos)
+        if incluir_archivo:
+            if dnis is not None and len(dnis) == 1:
+                yield from _filtrar(archivo.por_dni(next(iter(dnis))), condiciones, campos)
+            else:
+                yield from _filtrar(archivo.iter_registros(), condiciones, campos)
+    else:
+        if not os.path.exists(csv_path):
+            print(f"[WARN] iter_registros: no existe {csv_path}")
+            return
+        yield from _filtrar(_leer_csv_en_streaming(csv_path), condiciones, campos)
+
+
 def exportar_listado(filtros: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-    registros = cargar_registros()
-    if not filtros:
-        return registros
-    resultado = []
-    for r in registros:
-        cumple = True
-        if "materia" in filtros and r.get("materia") != filtros["materia"]:
-            cumple = False
-        if "profesor" in filtros and r.get("profesor") != filtros["profesor"]:
-            cumple = False
-        if "turno" in filtros and r.get("turno") != filtros["turno"]:
-            cumple = False
-        if "anio" in filtros and str(r.get("anio")) != str(filtros["anio"]):
-            cumple = False
-        if cumple:
-            resultado.append(r)
-    return resultado
+    """Lista filtrada (materia/profesor/turno/anio...). Para recorrerla sin copiar usar iter_registros."""
+    return list(iter_registros(filtros))
 
 
 def migrar_id_si_es_uuid(registro: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,146 @@
+"""
+Bloqueo exclusivo entre procesos con un archivo de lock (fcntl.lockf en Unix,
+msvcrt.locking en Windows), para varios puestos de inscripción que comparten la
+carpeta data/. Dentro del proceso los hilos se ordenan con un RLock, así que el
+bloqueo es reentrante para el hilo que lo tiene.
+
+Uso:
+    with bloqueo:          # TimeoutError si no se obtiene en 'timeout' segundos
+        ...leer, modificar y escribir...
+
+Debe existir una sola instancia por archivo de lock en cada proceso (los locks
+de fcntl son por proceso y se liberan al cerrar cualquier descriptor del archivo).
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+    _HAS_FCNTL = True
+except ImportError:
+    _HAS_FCNTL = False
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+# esperas más largas que esto se informan en consola
+_AVISO_ESPERA_SEG = 1.0
+
+
+class BloqueoArchivo:
+    """Lock exclusivo entre procesos con timeout y estadísticas de espera/retención."""
+
+    def __init__(self, path, timeout: float = 10.0):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._hilos = threading.RLock()
+        self._profundidad = 0
+        self._fd: Optional[int] = None
+        self._desde = 0.0
+        self._stats = {
+            "adquisiciones": 0,
+            "con_espera": 0,
+            "timeouts": 0,
+            "espera_total_ms": 0.0,
+            "espera_max_ms": 0.0,
+            "retencion_total_ms": 0.0,
+            "retencion_max_ms": 0.0,
+        }
+
+    # ---------------- lock del sistema operativo ----------------
+
+    def _intentar(self, fd: int) -> bool:
+        try:
+            if _HAS_FCNTL:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            elif msvcrt is not None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _soltar(self, fd: int) -> None:
+        try:
+            if _HAS_FCNTL:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    # ---------------- API ----------------
+
+    def adquirir(self, timeout: Optional[float] = None) -> None:
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        if not self._hilos.acquire(timeout=timeout):
+            self._stats["timeouts"] += 1
+            raise TimeoutError(f"No se pudo obtener el lock de {self.path.name} en {timeout:.0f}s (otro hilo)")
+        if self._profundidad:
+            self._profundidad += 1
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o666)
+            pausa = 0.001
+            intentos = 0
+            while not self._intentar(fd):
+                intentos += 1
+                if time.monotonic() - inicio >= timeout:
+                    os.close(fd)
+                    self._stats["timeouts"] += 1
+                    raise TimeoutError(
+                        f"No se pudo obtener el lock de {self.path.name} en {timeout:.0f}s "
+                        "(otro puesto está escribiendo)")
+                time.sleep(pausa)
+                pausa = min(pausa * 2, 0.05)
+        except BaseException:
+            self._hilos.release()
+            raise
+        espera = time.monotonic() - inicio
+        self._fd = fd
+        self._profundidad = 1
+        self._desde = time.monotonic()
+        self._stats["adquisiciones"] += 1
+        self._stats["espera_total_ms"] += espera * 1000
+        self._stats["espera_max_ms"] = max(self._stats["espera_max_ms"], espera * 1000)
+        if intentos:
+            self._stats["con_espera"] += 1
+        if espera >= _AVISO_ESPERA_SEG:
+            print(f"[LOCK] Espera de {espera:.2f}s por {self.path.name}")
+
+    def liberar(self) -> None:
+        self._profundidad -= 1
+        if self._profundidad == 0:
+            retencion = (time.monotonic() - self._desde) * 1000
+            self._stats["retencion_total_ms"] += retencion
+            self._stats["retencion_max_ms"] = max(self._stats["retencion_max_ms"], retencion)
+            fd, self._fd = self._fd, None
+            try:
+                if fd is not None:
+                    self._soltar(fd)
+            finally:
+                self._hilos.release()
+        else:
+            self._hilos.release()
+
+    def __enter__(self) -> "BloqueoArchivo":
+        self.adquirir()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.liberar()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores acumulados desde el inicio del proceso (tiempos en ms)."""
+        stats = dict(self._stats)
+        n = stats["adquisiciones"] or 1
+        stats["espera_media_ms"] = stats["espera_total_ms"] / n
+        stats["retencion_media_ms"] = stats["retencion_total_ms"] / n
+        return stats
@@ -69,6 +69,23 @@ def delete_row_by_id(sheet_key: str, id_value: str) -> Tuple[bool, str]:
         return False, str(e)
 
 
+def delete_rows_by_ids(sheet_key: str, ids: List[str]) -> Tuple[bool, str]:
+    ok, msg = _require_mod()
+    if not ok:
+        return False, msg
+    try:
+        if hasattr(_mod, "delete_rows_by_ids"):
+            return _mod.delete_rows_by_ids(sheet_key, ids)
+        # Fallback: de a un ID
+        for id_value in ids:
+            ok, msg = delete_row_by_id(sheet_key, id_value)
+            if not ok:
+                return False, msg
+        return True, f"Deleted {len(ids)} IDs"
+    except Exception as e:
+        return False, str(e)
+
+
 def descargar_desde_google_sheets(sheet_key: str) -> Tuple[bool, Any]:
     ok, msg = _require_mod()
     if not ok:
@@ -113,6 +130,8 @@ def sync_from_google_sheets(sheet_key: str) -> Tuple[bool, str]:
     """
     try:
         from services.google_sheets import descargar_desde_google_sheets
+        from database.csv_handler import ultimo_seq
+        seq_inicio = ultimo_seq()
         ok, result = descargar_desde_google_sheets(sheet_key)
         if not ok:
             return False, result  # mensaje de error
@@ -135,7 +154,7 @@ def sync_from_google_sheets(sheet_key: str) -> Tuple[bool, str]:
         else:
             normalized = []
 
-        ok2, msg2 = guardar_todos_registros(normalized)
+        ok2, msg2 = guardar_todos_registros(normalized, desde_seq=seq_inicio)
         if ok2:
             return True, f"Descargados y guardados {len(normalized)} registros"
         else:
@@ -165,6 +184,8 @@ def sincronizar_bidireccional(sheet_key: Optional[str] = None) -> Tuple[bool, st
         
         # Fallback: hacer sync manual (download + save + upload)
         # 1. Descargar
+        from database.csv_handler import ultimo_seq
+        seq_inicio = ultimo_seq()
         ok_down, result = descargar_desde_google_sheets(sheet_key)
         if not ok_down:
             return False, f"Error descargando: {result}"
@@ -173,7 +194,7 @@ def sincronizar_bidireccional(sheet_key: Optional[str] = None) -> Tuple[bool, st
         
         # 2. Guardar localmente
         from database.csv_handler import guardar_todos_registros
-        ok_save, msg_save = guardar_todos_registros(registros_remotos)
+        ok_save, msg_save = guardar_todos_registros(registros_remotos, desde_seq=seq_inicio)
         if not ok_save:
             return False, f"Error guardando CSV: {msg_save}"
         
@@ -0,0 +1,855 @@
+"""
+Store en memoria de inscripciones, compartido por database.csv_handler.
+Carga el CSV una sola vez y sirve todas las lecturas desde memoria.
+Se recarga sólo si el archivo cambió en disco (mtime/tamaño distintos,
+p. ej. otro proceso o una edición manual) o cuando este proceso lo reescribe.
+
+Las altas/modificaciones/bajas individuales no reescriben el CSV: se agregan
+como líneas JSON a un journal (write-ahead log, con fsync) que se reaplica al
+cargar. La compactación vuelca el estado al CSV canónico y vacía el journal.
+
+Con lock_path, toda escritura (journal, compactación, reescritura completa) se
+hace bajo un lock de archivo entre procesos (database/file_lock.py), tomado
+solo durante la escritura; las lecturas no lo necesitan.
+
+Dentro del proceso (hilo de Tk, sincronización en segundo plano, bajas en
+lote) las estructuras en memoria se protegen con un lock de lectores/escritor
+(database/rw_lock.py): las consultas corren en paralelo y la exclusión se toma
+solo para aplicar un cambio ya escrito en disco. El fsync del journal, la
+escritura del CSV y el snapshot se hacen fuera de esa sección; mientras otro
+hilo escribe, las lecturas sirven el último estado aplicado en lugar de
+recargar lo que encuentran a medio escribir.
+
+Con 'cambios' (database/change_log.py), cada alta/modificación/baja y cada
+reescritura completa (comparada contra el estado anterior) se registra además
+en el log de cambios con su número de secuencia.
+
+Los CSV con encabezado viejo (database/schema.py) se leen con las claves
+canónicas; con migrar_esquema=True el archivo se reescribe además en el layout
+actual la primera vez que se carga.
+
+Con snapshot_path, el estado leído del CSV (registros e índices) se guarda
+además en un snapshot binario (pickle) validado contra la firma (mtime, tamaño)
+y un hash del CSV: un arranque sin cambios en el CSV lo carga en una sola
+lectura, sin volver a parsear el texto. El CSV sigue siendo el formato de
+intercambio.
+
+Cada fila se guarda como un models.registro.Registro (compacto, de solo lectura,
+con anio/fecha/lista de espera ya parseados). Los datos del estudiante forman una
+tabla de alumnos por DNI (_alumnos): las inscripciones con el mismo DNI y los
+mismos datos comparten esa tupla, y actualizar_alumno los cambia en todas con
+una sola línea de journal. Hacia afuera cada fila sigue siendo plana (CSV_FIELDS).
+"""
+import bisect
+import contextlib
+import csv
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Callable, Mapping
+
+from database.change_log import RegistroCambios, cambio_upsert, cambios_por_reemplazo, rebasar
+from database.file_lock import BloqueoArchivo
+from database.rw_lock import BloqueoLectorEscritor
+from database.schema import SCHEMA_VERSION, lector_csv, version_csv
+from models.registro import CAMPOS_ALUMNO, Registro, perfil_alumno
+
+
+def escribir_csv_atomico(csv_path, registros: List[Dict[str, Any]], fieldnames: List[str]) -> None:
+    """
+    Escribe registros a un temporal en el mismo directorio, hace fsync y lo
+    mueve sobre csv_path. Lanza la excepción original si algo falla.
+    """
+    csv_path = str(csv_path)
+    dirn = os.path.dirname(csv_path) or "."
+    os.makedirs(dirn, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="tmp_inscripciones_", dir=dirn, text=True)
+    os.close(fd)
+    try:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            for r in registros:
+                # asegurarnos de que todos los valores sean strings (csv writer espera)
+                row = {k: ("" if r.get(k) is None else r.get(k)) for k in fieldnames}
+                writer.writerow(row)
+            f.flush()
+            os.fsync(f.fileno())
+        shutil.move(tmp_path, csv_path)
+    finally:
+        # cleanup si queda tmp
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except Exception:
+            pass
+
+
+_SNAPSHOT_VERSION = 2
+
+
+class RecordStore:
+    """Cache de registros validada contra la firma del CSV y el tamaño del journal."""
+
+    def __init__(self, csv_path, journal_path=None, fieldnames: Optional[List[str]] = None,
+                 lock_path=None, lock_timeout: float = 10.0, cambios: Optional[RegistroCambios] = None,
+                 migrar_esquema: bool = False, snapshot_path=None,
+                 lector: Optional[Callable[[Path], Tuple[List[Registro], int]]] = None):
+        self.csv_path = Path(csv_path)
+        self.journal_path = Path(journal_path) if journal_path else self.csv_path.with_suffix(".journal")
+        self.fieldnames = list(fieldnames or [])
+        # clave interna -> registro, en orden de inserción. El CSV puede traer ids
+        # repetidos o vacíos, así que cada fila tiene su propia clave y _claves_id
+        # mapea id -> [claves] (la primera es la que reemplaza un upsert).
+        self._filas: Optional[Dict[int, Registro]] = None
+        self._claves_id: Dict[str, List[int]] = {}
+        # ids distintos ordenados, para búsqueda por prefijo (se arma en la primera consulta)
+        self._ids_ordenados: Optional[List[str]] = None
+        # índices secundarios, mantenidos en cada alta/modificación/baja:
+        #   dni -> [claves]; materia -> {(profesor, comision): [activos, en_espera]}
+        self._claves_dni: Dict[str, List[int]] = {}
+        self._conteos: Dict[str, Dict[Tuple[str, str], List[int]]] = {}
+        # tabla de alumnos: dni -> datos del estudiante (tupla de CAMPOS_ALUMNO) más
+        # recientes (última fila cargada o modificada); las filas iguales comparten la tupla
+        self._alumnos: Dict[str, Tuple[str, ...]] = {}
+        self._lista: Optional[List[Registro]] = None
+        self._firma_csv: Optional[Tuple[int, int]] = None
+        self._journal_offset = 0
+        self._journal_entradas = 0
+        self._proxima_clave = 0
+        # estructuras en memoria: lecturas en paralelo, cambios exclusivos
+        self._rw = BloqueoLectorEscritor(self.csv_path.name)
+        # serializa escritores del proceso cuando no hay lock_path
+        self._escritores = threading.RLock()
+        # hilo que está escribiendo (dentro de _exclusivo), o None
+        self._hilo_escritor: Optional[int] = None
+        self._migracion_pendiente = False
+        self.bloqueo: Optional[BloqueoArchivo] = BloqueoArchivo(lock_path, lock_timeout) if lock_path else None
+        self.cambios = cambios
+        self.migrar_esquema = migrar_esquema
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        # lector alternativo del CSV completo -> (registros, versión del esquema), p.ej. en paralelo
+        self.lector = lector
+        # versión del layout del CSV en la última lectura
+        self._version_csv = SCHEMA_VERSION
+        # recibe las líneas ya aplicadas del journal justo antes de vaciarlo (respaldos)
+        self.al_archivar_journal: Optional[Callable[[bytes], None]] = None
+
+    # ---------------- carga / validación ----------------
+
+    @staticmethod
+    def _firma_archivo(path: Path) -> Optional[Tuple[int, int]]:
+        """Devuelve (mtime_ns, size) del archivo o None si no existe."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _leer_csv(self) -> List[Registro]:
+        registros: List[Registro] = []
+        if not self.csv_path.exists():
+            print(f"[CSV_HANDLER] Archivo {self.csv_path} no existe, retornando lista vacía")
+            return registros
+        try:
+            if self.lector is not None:
+                registros, self._version_csv = self.lector(self.csv_path)
+            else:
+                with open(self.csv_path, "r", encoding="utf-8-sig", newline="") as f:
+                    filas, self._version_csv = lector_csv(f)
+                    for row in filas:
+                        registros.append(Registro(row))
+            print(f"[CSV_HANDLER] Cargados {len(registros)} registros desde {self.csv_path}")
+        except Exception as e:
+            print(f"[ERROR] RecordStore: no se pudo leer {self.csv_path}: {e}")
+            import traceback
+            traceback.print_exc()
+        return registros
+
+    # ---------------- filas e índices ----------------
+
+    def _contar(self, registro: Registro, delta: int) -> None:
+        por_materia = self._conteos.setdefault(str(registro.get("materia", "") or ""), {})
+        combo = (str(registro.get("profesor", "") or ""), str(registro.get("comision", "") or ""))
+        cuenta = por_materia.setdefault(combo, [0, 0])
+        cuenta[1 if registro.get("en_lista_espera", "No") == "Sí" else 0] += delta
+
+    def _indexar(self, clave: int, registro: Registro) -> None:
+        dni = str(registro.get("dni", "") or "")
+        if dni:
+            self._claves_dni.setdefault(dni, []).append(clave)
+        self._contar(registro, 1)
+
+    def _desindexar(self, clave: int, registro: Registro) -> None:
+        dni = str(registro.get("dni", "") or "")
+        claves = self._claves_dni.get(dni)
+        if claves:
+            claves.remove(clave)
+            if not claves:
+                del self._claves_dni[dni]
+                self._alumnos.pop(dni, None)
+            elif clave > claves[-1]:
+                # era la última inscripción del alumno: sus datos pasan a ser los de la anterior
+                self._alumnos[dni] = self._filas[claves[-1]].perfil
+        self._contar(registro, -1)
+
+    def _compartir_perfil(self, registro: Registro) -> Registro:
+        """Usa la tupla de la tabla de alumnos si los datos coinciden; si no, la fila pasa a ser la referencia."""
+        dni = str(registro.get("dni", "") or "")
+        if not dni:
+            return registro
+        actual = self._alumnos.get(dni)
+        if actual is not None and actual == registro.perfil:
+            return registro.con_perfil(actual)
+        self._alumnos[dni] = registro.perfil
+        return registro
+
+    def _agregar_fila(self, registro: Registro) -> None:
+        registro = self._compartir_perfil(registro)
+        clave = self._proxima_clave
+        self._proxima_clave += 1
+        self._filas[clave] = registro
+        rid = str(registro.get("id", "") or "")
+        if rid:
+            if rid not in self._claves_id and self._ids_ordenados is not None:
+                bisect.insort(self._ids_ordenados, rid)
+            self._claves_id.setdefault(rid, []).append(clave)
+        self._indexar(clave, registro)
+
+    def _upsert_fila(self, registro: Registro) -> None:
+        claves = self._claves_id.get(str(registro.get("id", "") or ""))
+        if not claves:
+            self._agregar_fila(registro)
+            return
+        clave = claves[0]
+        self._desindexar(clave, self._filas[clave])
+        registro = self._compartir_perfil(registro)
+        self._filas[clave] = registro
+        self._indexar(clave, registro)
+        dni_claves = self._claves_dni.get(str(registro.get("dni", "") or ""))
+        if dni_claves and len(dni_claves) > 1:
+            # conservar el orden del archivo dentro del índice por DNI
+            dni_claves.sort()
+
+    def _eliminar_filas(self, reg_id: str) -> None:
+        claves = self._claves_id.pop(str(reg_id), [])
+        if claves and self._ids_ordenados is not None:
+            i = bisect.bisect_left(self._ids_ordenados, str(reg_id))
+            if i < len(self._ids_ordenados) and self._ids_ordenados[i] == str(reg_id):
+                del self._ids_ordenados[i]
+        for clave in claves:
+            registro = self._filas.pop(clave, None)
+            if registro is not None:
+                self._desindexar(clave, registro)
+
+    def _reiniciar(self) -> None:
+        self._adoptar(({}, {}, {}, {}, {}, self._proxima_clave))
+
+    def _estado(self) -> Tuple[Dict[int, Registro], Dict[str, List[int]], Dict[str, List[int]],
+                               Dict[str, Dict[Tuple[str, str], List[int]]], Dict[str, Tuple[str, ...]], int]:
+        """(filas, claves_id, claves_dni, conteos, alumnos, proxima_clave): lo que guarda el snapshot."""
+        return self._filas, self._claves_id, self._claves_dni, self._conteos, self._alumnos, self._proxima_clave
+
+    def _adoptar(self, estado) -> None:
+        """Reemplaza filas e índices por los de 'estado' (ver _estado)."""
+        self._filas, self._claves_id, self._claves_dni, self._conteos, self._alumnos, self._proxima_clave = estado
+        self._ids_ordenados = None
+        self._lista = None
+
+    def _normalizar(self, registro: Dict[str, Any]) -> Dict[str, Any]:
+        """Deja el registro como quedaría al releerlo del CSV (solo fieldnames, valores str)."""
+        campos = self.fieldnames or list(registro.keys())
+        return {k: ("" if registro.get(k) is None else str(registro.get(k))) for k in campos}
+
+    def _cargar(self) -> None:
+        self._reiniciar()
+        self._version_csv = SCHEMA_VERSION
+        if not self._cargar_snapshot():
+            for r in self._leer_csv():
+                self._agregar_fila(r)
+            self._firma_csv = self._firma_archivo(self.csv_path)
+            self._guardar_snapshot()
+        self._journal_offset = 0
+        self._journal_entradas = 0
+        self._replay_journal()
+        # la migración toma el lock de archivo: se hace en _al_dia, fuera del lock en memoria
+        self._migracion_pendiente = bool(
+            self.migrar_esquema and self.fieldnames and self._version_csv < SCHEMA_VERSION)
+
+    def _migrar_csv(self) -> None:
+        """Reescribe en el layout canónico el CSV recién leído con encabezado viejo."""
+        try:
+            with self._exclusivo():
+                self._migracion_pendiente = False
+                with self._rw.lectura():
+                    # otro puesto pudo haberlo migrado o modificado mientras leíamos
+                    if (self._firma_archivo(self.csv_path) != self._firma_csv
+                            or self._tamano_journal() != self._journal_offset
+                            or version_csv(self.csv_path) >= SCHEMA_VERSION):
+                        return
+                    registros = self._lista_actual()
+                escribir_csv_atomico(self.csv_path, registros, self.fieldnames)
+                self._archivar_journal()
+                self._vaciar_journal()
+                with self._rw.escritura():
+                    self._firma_csv = self._firma_archivo(self.csv_path)
+                    print(f"[CSV_HANDLER] {self.csv_path.name} migrado del esquema v{self._version_csv} "
+                          f"al v{SCHEMA_VERSION}")
+                    self._version_csv = SCHEMA_VERSION
+                with self._rw.lectura():
+                    self._guardar_snapshot()
+        except Exception as e:
+            print(f"[WARN] RecordStore: no se pudo migrar {self.csv_path.name}: {e}")
+
+    # ---------------- snapshot binario ----------------
+
+    def _hash_csv(self) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        with open(self.csv_path, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloque)
+        return h.hexdigest()
+
+    def _cargar_snapshot(self) -> bool:
+        """Carga registros e índices del snapshot si corresponde al CSV actual."""
+        if self.snapshot_path is None:
+            return False
+        firma = self._firma_archivo(self.csv_path)
+        if firma is None:
+            return False
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                # la cabecera va aparte: un snapshot viejo se descarta sin leer el resto
+                cabecera = pickle.load(f)
+                if (cabecera.get("version") != _SNAPSHOT_VERSION or tuple(cabecera.get("firma") or ()) != firma
+                        or cabecera.get("campos") != self.fieldnames or cabecera.get("hash") != self._hash_csv()):
+                    return False
+                estado = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"[WARN] RecordStore: snapshot {self.snapshot_path.name} inválido: {e}")
+            return False
+        self._adoptar(estado)
+        self._firma_csv = firma
+        print(f"[CSV_HANDLER] Cargados {len(self._filas)} registros desde {self.snapshot_path.name}")
+        return True
+
+    def _guardar_snapshot(self) -> None:
+        """Guarda el estado actual, que debe coincidir con el CSV en disco (sin journal aplicado)."""
+        if self.snapshot_path is None or self._firma_csv is None or self._version_csv < SCHEMA_VERSION:
+            return
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        try:
+            cabecera = {"version": _SNAPSHOT_VERSION, "firma": self._firma_csv,
+                        "campos": self.fieldnames, "hash": self._hash_csv()}
+            with open(tmp_path, "wb") as f:
+                pickle.dump(cabecera, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(self._estado(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"[WARN] RecordStore: no se pudo guardar el snapshot: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _tamano_journal(self) -> int:
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    def _desactualizado(self) -> bool:
+        """True si el CSV o el journal en disco no coinciden con lo cargado."""
+        return (self._filas is None or self._firma_archivo(self.csv_path) != self._firma_csv
+                or self._tamano_journal() != self._journal_offset)
+
+    def _al_dia(self) -> None:
+        """Recarga o reaplica el journal (con el lock en memoria exclusivo) si hace falta."""
+        if self._desactualizado():
+            with self._rw.escritura():
+                self._validar()
+        if self._migracion_pendiente:
+            self._migrar_csv()
+
+    @contextlib.contextmanager
+    def _leyendo(self):
+        """
+        Sección de lectura: pone el store al día y toma el lock en memoria
+        compartido. Si otro hilo está escribiendo, no revalida: lee el último
+        estado aplicado (el escritor lo actualiza al terminar).
+        """
+        escritor = self._hilo_escritor
+        if not self._rw.lee_este_hilo() and (escritor in (None, threading.get_ident()) or self._filas is None):
+            self._al_dia()
+        with self._rw.lectura():
+            yield
+
+    def _validar(self) -> None:
+        """Recarga o reaplica el journal si el estado en disco cambió (con el lock en memoria exclusivo)."""
+        if self._filas is None or self._firma_archivo(self.csv_path) != self._firma_csv:
+            self._cargar()
+            return
+        tam = self._tamano_journal()
+        if tam < self._journal_offset:
+            # otro proceso compactó el journal
+            self._cargar()
+        elif tam > self._journal_offset:
+            self._replay_journal()
+
+    def _replay_journal(self, silencioso: bool = False) -> None:
+        """Aplica las líneas completas del journal a partir del último offset leído."""
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._journal_offset)
+            datos = f.read()
+        # una línea final sin '\n' es una escritura incompleta: no se consume
+        fin = datos.rfind(b"\n") + 1
+        aplicadas = 0
+        for linea in datos[:fin].splitlines():
+            if not linea.strip():
+                continue
+            try:
+                entrada = json.loads(linea.decode("utf-8"))
+            except Exception as e:
+                print(f"[WARN] RecordStore: línea de journal inválida ignorada: {e}")
+                continue
+            aplicadas += self._aplicar(entrada)
+        self._journal_offset += fin
+        self._journal_entradas += aplicadas
+        if aplicadas and not silencioso:
+            print(f"[CSV_HANDLER] Reaplicadas {aplicadas} operaciones desde {self.journal_path.name}")
+
+    def _aplicar(self, entrada: Dict[str, Any]) -> int:
+        """Aplica una entrada del journal en memoria. Devuelve cuántas operaciones contenía."""
+        op = entrada.get("op")
+        if op == "upsert":
+            self._upsert_fila(Registro(entrada.get("registro") or {}))
+        elif op == "delete":
+            self._eliminar_filas(str(entrada.get("id", "")))
+        elif op == "alumno":
+            self._actualizar_perfil(str(entrada.get("dni", "")), entrada.get("perfil") or {})
+        elif op == "lote":
+            # un lote es una sola línea: se aplica completo o (si quedó truncada) nada
+            return sum(self._aplicar(sub) for sub in entrada.get("ops") or [])
+        elif op == "reemplazo":
+            # reescritura completa del CSV: solo aparece en los deltas archivados (ver reemplazar)
+            self._reiniciar()
+            for r in entrada.get("registros") or []:
+                self._agregar_fila(Registro(r))
+        else:
+            print(f"[WARN] RecordStore: operación de journal desconocida: {op}")
+            return 0
+        self._lista = None
+        return 1
+
+    # ---------------- lectura ----------------
+
+    def _actualizar_perfil(self, dni: str, datos: Mapping[str, Any]) -> None:
+        """Aplica datos del estudiante a todas las filas del DNI (el dni no cambia)."""
+        claves = self._claves_dni.get(dni)
+        if not claves:
+            return
+        base = self._filas[claves[-1]].datos_alumno()
+        base.update({k: v for k, v in datos.items() if k in base})
+        base["dni"] = dni
+        perfil = perfil_alumno(base)
+        for clave in claves:
+            self._filas[clave] = self._filas[clave].con_perfil(perfil)
+        self._alumnos[dni] = perfil
+
+    def _lista_actual(self) -> List[Registro]:
+        # se arma con el lock compartido: dos lectores pueden armarla a la vez, con el mismo
+        # resultado. Los cambios nunca la modifican, la descartan (_lista = None).
+        if self._lista is None:
+            self._lista = list(self._filas.values())
+        return self._lista
+
+    def registros(self) -> List[Registro]:
+        """
+        Devuelve la lista interna de registros (recargando si el CSV cambió).
+        La lista es compartida: los llamadores NO deben modificarla.
+        """
+        with self._leyendo():
+            return self._lista_actual()
+
+    def obtener(self, reg_id: str) -> Optional[Registro]:
+        """Registro por id exacto (compartido, no modificar) o None."""
+        with self._leyendo():
+            claves = self._claves_id.get(str(reg_id))
+            return self._filas[claves[0]] if claves else None
+
+    def ids_con_prefijo(self, prefijo: str, limite: Optional[int] = None) -> List[str]:
+        """
+        Ids distintos que empiezan con 'prefijo', en orden, por búsqueda binaria
+        sobre el índice ordenado: O(log n + resultados). 'limite' corta la lista
+        (con limite=2 alcanza para saber si un prefijo es ambiguo).
+        """
+        with self._leyendo():
+            if self._ids_ordenados is None:
+                self._ids_ordenados = sorted(self._claves_id)
+            ids = self._ids_ordenados
+            prefijo = str(prefijo)
+            resultado = []
+            i = bisect.bisect_left(ids, prefijo)
+            while i < len(ids) and ids[i].startswith(prefijo):
+                resultado.append(ids[i])
+                if limite is not None and len(resultado) >= limite:
+                    break
+                i += 1
+            return resultado
+
+    def por_dni(self, dni: str) -> List[Registro]:
+        """Registros con ese DNI, en orden del archivo (compartidos, no modificar)."""
+        with self._leyendo():
+            return [self._filas[c] for c in self._claves_dni.get(str(dni), [])]
+
+    def alumno(self, dni: str) -> Optional[Dict[str, str]]:
+        """Datos más recientes del estudiante (CAMPOS_ALUMNO), por índice; None si el DNI no tiene inscripciones."""
+        with self._leyendo():
+            perfil = self._alumnos.get(str(dni))
+            return dict(zip(CAMPOS_ALUMNO, perfil)) if perfil is not None else None
+
+    def contar(self, materia: str, profesor: Optional[str] = None, comision: Optional[str] = None,
+               lista_espera: bool = False) -> int:
+        """
+        Inscriptos de una materia (opcionalmente de un profesor/comisión) según el
+        índice de conteos. Por defecto cuenta activos; lista_espera=True cuenta la espera.
+        """
+        with self._leyendo():
+            por_materia = self._conteos.get(str(materia), {})
+            if profesor and comision:
+                cuenta = por_materia.get((str(profesor), str(comision)))
+                return cuenta[1 if lista_espera else 0] if cuenta else 0
+            total = 0
+            for (prof, com), cuenta in por_materia.items():
+                if profesor and prof != profesor:
+                    continue
+                if comision and com != comision:
+                    continue
+                total += cuenta[1 if lista_espera else 0]
+            return total
+
+    @property
+    def pendientes(self) -> int:
+        """Cantidad de operaciones en el journal aún no volcadas al CSV."""
+        return self._journal_entradas
+
+    # ---------------- log de cambios ----------------
+
+    def _cambios_upsert(self, registros: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cambios (insert/update con los campos distintos) que producen estos upserts sobre el estado actual."""
+        if self.cambios is None:
+            return []
+        cambios = []
+        vistos: Dict[str, Mapping[str, Any]] = {}
+        for r in registros:
+            rid = str(r.get("id", "") or "")
+            if rid in vistos:
+                anterior = vistos[rid]
+            else:
+                claves = self._claves_id.get(rid)
+                anterior = self._filas[claves[0]] if claves else None
+            cambio = cambio_upsert(anterior, r, self.fieldnames or list(r.keys()))
+            if cambio:
+                cambios.append(cambio)
+            vistos[rid] = r
+        return cambios
+
+    def _registrar_cambios(self, cambios: List[Dict[str, Any]]) -> None:
+        if self.cambios is None or not cambios:
+            return
+        try:
+            self.cambios.agregar(cambios)
+        except Exception as e:
+            # el dato ya está en el journal: no fallar la escritura por el log
+            print(f"[WARN] RecordStore: no se pudo registrar en el log de cambios: {e}")
+
+    # ---------------- escritura ----------------
+
+    @contextlib.contextmanager
+    def _exclusivo(self):
+        """
+        Serializa las escrituras: lock entre procesos si el store tiene lock_path,
+        si no un RLock del proceso. Mientras dura, las lecturas de otros hilos no
+        revalidan contra el disco.
+        """
+        with (self.bloqueo if self.bloqueo is not None else self._escritores):
+            anterior = self._hilo_escritor
+            self._hilo_escritor = threading.get_ident()
+            try:
+                yield
+            finally:
+                self._hilo_escritor = anterior
+
+    def _journal_termina_en_linea(self) -> bool:
+        """True si el journal está vacío o su último byte es un salto de línea."""
+        try:
+            with open(self.journal_path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return True
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) == b"\n"
+        except OSError:
+            return True
+
+    def _append_journal(self, entradas: List[Dict[str, Any]]) -> None:
+        """Agrega entradas al journal con fsync y las aplica en memoria."""
+        datos = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entradas).encode("utf-8")
+        if self._tamano_journal() > self._journal_offset and not self._journal_termina_en_linea():
+            # quedó una línea incompleta (corte previo): cerrarla para no corromper la nueva.
+            # Si lo que sigue al offset son líneas completas de otro puesto, no hace falta
+            datos = b"\n" + datos
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, "ab") as f:
+            f.write(datos)
+            f.flush()
+            os.fsync(f.fileno())
+        # leer desde el offset conocido aplica también lo que otro proceso haya agregado
+        with self._rw.escritura():
+            self._replay_journal(silencioso=True)
+
+    def upsert(self, registro: Dict[str, Any]) -> None:
+        """Inserta o reemplaza (por id) un registro. O(1) respecto al tamaño del CSV."""
+        normalizado = self._normalizar(registro)
+        with self._exclusivo():
+            with self._leyendo():
+                cambios = self._cambios_upsert([normalizado])
+            self._append_journal([{
+                "ts": datetime.now().isoformat(),
+                "op": "upsert",
+                "id": str(registro.get("id", "")),
+                "registro": normalizado,
+            }])
+            self._registrar_cambios(cambios)
+
+    def eliminar(self, reg_id: str) -> bool:
+        """Elimina por id. Devuelve False si no existía."""
+        with self._exclusivo():
+            with self._leyendo():
+                if str(reg_id) not in self._claves_id:
+                    return False
+            self._append_journal([{
+                "ts": datetime.now().isoformat(),
+                "op": "delete",
+                "id": str(reg_id),
+            }])
+            self._registrar_cambios([{"op": "delete", "id": str(reg_id)}])
+            return True
+
+    def upsert_lote(self, registros: List[Dict[str, Any]]) -> None:
+        """Inserta o reemplaza varios registros con una sola escritura (una línea) al journal."""
+        if not registros:
+            return
+        normalizados = [self._normalizar(r) for r in registros]
+        with self._exclusivo():
+            with self._leyendo():
+                cambios = self._cambios_upsert(normalizados)
+            self._append_journal([{
+                "ts": datetime.now().isoformat(),
+                "op": "lote",
+                "ops": [{"op": "upsert", "id": str(r.get("id", "")), "registro": r} for r in normalizados],
+            }])
+            self._registrar_cambios(cambios)
+
+    def eliminar_lote(self, ids: List[str]) -> int:
+        """Elimina todos los ids existentes en una sola escritura. Devuelve cuántos ids había."""
+        with self._exclusivo():
+            with self._leyendo():
+                existentes = [i for i in dict.fromkeys(str(x) for x in ids) if i in self._claves_id]
+            if existentes:
+                self._append_journal([{
+                    "ts": datetime.now().isoformat(),
+                    "op": "lote",
+                    "ops": [{"op": "delete", "id": i} for i in existentes],
+                }])
+                self._registrar_cambios([{"op": "delete", "id": i} for i in existentes])
+            return len(existentes)
+
+    def actualizar_alumno(self, dni: str, datos: Mapping[str, Any]) -> int:
+        """
+        Cambia los datos del estudiante en todas sus inscripciones con una sola
+        línea de journal. Devuelve cuántas inscripciones tiene el DNI (0 si ninguna).
+        """
+        dni = str(dni)
+        datos = {k: ("" if v is None else str(v)) for k, v in datos.items()
+                 if k in CAMPOS_ALUMNO and k != "dni"}
+        with self._exclusivo():
+            with self._leyendo():
+                anteriores = [self._filas[c] for c in self._claves_dni.get(dni, [])]
+            if not anteriores:
+                return 0
+            cambios = []
+            if self.cambios is not None:
+                campos = self.fieldnames or list(anteriores[0].keys())
+                for r in anteriores:
+                    nuevo = r.a_dict()
+                    nuevo.update(datos)
+                    cambio = cambio_upsert(r, nuevo, campos)
+                    if cambio:
+                        cambios.append(cambio)
+            self._append_journal([{
+                "ts": datetime.now().isoformat(),
+                "op": "alumno",
+                "dni": dni,
+                "perfil": datos,
+            }])
+            self._registrar_cambios(cambios)
+            return len(anteriores)
+
+    def _archivar_journal(self, registros: Optional[List[Dict[str, Any]]] = None,
+                          fieldnames: Optional[List[str]] = None) -> None:
+        """
+        Pasa el journal a al_archivar_journal antes de vaciarlo. Con 'registros'
+        (reescritura completa) agrega al final una entrada "reemplazo" con todas las
+        filas, en el mismo delta, para que los respaldos puedan reconstruir el estado.
+        """
+        if self.al_archivar_journal is None or (not self._journal_offset and registros is None):
+            return
+        try:
+            datos = b""
+            if self._journal_offset:
+                with open(self.journal_path, "rb") as f:
+                    datos = f.read(self._journal_offset)
+                if not datos.endswith(b"\n"):
+                    datos += b"\n"
+            if registros is not None:
+                entrada = {
+                    "ts": datetime.now().isoformat(),
+                    "op": "reemplazo",
+                    "registros": [{k: r.get(k) for k in fieldnames} for r in registros],
+                }
+                datos += (json.dumps(entrada, ensure_ascii=False) + "\n").encode("utf-8")
+            self.al_archivar_journal(datos)
+        except Exception as e:
+            print(f"[WARN] RecordStore: no se pudo archivar el journal: {e}")
+
+    def _vaciar_journal(self) -> None:
+        try:
+            with open(self.journal_path, "wb") as f:
+                f.flush()
+                os.fsync(f.fileno())
+        except FileNotFoundError:
+            pass
+        with self._rw.escritura():
+            self._journal_offset = 0
+            self._journal_entradas = 0
+
+    def reemplazar(self, registros: List[Dict[str, Any]], fieldnames: List[str]) -> None:
+        """
+        Actualiza la cache tras una reescritura completa del CSV por este proceso,
+        sin volver a parsear. El journal queda vacío: el CSV ya es el estado completo
+        (el delta archivado termina con una entrada "reemplazo" con esas filas).
+        Los índices nuevos se arman aparte; el lock en memoria se toma solo para adoptarlos.
+        """
+        nuevo = RecordStore(self.csv_path, fieldnames=self.fieldnames)
+        nuevo._reiniciar()
+        for r in registros:
+            nuevo._agregar_fila(Registro({k: r.get(k) for k in fieldnames}))
+        with self._exclusivo():
+            self._archivar_journal(registros, fieldnames)
+            self._vaciar_journal()
+            with self._rw.escritura():
+                self._adoptar(nuevo._estado())
+                self._firma_csv = self._firma_archivo(self.csv_path)
+                self._version_csv = SCHEMA_VERSION
+                self._migracion_pendiente = False
+            with self._rw.lectura():
+                self._guardar_snapshot()
+
+    def escribir_completo(self, registros: List[Dict[str, Any]], fieldnames: List[str],
+                          desde_seq: Optional[int] = None) -> None:
+        """
+        Reescribe el CSV completo (atómico) y actualiza la cache, todo bajo el lock.
+        Con desde_seq (seq del log de cambios cuando se leyó el estado del que sale
+        'registros'), los cambios registrados después se conservan (ver rebasar).
+        """
+        with self._exclusivo():
+            cambios = []
+            if desde_seq is not None and self.cambios is not None:
+                posteriores = self.cambios.cambios_desde(desde_seq)
+                if posteriores:
+                    with self._leyendo():
+                        actuales = {rid: self._filas[self._claves_id[rid][0]]
+                                    for rid in {str(c.get("id", "")) for c in posteriores}
+                                    if rid in self._claves_id}
+                    registros = rebasar(registros, posteriores, actuales)
+                    print(f"[CSV_HANDLER] Conservados {len({c.get('id') for c in posteriores})} registros "
+                          "modificados durante la sincronización")
+            if self.cambios is not None:
+                # estado anterior al día (otros puestos) para registrar solo las diferencias
+                with self._leyendo():
+                    anteriores = self._lista_actual()
+                cambios = cambios_por_reemplazo(anteriores, registros, fieldnames)
+            escribir_csv_atomico(self.csv_path, registros, fieldnames)
+            self.reemplazar(registros, fieldnames)
+            self._registrar_cambios(cambios)
+
+    def extraer(self, predicado: Callable[[Registro], bool], guardar: Callable[[List[Registro]], None]) -> int:
+        """
+        Saca del store (y del CSV) los registros que cumplen 'predicado', bajo el
+        lock. 'guardar' recibe los extraídos antes de reescribir: si falla, no se
+        quita nada. Los ids que salen se registran como "delete" en el log de
+        cambios (así el push incremental los quita de la hoja). Devuelve cuántos salieron.
+        """
+        with self._exclusivo():
+            with self._leyendo():
+                registros = self._lista_actual()
+            extraidos = []
+            resto = []
+            for r in registros:
+                (extraidos if predicado(r) else resto).append(r)
+            if not extraidos:
+                return 0
+            guardar(extraidos)
+            campos = self.fieldnames or list(extraidos[0].keys())
+            escribir_csv_atomico(self.csv_path, resto, campos)
+            self.reemplazar(resto, campos)
+            quedan = {str(r.get("id", "") or "") for r in resto}
+            salen = {str(r.get("id", "") or "") for r in extraidos} - quedan - {""}
+            self._registrar_cambios([{"op": "delete", "id": i} for i in sorted(salen)])
+            return len(extraidos)
+
+    def compactar(self) -> Tuple[bool, str]:
+        """Vuelca el estado en memoria al CSV canónico y vacía el journal."""
+        with self._exclusivo():
+            with self._leyendo():
+                if not self._journal_entradas and self._tamano_journal() == 0:
+                    return True, "Sin cambios pendientes"
+                registros = self._lista_actual()
+                n = self._journal_entradas
+            try:
+                campos = self.fieldnames or (list(registros[0].keys()) if registros else [])
+                escribir_csv_atomico(self.csv_path, registros, campos)
+            except Exception as e:
+                print(f"[ERROR] RecordStore.compactar: {e}")
+                return False, str(e)
+            self._archivar_journal()
+            self._vaciar_journal()
+            with self._rw.escritura():
+                self._firma_csv = self._firma_archivo(self.csv_path)
+                self._version_csv = SCHEMA_VERSION
+            with self._rw.lectura():
+                self._guardar_snapshot()
+            print(f"[CSV_HANDLER] Journal compactado: {n} operaciones volcadas a {self.csv_path.name}")
+            return True, f"Compactadas {n} operaciones"
+
+    def invalidar(self) -> None:
+        """Fuerza una recarga desde disco en la próxima lectura."""
+        with self._rw.escritura():
+            self._filas = None
+            self._lista = None
+            self._firma_csv = None
+
+    def estadisticas_concurrencia(self) -> Dict[str, Any]:
+        """Contadores del lock en memoria (lecturas/escrituras, esperas y retención en ms)."""
+        return self._rw.estadisticas()
@@ -0,0 +1,163 @@
+"""
+Lock de lectores/escritor entre hilos del mismo proceso, para el store en
+memoria (database/record_store.py): las lecturas corren en paralelo y las
+escrituras son exclusivas.
+
+Uso:
+    with rw.lectura():
+        ...consultar...
+    with rw.escritura():
+        ...modificar...
+
+- Reentrante: el hilo escritor puede volver a tomar escritura o lectura, y un
+  lector puede anidar lecturas. Pasar de lectura a escritura no está permitido
+  (RuntimeError), porque dos lectores que lo intenten a la vez se bloquean.
+- Preferencia de escritores: con un escritor en espera, las lecturas nuevas
+  esperan a que termine, así un flujo continuo de lecturas no lo posterga.
+
+No reemplaza al lock de archivo entre procesos (database/file_lock.py): el
+store toma aquel para serializar escrituras a disco y este solo mientras toca
+las estructuras en memoria.
+"""
+import contextlib
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+# esperas más largas que esto se informan en consola
+_AVISO_ESPERA_SEG = 1.0
+
+
+class BloqueoLectorEscritor:
+    """Lock de lectores/escritor reentrante, con estadísticas de espera y retención."""
+
+    def __init__(self, nombre: str = "store"):
+        self.nombre = nombre
+        self._cond = threading.Condition(threading.Lock())
+        self._lectores = 0
+        self._escritor: Optional[int] = None
+        self._profundidad = 0
+        self._escritores_esperando = 0
+        self._desde = 0.0
+        # lecturas tomadas por el hilo actual (para reentrancia)
+        self._local = threading.local()
+        self._stats = {
+            "lecturas": 0,
+            "lecturas_con_espera": 0,
+            "escrituras": 0,
+            "escrituras_con_espera": 0,
+            "espera_lectura_total_ms": 0.0,
+            "espera_lectura_max_ms": 0.0,
+            "espera_escritura_total_ms": 0.0,
+            "espera_escritura_max_ms": 0.0,
+            "retencion_escritura_total_ms": 0.0,
+            "retencion_escritura_max_ms": 0.0,
+            "lectores_simultaneos_max": 0,
+        }
+
+    def _lecturas_propias(self) -> int:
+        return getattr(self._local, "lecturas", 0)
+
+    def _registrar_espera(self, tipo: str, inicio: float, espero: bool) -> None:
+        """Acumula la espera de una adquisición (se llama con _cond tomado)."""
+        espera = (time.monotonic() - inicio) * 1000
+        self._stats[tipo + "s"] += 1
+        self._stats[f"espera_{tipo}_total_ms"] += espera
+        self._stats[f"espera_{tipo}_max_ms"] = max(self._stats[f"espera_{tipo}_max_ms"], espera)
+        if espero:
+            self._stats[tipo + "s_con_espera"] += 1
+        if espera >= _AVISO_ESPERA_SEG * 1000:
+            print(f"[LOCK] Espera de {espera / 1000:.2f}s por {tipo} en {self.nombre}")
+
+    # ---------------- lectura ----------------
+
+    def adquirir_lectura(self) -> None:
+        yo = threading.get_ident()
+        propias = self._lecturas_propias()
+        inicio = time.monotonic()
+        espero = False
+        with self._cond:
+            if self._escritor != yo and not propias:
+                while self._escritor is not None or self._escritores_esperando:
+                    espero = True
+                    self._cond.wait()
+            self._lectores += 1
+            self._stats["lectores_simultaneos_max"] = max(self._stats["lectores_simultaneos_max"], self._lectores)
+            if not propias:
+                self._registrar_espera("lectura", inicio, espero)
+        self._local.lecturas = propias + 1
+
+    def liberar_lectura(self) -> None:
+        self._local.lecturas = self._lecturas_propias() - 1
+        with self._cond:
+            self._lectores -= 1
+            if not self._lectores:
+                self._cond.notify_all()
+
+    # ---------------- escritura ----------------
+
+    def adquirir_escritura(self) -> None:
+        yo = threading.get_ident()
+        inicio = time.monotonic()
+        espero = False
+        with self._cond:
+            if self._escritor == yo:
+                self._profundidad += 1
+                return
+            if self._lecturas_propias():
+                raise RuntimeError(f"{self.nombre}: no se puede pasar de lectura a escritura")
+            self._escritores_esperando += 1
+            try:
+                while self._escritor is not None or self._lectores:
+                    espero = True
+                    self._cond.wait()
+            finally:
+                self._escritores_esperando -= 1
+            self._escritor = yo
+            self._profundidad = 1
+            self._desde = time.monotonic()
+            self._registrar_espera("escritura", inicio, espero)
+
+    def liberar_escritura(self) -> None:
+        with self._cond:
+            self._profundidad -= 1
+            if self._profundidad:
+                return
+            retencion = (time.monotonic() - self._desde) * 1000
+            self._stats["retencion_escritura_total_ms"] += retencion
+            self._stats["retencion_escritura_max_ms"] = max(self._stats["retencion_escritura_max_ms"], retencion)
+            self._escritor = None
+            self._cond.notify_all()
+
+    # ---------------- API ----------------
+
+    @contextlib.contextmanager
+    def lectura(self) -> Iterator[None]:
+        self.adquirir_lectura()
+        try:
+            yield
+        finally:
+            self.liberar_lectura()
+
+    @contextlib.contextmanager
+    def escritura(self) -> Iterator[None]:
+        self.adquirir_escritura()
+        try:
+            yield
+        finally:
+            self.liberar_escritura()
+
+    def lee_este_hilo(self) -> bool:
+        """True si el hilo actual tiene tomada al menos una lectura."""
+        return self._lecturas_propias() > 0
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores acumulados desde el inicio del proceso (tiempos en ms)."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["lectores_activos"] = self._lectores
+            stats["escritores_esperando"] = self._escritores_esperando
+        stats["espera_lectura_media_ms"] = stats["espera_lectura_total_ms"] / (stats["lecturas"] or 1)
+        stats["espera_escritura_media_ms"] = stats["espera_escritura_total_ms"] / (stats["escrituras"] or 1)
+        stats["retencion_escritura_media_ms"] = stats["retencion_escritura_total_ms"] / (stats["escrituras"] or 1)
+        return stats
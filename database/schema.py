@@ -0,0 +1,100 @@
+"""
+Versiones del layout del CSV de inscripciones y migración de encabezados viejos.
+
+El CSV no guarda su versión: se deduce del encabezado.
+    v1: domicilio, mail, contacto_tutor, año (inscripciones.csv de la primera versión)
+    v2: layout de CSV_FIELDS (direccion, email, telefono_emergencia, anio)
+
+Al leer, las columnas viejas se renombran una sola vez en el encabezado (no por
+fila), así el resto del código lee siempre la clave canónica. El store principal
+reescribe además el archivo en el layout canónico (ver RecordStore con
+migrar_esquema=True), de modo que la traducción ocurre una sola vez.
+"""
+import csv
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+
+SCHEMA_VERSION = 2
+
+# versión -> {columna anterior: columna nueva}
+_MIGRACIONES: Dict[int, Dict[str, str]] = {
+    2: {
+        "domicilio": "direccion",
+        "mail": "email",
+        "contacto_tutor": "telefono_emergencia",
+        "año": "anio",
+    },
+}
+
+
+def version_encabezado(encabezado: List[str]) -> int:
+    """Versión del layout según las columnas presentes."""
+    columnas = {str(c).strip() for c in encabezado}
+    for version in sorted(_MIGRACIONES):
+        if columnas & set(_MIGRACIONES[version]):
+            return version - 1
+    return SCHEMA_VERSION
+
+
+def canonizar_encabezado(encabezado: List[str]) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """
+    Renombra las columnas viejas a las canónicas. Devuelve (encabezado, pares):
+    'pares' son (vieja, nueva) cuando el archivo trae ambas; la vieja se conserva
+    y solo completa la nueva donde esté vacía.
+    """
+    columnas = [str(c).strip() for c in encabezado]
+    pares: List[Tuple[str, str]] = []
+    for version in sorted(_MIGRACIONES):
+        for vieja, nueva in _MIGRACIONES[version].items():
+            if vieja not in columnas:
+                continue
+            if nueva in columnas:
+                pares.append((vieja, nueva))
+            else:
+                columnas[columnas.index(vieja)] = nueva
+    return columnas, pares
+
+
+def canonizar_registro(registro: Mapping[str, Any]) -> Dict[str, Any]:
+    """Copia del registro con las claves viejas pasadas a las canónicas."""
+    encabezado, pares = canonizar_encabezado(list(registro.keys()))
+    fila = dict(zip(encabezado, registro.values()))
+    for vieja, nueva in pares:
+        if not fila.get(nueva):
+            fila[nueva] = fila.get(vieja, "")
+    return fila
+
+
+def lector_csv(f) -> Tuple[Iterator[Dict[str, Any]], int]:
+    """
+    (filas, versión) para un archivo CSV abierto: las filas ya vienen con las
+    claves canónicas, sea cual sea la versión del encabezado.
+    """
+    reader = csv.reader(f)
+    try:
+        encabezado = next(reader)
+    except StopIteration:
+        return iter(()), SCHEMA_VERSION
+    version = version_encabezado(encabezado)
+    columnas, pares = canonizar_encabezado(encabezado)
+    filas = csv.DictReader(f, fieldnames=columnas)
+    if not pares:
+        return filas, version
+
+    def completar():
+        for fila in filas:
+            for vieja, nueva in pares:
+                if not fila.get(nueva):
+                    fila[nueva] = fila.get(vieja, "")
+            yield fila
+
+    return completar(), version
+
+
+def version_csv(path) -> int:
+    """Versión del layout de un CSV en disco (SCHEMA_VERSION si no existe o está vacío)."""
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            encabezado = next(csv.reader(f), None)
+    except OSError:
+        return SCHEMA_VERSION
+    return version_encabezado(encabezado) if encabezado else SCHEMA_VERSION
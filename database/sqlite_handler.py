@@ -0,0 +1,525 @@
+"""
+Backend SQLite (stdlib sqlite3, modo WAL) con la misma API que database.csv_handler.
+Se activa con app.storage_backend = "sqlite"; csv_handler delega aquí sus funciones.
+Las búsquedas por dni/id/materia/profesor/comisión usan índices en lugar de
+recorrer todos los registros, y varios procesos pueden escribir a la vez.
+El CSV sigue siendo el formato de intercambio (Sheets): ver importar_desde_csv /
+exportar_a_csv.
+
+Esquema (v2): los datos del estudiante (CAMPOS_ALUMNO) van en la tabla alumnos y
+cada inscripción en matriculas, que la referencia. Las inscripciones del mismo
+DNI con iguales datos comparten la fila de alumnos. La vista inscripciones
+reconstruye las filas planas de CSV_FIELDS (con triggers INSTEAD OF para
+insertar, modificar y borrar a través de ella), así que las consultas no cambian.
+Una base v1 (tabla plana) se convierte sola al abrirla.
+Las mutaciones se registran en el mismo log de cambios que el backend CSV
+(database/change_log.py).
+"""
+import os
+import sqlite3
+import threading
+import traceback
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Iterable, Callable
+
+from config.settings import CAMBIOS_FILE, CAMPOS_ALUMNO, CSV_FILE, CSV_FIELDS, JOURNAL_FILE, SQLITE_FILE
+from database.change_log import cambio_upsert, cambios_por_reemplazo, obtener_registro_cambios, rebasar
+from database.record_store import RecordStore, escribir_csv_atomico
+
+_SCHEMA_VERSION = 2
+_COLUMNAS = ", ".join(f'"{c}"' for c in CSV_FIELDS)
+_PLACEHOLDERS = ", ".join("?" for _ in CSV_FIELDS)
+
+_CAMPOS_MATRICULA = [c for c in CSV_FIELDS if c not in CAMPOS_ALUMNO]
+_COLUMNAS_ALUMNO = ", ".join(f'"{c}"' for c in CAMPOS_ALUMNO)
+_COLUMNAS_MATRICULA = ", ".join(f'"{c}"' for c in _CAMPOS_MATRICULA)
+# alumno con exactamente estos datos (parámetros en el orden de CAMPOS_ALUMNO)
+_COINCIDE_ALUMNO = " AND ".join(f'"{c}" = ?' for c in CAMPOS_ALUMNO)
+# posiciones en una fila de CSV_FIELDS
+_POS_ALUMNO = [CSV_FIELDS.index(c) for c in CAMPOS_ALUMNO]
+_POS_MATRICULA = [CSV_FIELDS.index(c) for c in _CAMPOS_MATRICULA]
+
+# sqlite3.Connection no se comparte entre hilos: una conexión por hilo
+_local = threading.local()
+_init_lock = threading.Lock()
+
+
+def _crear_esquema(conn: sqlite3.Connection) -> None:
+    def columnas(campos):
+        return ", ".join(f'"{c}" TEXT NOT NULL DEFAULT \'\'' for c in campos)
+
+    def valores_new(campos):
+        return ", ".join(f"IFNULL(NEW.\"{c}\", '')" for c in campos)
+
+    vista = ", ".join(f'{"a" if c in CAMPOS_ALUMNO else "m"}."{c}" AS "{c}"' for c in CSV_FIELDS)
+    coincide_new = " AND ".join(f"\"{c}\" = IFNULL(NEW.\"{c}\", '')" for c in CAMPOS_ALUMNO)
+    alta_alumno = f"""
+            INSERT INTO alumnos ({_COLUMNAS_ALUMNO})
+                SELECT {valores_new(CAMPOS_ALUMNO)}
+                WHERE NOT EXISTS (SELECT 1 FROM alumnos WHERE {coincide_new});"""
+    alumno_new = f"(SELECT alumno FROM alumnos WHERE {coincide_new} ORDER BY alumno DESC LIMIT 1)"
+    asignaciones = ", ".join(f"\"{c}\" = IFNULL(NEW.\"{c}\", '')" for c in _CAMPOS_MATRICULA)
+    # alumnos del DNI anterior que quedaron sin inscripciones
+    huerfanos = ("DELETE FROM alumnos WHERE dni = OLD.dni "
+                 "AND NOT EXISTS (SELECT 1 FROM matriculas m WHERE m.alumno = alumnos.alumno);")
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS alumnos (
+            alumno INTEGER PRIMARY KEY AUTOINCREMENT,
+            {columnas(CAMPOS_ALUMNO)}
+        );
+        CREATE INDEX IF NOT EXISTS idx_alumnos_dni ON alumnos(dni);
+        CREATE TABLE IF NOT EXISTS matriculas (
+            fila INTEGER PRIMARY KEY AUTOINCREMENT,
+            alumno INTEGER NOT NULL REFERENCES alumnos(alumno),
+            {columnas(_CAMPOS_MATRICULA)}
+        );
+        CREATE INDEX IF NOT EXISTS idx_matr_id ON matriculas(id);
+        CREATE INDEX IF NOT EXISTS idx_matr_alumno ON matriculas(alumno);
+        CREATE INDEX IF NOT EXISTS idx_matr_mpc ON matriculas(materia, profesor, comision);
+
+        CREATE VIEW IF NOT EXISTS inscripciones AS
+            SELECT m.fila AS fila, {vista}
+            FROM matriculas m JOIN alumnos a ON a.alumno = m.alumno;
+
+        CREATE TRIGGER IF NOT EXISTS inscripciones_alta INSTEAD OF INSERT ON inscripciones
+        BEGIN{alta_alumno}
+            INSERT INTO matriculas (fila, alumno, {_COLUMNAS_MATRICULA})
+                VALUES (NEW.fila, {alumno_new}, {valores_new(_CAMPOS_MATRICULA)});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS inscripciones_cambio INSTEAD OF UPDATE ON inscripciones
+        BEGIN{alta_alumno}
+            UPDATE matriculas SET alumno = {alumno_new}, {asignaciones}
+                WHERE fila = OLD.fila;
+            {huerfanos}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS inscripciones_baja INSTEAD OF DELETE ON inscripciones
+        BEGIN
+            DELETE FROM matriculas WHERE fila = OLD.fila;
+            {huerfanos}
+        END;
+    """)
+
+
+def _insertar(conn: sqlite3.Connection, registros: Iterable[Dict[str, Any]]) -> int:
+    """
+    Alta masiva de filas planas repartidas en alumnos/matriculas (sin pasar por
+    los triggers de la vista): los datos de estudiante repetidos se guardan una vez.
+    """
+    alumnos: Dict[Tuple[str, ...], int] = {}
+    matriculas = []
+    for registro in registros:
+        fila = _fila(registro)
+        perfil = tuple(fila[i] for i in _POS_ALUMNO)
+        alumno = alumnos.get(perfil)
+        if alumno is None:
+            previo = conn.execute(f"SELECT alumno FROM alumnos WHERE {_COINCIDE_ALUMNO} "
+                                  "ORDER BY alumno DESC LIMIT 1", perfil).fetchone()
+            if previo is not None:
+                alumno = previo[0]
+            else:
+                alumno = conn.execute(f"INSERT INTO alumnos ({_COLUMNAS_ALUMNO}) VALUES "
+                                      f"({', '.join('?' for _ in CAMPOS_ALUMNO)})", perfil).lastrowid
+            alumnos[perfil] = alumno
+        matriculas.append((alumno,) + tuple(fila[i] for i in _POS_MATRICULA))
+    conn.executemany(f"INSERT INTO matriculas (alumno, {_COLUMNAS_MATRICULA}) "
+                     f"VALUES (?, {', '.join('?' for _ in _CAMPOS_MATRICULA)})", matriculas)
+    return len(matriculas)
+
+
+def _vaciar(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM matriculas")
+    conn.execute("DELETE FROM alumnos")
+
+
+def _convertir_v1(conn: sqlite3.Connection) -> None:
+    """Pasa la tabla plana de la versión 1 al esquema alumnos/matriculas, en el mismo orden."""
+    conn.execute("ALTER TABLE inscripciones RENAME TO inscripciones_v1")
+    _crear_esquema(conn)
+    with conn:
+        n = _insertar(conn, (_a_dict(row) for row in conn.execute(
+            f"SELECT {_COLUMNAS} FROM inscripciones_v1 ORDER BY fila")))
+        conn.execute("DROP TABLE inscripciones_v1")
+    alumnos = conn.execute("SELECT COUNT(*) FROM alumnos").fetchone()[0]
+    conn.execute("VACUUM")
+    print(f"[SQLITE] Esquema v2: {n} inscripciones, {alumnos} registros de alumnos")
+
+
+def _conexion() -> sqlite3.Connection:
+    """Conexión del hilo actual; crea el esquema e importa el CSV la primera vez."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+    SQLITE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(SQLITE_FILE), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with _init_lock:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < _SCHEMA_VERSION:
+            if version == 1:
+                _convertir_v1(conn)
+            else:
+                _crear_esquema(conn)
+            if version == 0 and CSV_FILE.exists():
+                _importar(conn, str(CSV_FILE))
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+    _local.conn = conn
+    return conn
+
+
+def _fila(registro: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple("" if registro.get(k) is None else str(registro.get(k)) for k in CSV_FIELDS)
+
+
+def _a_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    return {k: row[k] for k in CSV_FIELDS}
+
+
+def _seleccionar(where: str = "", params: Tuple = (), orden: str = "fila") -> List[Dict[str, Any]]:
+    sql = f"SELECT {_COLUMNAS} FROM inscripciones"
+    if where:
+        sql += f" WHERE {where}"
+    sql += f" ORDER BY {orden}"
+    return [_a_dict(row) for row in _conexion().execute(sql, params)]
+
+
+def _registrar_cambios(cambios: List[Dict[str, Any]]) -> None:
+    if not cambios:
+        return
+    try:
+        obtener_registro_cambios(CAMBIOS_FILE).agregar(cambios)
+    except Exception as e:
+        print(f"[WARN] sqlite: no se pudo registrar en el log de cambios: {e}")
+
+
+def _importar(conn: sqlite3.Connection, csv_path: str) -> int:
+    # RecordStore reaplica el journal pendiente del backend CSV, si lo hay
+    filas = RecordStore(csv_path, fieldnames=CSV_FIELDS).registros()
+    with conn:
+        _vaciar(conn)
+        _insertar(conn, filas)
+    print(f"[SQLITE] Importados {len(filas)} registros desde {csv_path}")
+    return len(filas)
+
+
+# ---------------- importación / exportación CSV ----------------
+
+def importar_desde_csv(csv_path: Optional[str] = None) -> Tuple[bool, str]:
+    """Reemplaza el contenido de la base con el CSV indicado (por defecto CSV_FILE)."""
+    try:
+        csv_path = csv_path or str(CSV_FILE)
+        if not os.path.exists(csv_path):
+            return False, f"No existe {csv_path}"
+        conn = _conexion()
+        anteriores = [_a_dict(row) for row in conn.execute(f"SELECT {_COLUMNAS} FROM inscripciones ORDER BY fila")]
+        n = _importar(conn, csv_path)
+        _registrar_cambios(cambios_por_reemplazo(anteriores, _seleccionar(), CSV_FIELDS))
+        return True, f"Importados {n} registros"
+    except Exception as e:
+        traceback.print_exc()
+        return False, str(e)
+
+
+def exportar_a_csv(csv_path: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Vuelca la base a CSV con el layout de CSV_FIELDS (por defecto sobre CSV_FILE,
+    para Sheets o para volver al backend CSV).
+    """
+    try:
+        csv_path = csv_path or str(CSV_FILE)
+        registros = cargar_registros()
+        escribir_csv_atomico(csv_path, registros, CSV_FIELDS)
+        if os.path.abspath(csv_path) == os.path.abspath(str(CSV_FILE)) and JOURNAL_FILE.exists():
+            # el journal del backend CSV ya no corresponde al CSV exportado
+            JOURNAL_FILE.unlink()
+        print(f"[SQLITE] Exportados {len(registros)} registros a {csv_path}")
+        return True, f"Exportados {len(registros)} registros"
+    except Exception as e:
+        traceback.print_exc()
+        return False, str(e)
+
+
+# ---------------- API equivalente a csv_handler ----------------
+
+def cargar_registros() -> List[Dict[str, Any]]:
+    try:
+        return _seleccionar()
+    except Exception as e:
+        print(f"[ERROR] sqlite cargar_registros: {e}")
+        return []
+
+
+def guardar_todos_registros(registros: List[Dict[str, Any]], desde_seq: Optional[int] = None) -> Tuple[bool, str]:
+    try:
+        conn = _conexion()
+        with conn:
+            anteriores = [_a_dict(row) for row in conn.execute(f"SELECT {_COLUMNAS} FROM inscripciones ORDER BY fila")]
+            if desde_seq is not None:
+                # conservar lo modificado después de armar 'registros' (ver csv_handler)
+                posteriores = obtener_registro_cambios(CAMBIOS_FILE).cambios_desde(desde_seq)
+                if posteriores:
+                    actuales: Dict[str, Dict[str, Any]] = {}
+                    for r in anteriores:
+                        actuales.setdefault(str(r.get("id", "")), r)
+                    registros = rebasar(registros, posteriores, actuales)
+            _vaciar(conn)
+            _insertar(conn, registros)
+        _registrar_cambios(cambios_por_reemplazo(anteriores, registros, CSV_FIELDS))
+        print(f"[SQLITE] Guardados {len(registros)} registros")
+        return True, "OK"
+    except Exception as e:
+        traceback.print_exc()
+        return False, str(e)
+
+
+def _upsert(conn: sqlite3.Connection, registro: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Inserta o reemplaza la primera fila con ese id; devuelve el cambio para el log (o None)."""
+    previa = conn.execute(
+        f"SELECT fila, {_COLUMNAS} FROM inscripciones WHERE id = ? ORDER BY fila LIMIT 1",
+        (str(registro.get("id", "")),)).fetchone()
+    if previa is not None:
+        asignaciones = ", ".join(f'"{c}" = ?' for c in CSV_FIELDS)
+        conn.execute(f"UPDATE inscripciones SET {asignaciones} WHERE fila = ?", _fila(registro) + (previa["fila"],))
+    else:
+        conn.execute(f"INSERT INTO inscripciones ({_COLUMNAS}) VALUES ({_PLACEHOLDERS})", _fila(registro))
+    return cambio_upsert(_a_dict(previa) if previa is not None else None, registro, CSV_FIELDS)
+
+
+def guardar_registro(registro: Dict[str, Any]) -> Tuple[bool, str]:
+    """Inserta o reemplaza (por id) un registro. El id/fecha ya vienen resueltos por csv_handler."""
+    try:
+        conn = _conexion()
+        with conn:
+            cambio = _upsert(conn, registro)
+        _registrar_cambios([cambio] if cambio else [])
+        return True, "OK"
+    except Exception as e:
+        return False, f"Error al guardar registro: {e}"
+
+
+def actualizar_registro(datos: Dict[str, Any]) -> Tuple[bool, str]:
+    try:
+        reg_id = datos.get("id")
+        if not reg_id:
+            return False, "El registro debe incluir 'id' para actualizar"
+        conn = _conexion()
+        with conn:
+            actual = buscar_por_id(reg_id)
+            if actual is None:
+                return False, f"Registro con id '{reg_id}' no encontrado"
+            cambio = _upsert(conn, {k: datos.get(k, actual.get(k, "")) for k in CSV_FIELDS})
+        _registrar_cambios([cambio] if cambio else [])
+        return True, "OK"
+    except Exception as e:
+        return False, str(e)
+
+
+def eliminar_registro(reg_id: str) -> Tuple[bool, str]:
+    try:
+        conn = _conexion()
+        with conn:
+            # rowcount no cuenta las filas borradas por el trigger de la vista
+            antes = conn.total_changes
+            conn.execute("DELETE FROM inscripciones WHERE id = ?", (str(reg_id),))
+            borradas = conn.total_changes - antes
+        if borradas == 0:
+            return False, f"Registro con id '{reg_id}' no encontrado"
+        _registrar_cambios([{"op": "delete", "id": str(reg_id)}])
+        return True, "OK"
+    except Exception as e:
+        return False, str(e)
+
+
+def guardar_registros_lote(registros: List[Dict[str, Any]]) -> Tuple[bool, str]:
+    try:
+        conn = _conexion()
+        with conn:
+            cambios = [_upsert(conn, registro) for registro in registros]
+        _registrar_cambios([c for c in cambios if c])
+        return True, f"Guardados {len(registros)} registros"
+    except Exception as e:
+        return False, f"Error al guardar lote: {e}"
+
+
+def actualizar_registros_lote(lista_datos: List[Dict[str, Any]]) -> Tuple[bool, str]:
+    try:
+        conn = _conexion()
+        cambios = []
+        with conn:
+            faltantes = []
+            for datos in lista_datos:
+                actual = buscar_por_id(datos.get("id")) if datos.get("id") else None
+                if actual is None:
+                    faltantes.append(str(datos.get("id") or ""))
+                    continue
+                cambios.append(_upsert(conn, {k: datos.get(k, actual.get(k, "")) for k in CSV_FIELDS}))
+            if faltantes:
+                # deshacer la transacción completa
+                raise LookupError(f"Registros no encontrados: {', '.join(faltantes[:5])}")
+        _registrar_cambios([c for c in cambios if c])
+        return True, f"Actualizados {len(lista_datos)} registros"
+    except Exception as e:
+        return False, str(e)
+
+
+def eliminar_registros_lote(ids: List[str]) -> Tuple[bool, str]:
+    try:
+        ids_unicos = list(dict.fromkeys(str(i) for i in ids if i))
+        conn = _conexion()
+        with conn:
+            encontrados: List[str] = []
+            for inicio in range(0, len(ids_unicos), 500):
+                bloque = ids_unicos[inicio:inicio + 500]
+                marcas = ", ".join("?" for _ in bloque)
+                encontrados.extend(row[0] for row in conn.execute(
+                    f"SELECT DISTINCT id FROM inscripciones WHERE id IN ({marcas})", bloque))
+                conn.execute(f"DELETE FROM inscripciones WHERE id IN ({marcas})", bloque)
+        if not encontrados:
+            return False, "Ningún registro encontrado para eliminar"
+        _registrar_cambios([{"op": "delete", "id": i} for i in encontrados])
+        return True, f"Eliminados {len(encontrados)} registros"
+    except Exception as e:
+        return False, str(e)
+
+
+def extraer(predicado: Callable[[Dict[str, Any]], bool], guardar: Callable[[List[Dict[str, Any]]], None]) -> int:
+    """Equivalente a RecordStore.extraer: quita las filas que cumplen 'predicado' (ids salientes como "delete")."""
+    conn = _conexion()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        filas = []
+        extraidos = []
+        quedan = set()
+        for row in conn.execute(f"SELECT fila, {_COLUMNAS} FROM inscripciones ORDER BY fila"):
+            registro = _a_dict(row)
+            if predicado(registro):
+                filas.append(row["fila"])
+                extraidos.append(registro)
+            else:
+                quedan.add(str(registro.get("id", "") or ""))
+        if not extraidos:
+            return 0
+        guardar(extraidos)
+        for inicio in range(0, len(filas), 500):
+            bloque = filas[inicio:inicio + 500]
+            conn.execute(f"DELETE FROM inscripciones WHERE fila IN ({', '.join('?' for _ in bloque)})", bloque)
+    salen = {str(r.get("id", "") or "") for r in extraidos} - quedan - {""}
+    _registrar_cambios([{"op": "delete", "id": i} for i in sorted(salen)])
+    return len(extraidos)
+
+
+def ids_con_prefijo(prefijo: str, limite: Optional[int] = None) -> List[str]:
+    """Ids distintos con ese prefijo (vista inscripciones), por rango sobre idx_matr_id de matriculas (id >= p AND id < p+1)."""
+    prefijo = str(prefijo)
+    if prefijo:
+        sql = "SELECT DISTINCT id FROM inscripciones WHERE id >= ? AND id < ? ORDER BY id"
+        params: Tuple = (prefijo, prefijo[:-1] + chr(ord(prefijo[-1]) + 1))
+    else:
+        sql = "SELECT DISTINCT id FROM inscripciones WHERE id <> '' ORDER BY id"
+        params = ()
+    if limite is not None:
+        sql += f" LIMIT {int(limite)}"
+    return [row[0] for row in _conexion().execute(sql, params)]
+
+
+def buscar_por_dni(dni: str) -> List[Dict[str, Any]]:
+    return _seleccionar("dni = ?", (str(dni),))
+
+
+def obtener_alumno(dni: str) -> Optional[Dict[str, Any]]:
+    """Datos del estudiante de su inscripción más reciente (índices de dni y de alumno)."""
+    row = _conexion().execute(
+        "SELECT " + ", ".join(f'a."{c}"' for c in CAMPOS_ALUMNO) + " FROM alumnos a "
+        "JOIN matriculas m ON m.alumno = a.alumno WHERE a.dni = ? ORDER BY m.fila DESC LIMIT 1",
+        (str(dni),)).fetchone()
+    return {c: row[c] for c in CAMPOS_ALUMNO} if row is not None else None
+
+
+def actualizar_alumno(dni: str, datos: Dict[str, Any]) -> int:
+    """
+    Equivalente a RecordStore.actualizar_alumno: deja un solo registro de alumnos
+    para el DNI, con los datos nuevos, y todas sus inscripciones apuntando a él.
+    Devuelve cuántas inscripciones tiene el DNI.
+    """
+    dni = str(dni)
+    datos = {k: ("" if v is None else str(v)) for k, v in datos.items() if k in CAMPOS_ALUMNO and k != "dni"}
+    conn = _conexion()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        anteriores = _seleccionar("dni = ?", (dni,))
+        if not anteriores:
+            return 0
+        perfil = {c: anteriores[-1][c] for c in CAMPOS_ALUMNO}
+        perfil.update(datos)
+        alumno = conn.execute(f"INSERT INTO alumnos ({_COLUMNAS_ALUMNO}) VALUES "
+                              f"({', '.join('?' for _ in CAMPOS_ALUMNO)})",
+                              tuple(perfil[c] for c in CAMPOS_ALUMNO)).lastrowid
+        conn.execute("UPDATE matriculas SET alumno = ? WHERE alumno IN "
+                     "(SELECT alumno FROM alumnos WHERE dni = ? AND alumno <> ?)", (alumno, dni, alumno))
+        conn.execute("DELETE FROM alumnos WHERE dni = ? AND alumno <> ?", (dni, alumno))
+    cambios = [cambio_upsert(r, dict(r, **datos), CSV_FIELDS) for r in anteriores]
+    _registrar_cambios([c for c in cambios if c])
+    return len(anteriores)
+
+
+def buscar_por_id(reg_id: str) -> Optional[Dict[str, Any]]:
+    filas = _seleccionar("id = ?", (str(reg_id),))
+    return filas[0] if filas else None
+
+
+def contar_inscripciones_materia(materia: str, profesor: Optional[str] = None,
+                                 comision: Optional[str] = None) -> int:
+    condiciones = ["materia = ?", "en_lista_espera <> 'Sí'"]
+    params: List[Any] = [materia]
+    if profesor:
+        condiciones.append("profesor = ?")
+        params.append(profesor)
+    if comision:
+        condiciones.append("comision = ?")
+        params.append(comision)
+    sql = "SELECT COUNT(*) FROM inscripciones WHERE " + " AND ".join(condiciones)
+    return int(_conexion().execute(sql, tuple(params)).fetchone()[0])
+
+
+def obtener_historial_alumno(dni: str) -> List[Dict[str, Any]]:
+    return _seleccionar("dni = ?", (str(dni),), orden="fecha_inscripcion DESC")
+
+
+def iter_registros(filtros: Optional[Dict[str, Any]] = None,
+                   campos: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Versión SQL de csv_handler.iter_registros: WHERE y SELECT de columnas en la base, cursor perezoso."""
+    pedidos = list(campos) if campos else list(CSV_FIELDS)
+    conocidos = set(CSV_FIELDS)
+    columnas = [c for c in pedidos if c in conocidos] or ["fila"]
+    condiciones = []
+    params: List[Any] = []
+    for campo, valor in (filtros or {}).items():
+        if valor is None:
+            continue
+        if campo not in conocidos:
+            # columna inexistente: solo coincide con ""
+            valores = valor if isinstance(valor, (list, tuple, set, frozenset)) else [valor]
+            if "" not in ("" if v is None else str(v) for v in valores):
+                return
+            continue
+        if isinstance(valor, (list, tuple, set, frozenset)):
+            valores = ["" if v is None else str(v) for v in valor]
+            if not valores:
+                return
+            condiciones.append(f'"{campo}" IN ({", ".join("?" for _ in valores)})')
+            params.extend(valores)
+        else:
+            condiciones.append(f'"{campo}" = ?')
+            params.append(str(valor))
+    sql = "SELECT " + ", ".join(f'"{c}"' for c in columnas) + " FROM inscripciones"
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    sql += " ORDER BY fila"
+    for row in _conexion().execute(sql, tuple(params)):
+        yield {c: (row[c] if c in conocidos else "") for c in pedidos}
+
+
+def exportar_listado(filtros: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    return list(iter_registros(filtros))
@@ -1,27 +1,32 @@
 """
 Script para generar listados PDF masivos de TODOS los profesores y cátedras.
-Lee directamente desde data/inscripciones_sheets.csv y genera un PDF por cada combinación materia-profesor.
+Agrupa las inscripciones locales sobre el snapshot columnar (services/analitica.py),
+o lee un CSV indicado (p. ej. data/inscripciones_sheets.csv), y genera un PDF por
+cada combinación materia-profesor.
 """
 
-import csv
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 from services.pdf_generator import generar_listado_pdf
 from config.settings import DATA_DIR
+from database.csv_handler import iter_registros
+from services import analitica
+
+# Columnas que usan el agrupado y generar_listado_pdf (el resto no se carga)
+CAMPOS_LISTADO = [
+    "apellido", "nombre", "dni", "email", "legajo",
+    "materia", "profesor", "comision", "turno", "anio",
+]
 
 def cargar_csv_completo(csv_path):
-    """Carga CSV completo sin filtros."""
-    registros = []
-    print(f"[LOAD] Cargando desde {csv_path}...")
-    
-    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            registros.append(dict(row))
-    
-    print(f"[LOAD] ✓ Cargados {len(registros)} registros")
-    return registros
+    """Recorre el CSV fila a fila (solo CAMPOS_LISTADO), sin cargarlo completo."""
+    print(f"[LOAD] Leyendo desde {csv_path}...")
+    total = 0
+    for row in iter_registros(campos=CAMPOS_LISTADO, csv_path=str(csv_path)):
+        total += 1
+        yield row
+    print(f"[LOAD] ✓ Leídos {total} registros")
 
 def agrupar_por_materia_profesor_comision(registros):
     """
@@ -62,18 +67,20 @@ def agrupar_por_materia_profesor_comision(registros):
     
     return grupos_finales
 
+def agrupar_desde_snapshot():
+    """Mismo agrupado que agrupar_por_materia_profesor_comision, hecho sobre el snapshot."""
+    grupos = analitica.agrupar(["materia", "profesor", "comision"], CAMPOS_LISTADO, normalizar=True)
+    # Saltar registros sin materia o profesor
+    return {clave: regs for clave, regs in grupos.items() if clave[0] and clave[1]}
+
 def generar_listados_masivos(csv_path=None, output_dir=None):
     """
     Genera PDFs para TODAS las combinaciones materia-profesor.
     
     Args:
-        csv_path: Ruta al CSV (default: data/inscripciones_sheets.csv)
+        csv_path: Ruta al CSV (default: inscripciones locales, vía snapshot)
         output_dir: Carpeta de salida (default: data/reports/)
     """
-    # Configurar rutas
-    if csv_path is None:
-        csv_path = DATA_DIR / "inscripciones_sheets.csv"
-    
     if output_dir is None:
         output_dir = DATA_DIR / "reports"
     
@@ -85,16 +92,17 @@ def generar_listados_masivos(csv_path=None, output_dir=None):
     print("GENERACIÓN MASIVA DE LISTADOS PDF")
     print("="*70 + "\n")
     
-    # Cargar datos
-    registros = cargar_csv_completo(csv_path)
+    # Agrupar por materia-profesor-comisión (en una sola pasada si se lee un CSV)
+    print("[AGRUPANDO] Por materia, profesor y comisión...")
+    if csv_path is None:
+        grupos = agrupar_desde_snapshot()
+    else:
+        grupos = agrupar_por_materia_profesor_comision(cargar_csv_completo(csv_path))
     
-    if not registros:
+    if not grupos:
         print("❌ No se encontraron registros en el CSV")
         return
     
-    # Agrupar por materia-profesor-comisión
-    print("\n[AGRUPANDO] Por materia, profesor y comisión...")
-    grupos = agrupar_por_materia_profesor_comision(registros)
     print(f"[AGRUPANDO] ✓ Encontradas {len(grupos)} combinaciones materia-profesor-comisión\n")
     
     # Generar PDF para cada grupo
@@ -161,8 +169,8 @@ def generar_listado_por_materia(materia, csv_path=None, output_dir=None):
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Cargar y filtrar
-    registros = cargar_csv_completo(csv_path)
-    filtrados = [r for r in registros if str(r.get('materia', '')).strip().lower() == materia.strip().lower()]
+    buscado = materia.strip().lower()
+    filtrados = [r for r in cargar_csv_completo(csv_path) if str(r.get('materia', '')).strip().lower() == buscado]
     
     if not filtrados:
         print(f"❌ No se encontraron registros para la materia: {materia}")
@@ -207,8 +215,8 @@ def generar_listado_por_profesor(profesor, csv_path=None, output_dir=None):
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Cargar y filtrar
-    registros = cargar_csv_completo(csv_path)
-    filtrados = [r for r in registros if str(r.get('profesor', '')).strip().lower() == profesor.strip().lower()]
+    buscado = profesor.strip().lower()
+    filtrados = [r for r in cargar_csv_completo(csv_path) if str(r.get('profesor', '')).strip().lower() == buscado]
     
     if not filtrados:
         print(f"❌ No se encontraron registros para el profesor: {profesor}")
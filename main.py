@@ -1,3 +1,4 @@
+import multiprocessing
 import tkinter as tk
 from ui.app import InscripcionApp
 from ui.window_utils import enable_windows_dpi_awareness, adapt_scaling, setup_window_geometry
@@ -16,4 +17,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # en el ejecutable, los procesos del pool de carga de CSV no deben abrir otra ventana
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
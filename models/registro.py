@@ -0,0 +1,178 @@
+"""
+Registro de inscripción compacto, usado por el store en memoria (database/record_store.py).
+
+- Los valores se guardan en dos tuplas, sin un dict por fila: los datos del
+  estudiante (CAMPOS_ALUMNO) y los de la inscripción (el resto de CSV_FIELDS).
+  El store comparte la tupla del estudiante entre todas las inscripciones del
+  mismo DNI con iguales datos: un alumno en cinco materias guarda su perfil una vez.
+- Los textos que se repiten en miles de filas (materia, profesor, turno, comisión...)
+  se internan: todas las filas comparten el mismo objeto str.
+- anio, fecha_inscripcion y en_lista_espera se parsean una sola vez al cargar
+  (atributos anio_num, fecha y en_espera).
+
+Es de solo lectura y se comporta como un Mapping (la vista plana de siempre):
+r["materia"], r.get(...), keys()/items(), dict(r) y "campo" in r funcionan igual
+que con el dict original, en el orden de CSV_FIELDS.
+Las columnas que no están en CSV_FIELDS (CSV viejos) se conservan aparte.
+"""
+import operator
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from config.settings import CAMPOS_ALUMNO, CSV_FIELDS
+
+CAMPOS_INSCRIPCION = [c for c in CSV_FIELDS if c not in CAMPOS_ALUMNO]
+
+# posición de cada campo en (datos del alumno + datos de la inscripción)
+_N_ALUMNO = len(CAMPOS_ALUMNO)
+_INDICE: Dict[str, int] = {campo: i for i, campo in enumerate(CAMPOS_ALUMNO + CAMPOS_INSCRIPCION)}
+_ORDEN_CSV = operator.itemgetter(*(_INDICE[c] for c in CSV_FIELDS))
+_VACIO = ("",) * len(CSV_FIELDS)
+
+# columnas con pocos valores distintos: se internan
+_CAMPOS_INTERNADOS = frozenset([
+    "anio", "turno", "materia", "profesor", "comision", "horario", "en_lista_espera",
+    "saeta", "obra_social", "seguro_escolar", "pago_voluntario", "monto", "permiso",
+])
+
+_VALORES_ESPERA = ("sí", "si", "yes", "true")
+
+
+def parsear_anio(valor: Any) -> Optional[int]:
+    """'3' / '3.0' / '3°' -> 3; None si no hay número."""
+    texto = str(valor or "").strip()
+    digitos = ""
+    for c in texto:
+        if not c.isdigit():
+            break
+        digitos += c
+    return int(digitos) if digitos else None
+
+
+def parsear_fecha(valor: Any) -> Optional[datetime]:
+    """ISO 8601 (con o sin 'Z'/zona) -> datetime local sin zona; None si no se puede parsear."""
+    texto = str(valor or "").strip()
+    if not texto:
+        return None
+    try:
+        fecha = datetime.fromisoformat(texto.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone().replace(tzinfo=None)
+    return fecha
+
+
+def es_lista_espera(valor: Any) -> bool:
+    return str(valor or "").strip().lower() in _VALORES_ESPERA
+
+
+def _texto(campo: str, valor: Any) -> str:
+    if valor is None:
+        return ""
+    valor = valor if isinstance(valor, str) else str(valor)
+    return sys.intern(valor) if campo in _CAMPOS_INTERNADOS else valor
+
+
+def perfil_alumno(datos: Mapping) -> Tuple[str, ...]:
+    """Tupla de datos del estudiante (orden de CAMPOS_ALUMNO) a partir de un registro o dict."""
+    return tuple(_texto(campo, datos.get(campo)) for campo in CAMPOS_ALUMNO)
+
+
+class Registro(Mapping):
+    """Fila de inscripciones inmutable y compacta (ver docstring del módulo)."""
+
+    __slots__ = ("_alumno", "_valores", "_extra", "anio_num", "fecha", "en_espera")
+
+    def __init__(self, datos: Mapping):
+        valores = list(_VACIO)
+        extra = None
+        for campo, valor in datos.items():
+            i = _INDICE.get(campo)
+            if i is not None:
+                valores[i] = _texto(campo, valor)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[campo] = "" if valor is None else valor
+        self._alumno = tuple(valores[:_N_ALUMNO])
+        self._valores = tuple(valores[_N_ALUMNO:])
+        self._extra = extra
+        self.anio_num = parsear_anio(valores[_INDICE["anio"]])
+        self.fecha = parsear_fecha(valores[_INDICE["fecha_inscripcion"]])
+        self.en_espera = es_lista_espera(valores[_INDICE["en_lista_espera"]])
+
+    def __getitem__(self, campo: str) -> Any:
+        i = _INDICE.get(campo)
+        if i is not None:
+            return self._alumno[i] if i < _N_ALUMNO else self._valores[i - _N_ALUMNO]
+        if self._extra is not None and campo in self._extra:
+            return self._extra[campo]
+        raise KeyError(campo)
+
+    def get(self, campo: str, default: Any = None) -> Any:
+        i = _INDICE.get(campo)
+        if i is not None:
+            return self._alumno[i] if i < _N_ALUMNO else self._valores[i - _N_ALUMNO]
+        if self._extra is not None:
+            return self._extra.get(campo, default)
+        return default
+
+    def __contains__(self, campo: object) -> bool:
+        return campo in _INDICE or (self._extra is not None and campo in self._extra)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from CSV_FIELDS
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return len(CSV_FIELDS) + (len(self._extra) if self._extra is not None else 0)
+
+    def __repr__(self) -> str:
+        return f"Registro({self.a_dict()!r})"
+
+    def __reduce__(self):
+        # estado compacto para el snapshot binario del store (pickle)
+        # (pickle guarda una sola vez la tupla del alumno compartida entre filas)
+        return (_restaurar, (self._alumno, self._valores, self._extra, self.anio_num, self.fecha, self.en_espera))
+
+    @property
+    def perfil(self) -> Tuple[str, ...]:
+        """Datos del estudiante en el orden de CAMPOS_ALUMNO (tupla compartida, ver el store)."""
+        return self._alumno
+
+    def datos_alumno(self) -> Dict[str, str]:
+        """Datos del estudiante como dict (CAMPOS_ALUMNO)."""
+        return dict(zip(CAMPOS_ALUMNO, self._alumno))
+
+    def con_perfil(self, perfil: Tuple[str, ...]) -> "Registro":
+        """
+        Registro nuevo con los datos del estudiante reemplazados por 'perfil' (ver
+        perfil_alumno). Aunque los datos sean iguales se arma otro con la tupla de
+        'perfil', para que el store la comparta entre las filas del DNI; el
+        original no se modifica (puede estar en una lista ya entregada).
+        """
+        if perfil is self._alumno:
+            return self
+        return _restaurar(perfil, self._valores, self._extra, self.anio_num, self.fecha, self.en_espera)
+
+    def a_dict(self) -> Dict[str, Any]:
+        """Copia como dict común (modificable), en el orden de CSV_FIELDS."""
+        d = dict(zip(CSV_FIELDS, _ORDEN_CSV(self._alumno + self._valores)))
+        if self._extra is not None:
+            d.update(self._extra)
+        return d
+
+
+def _restaurar(alumno, valores, extra, anio_num, fecha, en_espera) -> Registro:
+    r = Registro.__new__(Registro)
+    r._alumno = alumno
+    r._valores = valores
+    r._extra = extra
+    r.anio_num = anio_num
+    r.fecha = fecha
+    r.en_espera = en_espera
+    return r
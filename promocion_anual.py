@@ -0,0 +1,53 @@
+"""
+Script de promoción anual: reinscribe a los alumnos de un año en las materias
+del año siguiente (ver services/promocion.py).
+
+Por defecto es una simulación: muestra el reporte y deja el detalle en
+data/reports/promocion_<año>_a_<año+1>_<fecha>.csv. Con --aplicar guarda todas
+las inscripciones en un solo lote y sincroniza Google Sheets una vez.
+"""
+import argparse
+from pathlib import Path
+
+from services.promocion import aplicar_promocion, guardar_reporte, proponer_promocion, resumen
+
+
+def _leer_dnis(path):
+    """DNI de un archivo de texto (uno por línea o separados por comas)."""
+    if not path:
+        return None
+    texto = Path(path).read_text(encoding="utf-8-sig")
+    return [d.strip() for d in texto.replace(",", "\n").splitlines() if d.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Promoción anual de alumnos al año siguiente")
+    parser.add_argument("anio", type=int, help="Año que cursaron (se inscriben en anio+1)")
+    parser.add_argument("--ciclo", type=int, default=None, help="Ciclo de origen (por defecto el anterior al actual)")
+    parser.add_argument("--excluir", help="Archivo con DNI que no se promueven")
+    parser.add_argument("--aprobados", help="Archivo con los únicos DNI a promover")
+    parser.add_argument("--incluir-sin-fecha", action="store_true",
+                        help="Tomar también las inscripciones sin fecha")
+    parser.add_argument("--aplicar", action="store_true", help="Guardar las inscripciones (sin esto es una simulación)")
+    parser.add_argument("--sin-sync", action="store_true", help="No sincronizar con Google Sheets al aplicar")
+    args = parser.parse_args()
+
+    excluir = _leer_dnis(args.excluir)
+    aprobados = _leer_dnis(args.aprobados)
+
+    if args.aplicar:
+        ok, msg = aplicar_promocion(args.anio, args.ciclo, excluir, aprobados,
+                                    args.incluir_sin_fecha, sincronizar=not args.sin_sync)
+        print(msg)
+        print("\n✅ Promoción aplicada\n" if ok else "\n❌ No se aplicó la promoción\n")
+        return
+
+    reporte = proponer_promocion(args.anio, args.ciclo, excluir, aprobados, args.incluir_sin_fecha)
+    print(resumen(reporte))
+    path = guardar_reporte(reporte)
+    print(f"\n[SIMULACIÓN] Detalle en {path}")
+    print("Para guardar las inscripciones volvé a correr con --aplicar\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Snapshot columnar de las inscripciones para estadísticas y agrupados.
+
+Un DataFrame de pandas con todas las columnas de CSV_FIELDS más:
+    en_espera (bool), ciclo (Int64, ver database/archivo.py) y archivado (bool).
+Incluye la partición activa y los ciclos archivados; por defecto las consultas
+miran solo la activa (incluir_archivo=False).
+
+Se mantiene al día con el log de cambios (database/change_log.py): antes de cada
+consulta se aplican los cambios con seq posterior al del snapshot, releyendo solo
+los ids tocados. Si cambian las particiones archivadas se reconstruye completo.
+Un hilo (iniciar_actualizacion_automatica) lo persiste en data/analitica/ como
+Parquet (o Feather, o pickle si no hay pyarrow) para no reconstruirlo al iniciar.
+
+Sin pandas, las mismas funciones recorren los registros en Python.
+"""
+import json
+import os
+import threading
+import traceback
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from config.settings import ANALITICA_DIR, CSV_FIELDS
+from database.archivo import archivo, ciclo_de, listar_particiones, mes_inicio_ciclo
+from database.csv_handler import iter_registros, obtener_cambios_desde, ultimo_seq
+from models.registro import es_lista_espera
+
+try:
+    import pandas as pd
+    _HAS_PANDAS = True
+except ImportError:
+    pd = None
+    _HAS_PANDAS = False
+
+_META_FILE = ANALITICA_DIR / "inscripciones.meta.json"
+# (formato, extensión) en orden de preferencia
+_FORMATOS = (("parquet", ".parquet"), ("feather", ".feather"), ("pickle", ".pkl"))
+# con más cambios pendientes que esto conviene reconstruir
+_MAX_CAMBIOS_INCREMENTAL = 5000
+
+_lock = threading.RLock()
+_df = None
+_seq = 0
+_firma_archivo: List[Tuple[str, int, int]] = []
+_seq_persistido = -1
+
+_hilo: Optional[threading.Thread] = None
+_detener = threading.Event()
+
+Filtros = Optional[Dict[str, Any]]
+
+
+def disponible() -> bool:
+    """True si hay pandas (si no, las consultas usan el camino en Python)."""
+    return _HAS_PANDAS
+
+
+# ---------------- construcción y actualización ----------------
+
+def _firma_particiones() -> List[Tuple[str, int, int]]:
+    firma = []
+    for _, path in listar_particiones():
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        firma.append((path.name, st.st_mtime_ns, st.st_size))
+    return firma
+
+
+def _derivar(df, archivado: bool):
+    """Agrega en_espera, ciclo y archivado a un DataFrame con las columnas de CSV_FIELDS."""
+    df["en_espera"] = df["en_lista_espera"].str.strip().str.lower().isin(["sí", "si", "yes", "true"])
+    fechas = pd.to_datetime(df["fecha_inscripcion"].str.strip().str.replace("Z", "+00:00", regex=False),
+                            errors="coerce", format="mixed", utc=True)
+    fechas = fechas.dt.tz_convert(None)
+    mes_inicio = mes_inicio_ciclo()
+    ciclo = fechas.dt.year
+    if mes_inicio > 1:
+        ciclo = ciclo + (fechas.dt.month >= mes_inicio).astype("int64")
+    df["ciclo"] = ciclo.astype("Int64")
+    df["archivado"] = archivado
+    return df
+
+
+def _a_dataframe(filas: Iterable[Dict[str, Any]], archivado: bool):
+    df = pd.DataFrame.from_records(list(filas), columns=CSV_FIELDS)
+    df = df.fillna("").astype(str)
+    return _derivar(df, archivado)
+
+
+def _construir():
+    activos = _a_dataframe(iter_registros(campos=CSV_FIELDS), archivado=False)
+    archivados = _a_dataframe(({k: r.get(k, "") for k in CSV_FIELDS} for r in archivo.iter_registros()),
+                              archivado=True)
+    df = pd.concat([activos, archivados], ignore_index=True)
+    print(f"[ANALITICA] Snapshot construido: {len(activos)} activos, {len(archivados)} archivados")
+    return df
+
+
+def _aplicar_cambios(df, cambios: List[Dict[str, Any]]):
+    """Reemplaza en el snapshot las filas activas de los ids tocados por su estado actual."""
+    ids = list({str(c.get("id", "")) for c in cambios if c.get("id")})
+    if not ids:
+        return df
+    df = df[~(df["id"].isin(ids) & ~df["archivado"])]
+    nuevos = _a_dataframe(iter_registros(filtros={"id": ids}, campos=CSV_FIELDS), archivado=False)
+    return pd.concat([df, nuevos], ignore_index=True)
+
+
+def _cargar_persistido() -> bool:
+    """Carga el snapshot de data/analitica/ si corresponde a las particiones actuales."""
+    global _df, _seq, _firma_archivo
+    try:
+        meta = json.loads(_META_FILE.read_text(encoding="utf-8"))
+        if [tuple(x) for x in meta.get("particiones", [])] != _firma_particiones():
+            return False
+        if int(meta.get("seq", 0)) > ultimo_seq() or meta.get("mes_inicio") != mes_inicio_ciclo():
+            return False
+        path = ANALITICA_DIR / meta["archivo"]
+        formato = meta.get("formato")
+        if formato == "parquet":
+            df = pd.read_parquet(path)
+        elif formato == "feather":
+            df = pd.read_feather(path)
+        else:
+            df = pd.read_pickle(path)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        print(f"[WARN] Analítica: snapshot persistido inválido: {e}")
+        return False
+    _df, _seq, _firma_archivo = df, int(meta["seq"]), _firma_particiones()
+    return True
+
+
+def _al_dia():
+    """DataFrame al día con el log de cambios (lo construye o lo recarga si hace falta)."""
+    global _df, _seq, _firma_archivo
+    with _lock:
+        seq = ultimo_seq()
+        firma = _firma_particiones()
+        if _df is None and _cargar_persistido():
+            firma = _firma_archivo
+        if _df is None or firma != _firma_archivo or seq < _seq:
+            _df, _seq, _firma_archivo = _construir(), seq, firma
+        elif seq > _seq:
+            cambios = obtener_cambios_desde(_seq, limite=_MAX_CAMBIOS_INCREMENTAL + 1)
+            if len(cambios) > _MAX_CAMBIOS_INCREMENTAL:
+                _df = _construir()
+            else:
+                _df = _aplicar_cambios(_df, cambios)
+            _seq = seq
+        return _df
+
+
+def actualizar() -> Tuple[bool, str]:
+    """Pone el snapshot al día y lo guarda en data/analitica/ si cambió desde la última vez."""
+    global _seq_persistido
+    if not _HAS_PANDAS:
+        return False, "pandas no está instalado"
+    try:
+        with _lock:
+            df = _al_dia()
+            if _seq == _seq_persistido:
+                return True, "Snapshot al día"
+            ANALITICA_DIR.mkdir(parents=True, exist_ok=True)
+            errores = []
+            for formato, extension in _FORMATOS:
+                destino = ANALITICA_DIR / f"inscripciones{extension}"
+                tmp = destino.with_name(destino.name + ".tmp")
+                try:
+                    if formato == "parquet":
+                        df.to_parquet(tmp, index=False)
+                    elif formato == "feather":
+                        df.reset_index(drop=True).to_feather(tmp)
+                    else:
+                        df.to_pickle(tmp)
+                    os.replace(tmp, destino)
+                    break
+                except Exception as e:
+                    # sin pyarrow/fastparquet se pasa al siguiente formato
+                    errores.append(f"{formato}: {e}")
+                    if tmp.exists():
+                        tmp.unlink()
+            else:
+                return False, "; ".join(errores)
+            meta = {"seq": _seq, "formato": formato, "archivo": destino.name,
+                    "particiones": _firma_archivo, "mes_inicio": mes_inicio_ciclo()}
+            tmp_meta = _META_FILE.with_name(_META_FILE.name + ".tmp")
+            tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+            os.replace(tmp_meta, _META_FILE)
+            _seq_persistido = _seq
+            return True, f"Snapshot guardado ({formato}, {len(df)} filas, seq {_seq})"
+    except Exception as e:
+        traceback.print_exc()
+        return False, str(e)
+
+
+def _ciclo(cada_segundos: float) -> None:
+    while not _detener.is_set():
+        ok, msg = actualizar()
+        if not ok:
+            print(f"[WARN] Analítica: {msg}")
+        _detener.wait(cada_segundos)
+
+
+def iniciar_actualizacion_automatica(cada_segundos: float = 60) -> None:
+    """Lanza (una sola vez) el hilo que mantiene y persiste el snapshot."""
+    global _hilo
+    if not _HAS_PANDAS or (_hilo is not None and _hilo.is_alive()):
+        return
+    _detener.clear()
+    _hilo = threading.Thread(target=_ciclo, args=(cada_segundos,), name="analitica", daemon=True)
+    _hilo.start()
+
+
+def detener() -> None:
+    _detener.set()
+
+
+# ---------------- consultas ----------------
+
+def _mascara(df, filtros: Filtros, incluir_archivo: bool):
+    mascara = pd.Series(True, index=df.index) if incluir_archivo else ~df["archivado"]
+    for campo, valor in (filtros or {}).items():
+        if valor is None:
+            continue
+        valores = list(valor) if isinstance(valor, (list, tuple, set, frozenset)) else [valor]
+        mascara &= df[campo].isin(valores)
+    return mascara
+
+
+def _filas_python(filtros: Filtros, incluir_archivo: bool) -> Iterator[Dict[str, Any]]:
+    """Camino sin pandas: filas con los mismos campos derivados que el DataFrame."""
+    condiciones = []
+    for campo, valor in (filtros or {}).items():
+        if valor is not None:
+            condiciones.append((campo, set(valor) if isinstance(valor, (list, tuple, set, frozenset)) else {valor}))
+
+    def con_derivados(r: Dict[str, Any], archivado: bool) -> Dict[str, Any]:
+        r["en_espera"] = es_lista_espera(r.get("en_lista_espera"))
+        r["ciclo"] = ciclo_de(r)
+        r["archivado"] = archivado
+        return r
+
+    activos = (con_derivados(r, False) for r in iter_registros())
+    fuentes = [activos]
+    if incluir_archivo:
+        fuentes.append(con_derivados(r.a_dict(), True) for r in archivo.iter_registros())
+    for fuente in fuentes:
+        for r in fuente:
+            if all(r.get(campo) in aceptados for campo, aceptados in condiciones):
+                yield r
+
+
+def conteos(por: Union[str, Sequence[str]], filtros: Filtros = None,
+            incluir_archivo: bool = False) -> Dict[Any, int]:
+    """
+    Cantidad de inscripciones por valor de 'por' (una columna, o varias -> claves tupla).
+    filtros: {campo: valor o [valores]}, también sobre en_espera/ciclo/archivado.
+    """
+    columnas = [por] if isinstance(por, str) else list(por)
+    if _HAS_PANDAS:
+        df = _al_dia()
+        sub = df[_mascara(df, filtros, incluir_archivo)]
+        if sub.empty:
+            return {}
+        serie = sub.groupby(columnas, sort=False, dropna=False).size()
+        return {k: int(v) for k, v in serie.items()}
+    contador: Counter = Counter()
+    for r in _filas_python(filtros, incluir_archivo):
+        clave = tuple(r.get(c) for c in columnas)
+        contador[clave if len(columnas) > 1 else clave[0]] += 1
+    return dict(contador)
+
+
+def estadisticas(filtros: Filtros = None, incluir_archivo: bool = False) -> Dict[str, Any]:
+    """Total y cantidades por materia, profesor, turno y anio (para Listados)."""
+    resultado: Dict[str, Any] = {"total": 0}
+    for columna in ("materia", "profesor", "turno", "anio"):
+        resultado[columna] = conteos(columna, filtros, incluir_archivo)
+    resultado["total"] = sum(resultado["materia"].values())
+    return resultado
+
+
+def agrupar(por: Sequence[str], campos: Sequence[str], filtros: Filtros = None,
+            normalizar: bool = False, incluir_archivo: bool = False) -> Dict[Tuple[str, ...], List[Dict[str, Any]]]:
+    """
+    {clave: [filas con 'campos']} agrupando por las columnas 'por' (sin espacios
+    a los costados). Con normalizar, las variantes de mayúsculas van al mismo grupo
+    y la clave es la primera variante encontrada.
+    """
+    por = list(por)
+    campos = list(campos)
+    grupos: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    if _HAS_PANDAS:
+        df = _al_dia()
+        sub = df[_mascara(df, filtros, incluir_archivo)]
+        if sub.empty:
+            return grupos
+        claves = [sub[c].astype(str).str.strip() for c in por]
+        agrupadores = [k.str.lower() for k in claves] if normalizar else claves
+        registros = sub[campos].to_dict("records")
+        etiquetas = list(zip(*claves))
+        for posiciones in sub.groupby(agrupadores, sort=False).indices.values():
+            grupos[etiquetas[posiciones[0]]] = [registros[i] for i in posiciones]
+        return grupos
+    etiquetas: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+    for r in _filas_python(filtros, incluir_archivo):
+        clave = tuple(str(r.get(c, "")).strip() for c in por)
+        norm = tuple(c.lower() for c in clave) if normalizar else clave
+        etiqueta = etiquetas.setdefault(norm, clave)
+        grupos.setdefault(etiqueta, []).append({k: r.get(k, "") for k in campos})
+    return grupos
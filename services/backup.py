@@ -0,0 +1,298 @@
+"""
+Respaldos de inscripciones, fuera del camino de guardado.
+
+- Snapshots: data/backups/inscripciones_<fecha>.csv.gz con el estado completo.
+  Se crean cada app.backup_interval_days días desde un hilo en segundo plano
+  (iniciar_respaldo_automatico); una reescritura completa del CSV solo crea uno
+  si ya pasó ese intervalo.
+- Deltas: al compactar el journal, sus líneas (cada una con "ts") se guardan en
+  data/backups/journal_<fecha>.jsonl.gz. Una reescritura completa (sincronización,
+  restauración, archivo de ciclos) agrega al delta una entrada "reemplazo" con
+  todas las filas. Un snapshot más los deltas posteriores permiten reconstruir
+  el estado en cualquier momento: ver restaurar().
+- Retención: se conservan los últimos app.backup_retencion snapshots y los deltas
+  posteriores al más viejo que quede.
+
+Todo se desactiva con app.auto_backup = False (crear_snapshot manual sigue andando).
+"""
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import traceback
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Mapping, Optional, Tuple
+
+from config.settings import BACKUPS_DIR, CSV_FIELDS, JOURNAL_FILE, settings
+
+_FORMATO_SELLO = "%Y%m%d_%H%M%S_%f"
+_PREFIJO_SNAPSHOT = "inscripciones_"
+_SUFIJO_SNAPSHOT = ".csv.gz"
+_PREFIJO_DELTA = "journal_"
+_SUFIJO_DELTA = ".jsonl.gz"
+
+_hilo: Optional[threading.Thread] = None
+_detener = threading.Event()
+# al salir del proceso ya no se lanzan hilos: los respaldos se escriben en el mismo hilo
+_sincronico = False
+
+
+def auto_backup_activo() -> bool:
+    return bool(settings.get("app.auto_backup", True))
+
+
+def _intervalo() -> timedelta:
+    try:
+        dias = float(settings.get("app.backup_interval_days", 7) or 7)
+    except (TypeError, ValueError):
+        dias = 7
+    return timedelta(days=max(dias, 0))
+
+
+def _retencion() -> int:
+    try:
+        return max(1, int(settings.get("app.backup_retencion", 10) or 10))
+    except (TypeError, ValueError):
+        return 10
+
+
+def _listar(prefijo: str, sufijo: str) -> List[Tuple[datetime, Path]]:
+    """[(fecha, ruta)] de los archivos de respaldo, del más viejo al más nuevo."""
+    archivos = []
+    if not BACKUPS_DIR.exists():
+        return archivos
+    for path in BACKUPS_DIR.iterdir():
+        nombre = path.name
+        if not (nombre.startswith(prefijo) and nombre.endswith(sufijo)):
+            continue
+        try:
+            fecha = datetime.strptime(nombre[len(prefijo):-len(sufijo)], _FORMATO_SELLO)
+        except ValueError:
+            continue
+        archivos.append((fecha, path))
+    archivos.sort()
+    return archivos
+
+
+def listar_snapshots() -> List[Tuple[datetime, Path]]:
+    return _listar(_PREFIJO_SNAPSHOT, _SUFIJO_SNAPSHOT)
+
+
+def listar_deltas() -> List[Tuple[datetime, Path]]:
+    return _listar(_PREFIJO_DELTA, _SUFIJO_DELTA)
+
+
+def _escribir_gzip(destino: Path, escribir: Callable[[Any], None], modo: str = "wt") -> None:
+    """Escribe a un temporal comprimido y lo mueve a destino (nunca queda un .gz a medias)."""
+    BACKUPS_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="tmp_backup_", dir=str(BACKUPS_DIR))
+    os.close(fd)
+    try:
+        if "t" in modo:
+            with gzip.open(tmp_path, modo, encoding="utf-8", newline="") as f:
+                escribir(f)
+        else:
+            with gzip.open(tmp_path, modo) as f:
+                escribir(f)
+        os.replace(tmp_path, destino)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def en_segundo_plano(funcion: Callable, *args) -> None:
+    """Ejecuta funcion(*args) en un hilo aparte (o en el actual si el proceso está cerrando)."""
+    if not _sincronico:
+        try:
+            threading.Thread(target=funcion, args=args, name="backup", daemon=False).start()
+            return
+        except RuntimeError:
+            pass
+    funcion(*args)
+
+
+def crear_snapshot(registros: Optional[Iterable[Mapping[str, Any]]] = None,
+                   fecha: Optional[datetime] = None) -> Tuple[bool, str]:
+    """
+    Guarda un snapshot comprimido. Sin 'registros' toma el estado actual;
+    'fecha' es el momento al que corresponde el estado (por defecto, ahora).
+    """
+    try:
+        if registros is None:
+            from database.csv_handler import cargar_registros_tipados
+            registros = cargar_registros_tipados()
+        fecha = fecha or datetime.now()
+        destino = BACKUPS_DIR / f"{_PREFIJO_SNAPSHOT}{fecha.strftime(_FORMATO_SELLO)}{_SUFIJO_SNAPSHOT}"
+        total = [0]
+
+        def escribir(f):
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            for r in registros:
+                writer.writerow({k: ("" if r.get(k) is None else r.get(k)) for k in CSV_FIELDS})
+                total[0] += 1
+
+        _escribir_gzip(destino, escribir)
+        print(f"[BACKUP] Snapshot: {total[0]} registros en {destino.name}")
+        aplicar_retencion()
+        return True, f"Backup guardado: {destino.name}"
+    except Exception as e:
+        print(f"[WARN] No se pudo guardar backup: {e}")
+        traceback.print_exc()
+        return False, str(e)
+
+
+def archivar_delta(datos: bytes) -> Tuple[bool, str]:
+    """Guarda comprimidas las líneas del journal que se van a compactar."""
+    try:
+        if not datos.strip():
+            return True, "Journal vacío"
+        destino = BACKUPS_DIR / f"{_PREFIJO_DELTA}{datetime.now().strftime(_FORMATO_SELLO)}{_SUFIJO_DELTA}"
+        _escribir_gzip(destino, lambda f: f.write(datos), modo="wb")
+        return True, f"Delta guardado: {destino.name}"
+    except Exception as e:
+        print(f"[WARN] No se pudo archivar el journal: {e}")
+        return False, str(e)
+
+
+def aplicar_retencion() -> None:
+    """Borra los snapshots que exceden app.backup_retencion y los deltas anteriores al más viejo."""
+    snapshots = listar_snapshots()
+    sobrantes = snapshots[:-_retencion()]
+    for _, path in sobrantes:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+    if not sobrantes:
+        return
+    mas_viejo = snapshots[len(sobrantes)][0]
+    for fecha, path in listar_deltas():
+        # un delta archivado antes del snapshot más viejo ya está contenido en él
+        if fecha < mas_viejo:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def snapshot_si_corresponde() -> Tuple[bool, str]:
+    """Crea un snapshot si app.auto_backup está activo y el último tiene más de backup_interval_days."""
+    if not auto_backup_activo():
+        return True, "Backup automático desactivado"
+    snapshots = listar_snapshots()
+    if snapshots and datetime.now() - snapshots[-1][0] < _intervalo():
+        return True, "Backup al día"
+    return crear_snapshot()
+
+
+def _ciclo(cada_segundos: float) -> None:
+    while not _detener.is_set():
+        try:
+            snapshot_si_corresponde()
+        except Exception as e:
+            print(f"[WARN] Backup automático: {e}")
+        _detener.wait(cada_segundos)
+
+
+def iniciar_respaldo_automatico(cada_segundos: float = 3600) -> None:
+    """Lanza (una sola vez) el hilo que revisa periódicamente si toca un snapshot."""
+    global _hilo
+    if _hilo is not None and _hilo.is_alive():
+        return
+    _detener.clear()
+    _hilo = threading.Thread(target=_ciclo, args=(cada_segundos,), name="backup-auto", daemon=True)
+    _hilo.start()
+
+
+def detener() -> None:
+    """Detiene el hilo periódico; desde acá los respaldos se escriben en el hilo que los pide."""
+    global _sincronico
+    _sincronico = True
+    _detener.set()
+
+
+def _fecha_entrada(entrada: Mapping[str, Any]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(str(entrada.get("ts", "")))
+    except ValueError:
+        return None
+
+
+def _lineas_delta(datos: bytes, desde: datetime, hasta: datetime) -> List[bytes]:
+    """Líneas de journal con desde < ts <= hasta (las sin ts se incluyen)."""
+    lineas = []
+    for linea in datos.splitlines():
+        if not linea.strip():
+            continue
+        try:
+            entrada = json.loads(linea.decode("utf-8"))
+        except Exception:
+            continue
+        ts = _fecha_entrada(entrada)
+        if ts is None or desde < ts <= hasta:
+            lineas.append(linea)
+    return lineas
+
+
+def reconstruir(hasta: Optional[datetime] = None) -> Tuple[bool, Any]:
+    """
+    Estado de las inscripciones en 'hasta' (por defecto, ahora): último snapshot
+    anterior más los deltas archivados y el journal actual.
+    Devuelve (True, [registros]) o (False, mensaje).
+    """
+    hasta = hasta or datetime.now()
+    candidatos = [s for s in listar_snapshots() if s[0] <= hasta]
+    if not candidatos:
+        return False, f"No hay snapshots anteriores a {hasta.isoformat()}"
+    fecha_snapshot, snapshot = candidatos[-1]
+
+    lineas: List[bytes] = []
+    for fecha, path in listar_deltas():
+        # los deltas archivados antes del snapshot ya están incluidos en él
+        if fecha > fecha_snapshot:
+            with gzip.open(path, "rb") as f:
+                lineas.extend(_lineas_delta(f.read(), fecha_snapshot, hasta))
+    if JOURNAL_FILE.exists():
+        lineas.extend(_lineas_delta(JOURNAL_FILE.read_bytes(), fecha_snapshot, hasta))
+
+    from database.record_store import RecordStore
+    tmp_dir = tempfile.mkdtemp(prefix="restaurar_")
+    try:
+        tmp_csv = Path(tmp_dir) / "inscripciones.csv"
+        tmp_journal = Path(tmp_dir) / "inscripciones.journal"
+        with gzip.open(snapshot, "rb") as origen, open(tmp_csv, "wb") as destino:
+            shutil.copyfileobj(origen, destino)
+        tmp_journal.write_bytes(b"".join(l + b"\n" for l in lineas))
+        registros = [r.a_dict() for r in RecordStore(tmp_csv, tmp_journal, CSV_FIELDS).registros()]
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"[BACKUP] Reconstruido estado a {hasta.isoformat()} desde {snapshot.name} + {len(lineas)} operaciones")
+    return True, registros
+
+
+def restaurar(hasta: Optional[datetime] = None, destino: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Restaura el estado en 'hasta'. Con 'destino' lo escribe en ese CSV; si no,
+    reemplaza los datos actuales (el estado previo queda respaldado).
+    """
+    try:
+        ok, resultado = reconstruir(hasta)
+        if not ok:
+            return False, resultado
+        if destino:
+            from database.record_store import escribir_csv_atomico
+            escribir_csv_atomico(destino, resultado, CSV_FIELDS)
+        else:
+            from database.csv_handler import guardar_todos_registros
+            ok, msg = guardar_todos_registros(resultado)
+            if not ok:
+                return False, msg
+        return True, f"Restaurados {len(resultado)} registros"
+    except Exception as e:
+        traceback.print_exc()
+        return False, str(e)
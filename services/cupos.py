@@ -13,7 +13,7 @@ try:
 except Exception:
     _HAS_YAML = False
 
-from database.csv_handler import cargar_registros
+from services import analitica
 
 def _find_cupos_path() -> Optional[str]:
     for key in ("cupos.file", "cupos_file", "cupos.path"):
@@ -73,15 +73,8 @@ def calcular_cupos_restantes() -> Tuple[bool, Any]:
         ok, cupos = get_cupos()
         if not ok:
             cupos = {}
-        registros = cargar_registros()
-        counts = {}
-        for r in registros:
-            if str(r.get("en_lista_espera","No")).strip().lower() in ("sí","si","yes","true"):
-                continue
-            mat = str(r.get("materia","") or "")
-            com = str(r.get("comision","") or "")
-            key = (mat, com)
-            counts[key] = counts.get(key, 0) + 1
+        # inscriptos (sin lista de espera) por materia/comisión, agrupado sobre el snapshot
+        counts = analitica.conteos(["materia", "comision"], filtros={"en_espera": False})
         results = {}
         materias_set = set([m for m,_ in counts.keys()]) | set((list(cupos.keys()) if isinstance(cupos, dict) else []))
         for mat in materias_set:
@@ -1,7 +1,10 @@
 # Funciones clave para sincronización con Google Sheets (services/google_sheets.py)
-import threading, os, traceback
+import threading, os, traceback, json, hashlib
 from typing import List, Dict, Any, Tuple, Optional
-from config.settings import settings
+from config.settings import SHEETS_SYNC_FILE, settings
+from database.file_lock import BloqueoArchivo
+from database.schema import canonizar_encabezado
+from services.sheets_client import es_error_no_encontrado, metadatos_sheets, pool_sheets
 
 try:
     from google.oauth2 import service_account
@@ -23,22 +26,18 @@ def verify_remote_sync(sheet_id: str, sheet_name: Optional[str] = None) -> Tuple
             print("[VERIFY] No se puede inicializar client:", err)
             return False, err
 
-        # Resolver nombre de hoja
+        # Resolver nombre de hoja (sin indicarlo, la primera hoja según el cache de metadatos)
         sheet_name = sheet_name or settings.get("google_sheets.sheet_name", "") or None
 
-        # Obtener metadata para elegir la primera hoja si no se indicó sheet_name
-        ss_meta = service.spreadsheets().get(spreadsheetId=sheet_id, fields="sheets.properties").execute()
-        sheets_meta = ss_meta.get("sheets", []) or []
-        if not sheet_name:
-            if not sheets_meta:
-                msg = "Spreadsheet no contiene hojas"
-                print("[VERIFY]", msg)
-                return False, msg
-            sheet_name = sheets_meta[0].get("properties", {}).get("title", "Sheet1")
-
-        # Construir rango y leer
-        range_name = f"'{sheet_name}'"
-        resp = service.spreadsheets().values().get(spreadsheetId=sheet_id, range=range_name).execute()
+        def leer(titulo):
+            return service.spreadsheets().values().get(spreadsheetId=sheet_id, range=f"'{titulo}'").execute()
+
+        try:
+            sheet_name, resp = _con_hoja(service, sheet_id, sheet_name, leer)
+        except _SinHojas:
+            msg = "Spreadsheet no contiene hojas"
+            print("[VERIFY]", msg)
+            return False, msg
         values = resp.get("values", []) or []
 
         print("[VERIFY] sheet_id:", sheet_id, "sheet_name:", sheet_name)
@@ -53,95 +52,92 @@ def verify_remote_sync(sheet_id: str, sheet_name: Optional[str] = None) -> Tuple
         traceback.print_exc()
         return False, str(e)
     
+class _SinHojas(Exception):
+    """El spreadsheet no tiene ninguna hoja."""
+
+
+def _con_hoja(service, sheet_id: str, sheet_name: Optional[str], operacion) -> Tuple[str, Any]:
+    """
+    Ejecuta operacion(titulo) sobre la hoja sheet_name, o sobre la primera si no se
+    indica (título tomado del cache de metadatos). Si la API responde que la hoja
+    no existe, invalida el cache del spreadsheet y, si el título salió del cache,
+    reintenta una vez con metadatos frescos. Devuelve (titulo, resultado).
+    """
+    for intento in (0, 1):
+        titulo = metadatos_sheets.titulo(service, sheet_id, sheet_name)
+        if not titulo:
+            raise _SinHojas(sheet_id)
+        try:
+            return titulo, operacion(titulo)
+        except Exception as e:
+            if not es_error_no_encontrado(e):
+                raise
+            metadatos_sheets.invalidar(sheet_id)
+            if intento or sheet_name:
+                raise
+
+
 def get_sheets_service(credentials_file: Optional[str] = None) -> Tuple[Optional[Any], Optional[str]]:
     """
-    Crea y devuelve el servicio de Google Sheets.
+    Devuelve el servicio de Google Sheets del hilo actual (services/sheets_client.py):
+    las credenciales, el token y el cliente se reutilizan entre llamadas.
     Retorna (service, error_msg). Si service is None, error_msg explica por qué.
     """
     if not _HAS_GOOGLE:
         return None, "google-api-python-client o google-auth no están instalados"
-
-    try:
-        creds_path = credentials_file or settings.get("google_sheets.credentials_file", "") or settings.get("google_sheets.credentials_file", "")
-        if creds_path and not os.path.isabs(creds_path):
-            candidate = os.path.abspath(creds_path)
-            if os.path.exists(candidate):
-                creds_path = candidate
-            else:
-                try:
-                    from config.settings import DATA_DIR
-                    candidate2 = str(DATA_DIR / creds_path)
-                    if os.path.exists(candidate2):
-                        creds_path = candidate2
-                except Exception:
-                    pass
-
-        if creds_path and os.path.exists(creds_path):
-            creds = service_account.Credentials.from_service_account_file(creds_path, scopes=["https://www.googleapis.com/auth/spreadsheets"])
-        else:
-            try:
-                from google.auth import default
-                creds, _ = default(scopes=["https://www.googleapis.com/auth/spreadsheets"])
-            except Exception as e_adc:
-                return None, f"No se encontraron credenciales (service account file {creds_path} no existe y ADC falló): {e_adc}"
-
-        service = build("sheets", "v4", credentials=creds, cache_discovery=False)
-        return service, None
-    except Exception as e:
-        return None, f"Error inicializando cliente Google Sheets: {e}"
+    return pool_sheets.servicio(credentials_file)
 
 def delete_row_by_id(sheet_id: str, id_value: str, sheet_name: Optional[str] = None) -> Tuple[bool, str]:
     """
     Busca filas que contengan id_value en la primera columna y las elimina.
     Devuelve (ok, mensaje).
     """
+    return delete_rows_by_ids(sheet_id, [id_value], sheet_name)
+
+def delete_rows_by_ids(sheet_id: str, ids: List[str], sheet_name: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Elimina las filas cuyo valor en la primera columna esté en 'ids'. Lee la
+    columna A una sola vez y borra todo en un único batchUpdate, con un
+    deleteDimension por cada tramo de filas consecutivas (sheetId desde el
+    cache de metadatos). Devuelve (ok, mensaje).
+    """
     if not _HAS_GOOGLE:
         return False, "google libraries not available"
+    buscados = {str(i).strip() for i in ids if str(i or "").strip()}
+    if not buscados:
+        return True, "No hay IDs para eliminar"
     try:
         service, err = get_sheets_service()
         if err:
             return False, err
-        sheet_name = sheet_name or settings.get("google_sheets.sheet_name", "") or "Sheet1"
-        range_all = f"'{sheet_name}'!A:A"
-        resp = service.spreadsheets().values().get(spreadsheetId=sheet_id, range=range_all).execute()
+        sheet_name = sheet_name or settings.get("google_sheets.sheet_name", "") or None
+
+        def leer(titulo):
+            return service.spreadsheets().values().get(
+                spreadsheetId=sheet_id, range=f"{_nombre_para_rango(titulo)}!A:A").execute()
+
+        try:
+            sheet_name, resp = _con_hoja(service, sheet_id, sheet_name, leer)
+        except _SinHojas:
+            return True, "No se encontraron filas con esos IDs"
         values = resp.get("values", []) or []
-        matched_indices = []
-        for idx, row in enumerate(values):
-            cell = row[0] if row else ""
-            if str(cell).strip() == str(id_value).strip():
-                matched_indices.append(idx)  # 0-based
-        if not matched_indices:
-            return True, "No se encontraron filas con ese ID"
-        ss = service.spreadsheets().get(spreadsheetId=sheet_id, fields="sheets.properties").execute()
-        sheets = ss.get("sheets", []) or []
-        target_sheet_id = None
-        for s in sheets:
-            props = s.get("properties", {})
-            if props.get("title") == sheet_name or target_sheet_id is None:
-                target_sheet_id = props.get("sheetId")
+        filas = [idx for idx, row in enumerate(values, start=1)  # 1-based
+                 if row and str(row[0]).strip() in buscados]
+        if not filas:
+            return True, "No se encontraron filas con esos IDs"
+        target_sheet_id = metadatos_sheets.sheet_id_numerico(service, sheet_id, sheet_name)
         if target_sheet_id is None:
-            return False, "No se pudo determinar sheetId"
-        matched_rows = sorted(set(matched_indices), reverse=True)
-        requests = []
-        for r in matched_rows:
-            requests.append({
-                "deleteDimension": {
-                    "range": {
-                        "sheetId": target_sheet_id,
-                        "dimension": "ROWS",
-                        "startIndex": int(r),
-                        "endIndex": int(r + 1)
-                    }
-                }
-            })
-        body = {"requests": requests}
-        service.spreadsheets().batchUpdate(spreadsheetId=sheet_id, body=body).execute()
-        return True, f"Deleted {len(requests)} rows"
+            return False, f"No se pudo determinar sheetId de la hoja '{sheet_name}'"
+        requests = _solicitudes_borrado(target_sheet_id, filas)
+        service.spreadsheets().batchUpdate(spreadsheetId=sheet_id, body={"requests": requests}).execute()
+        return True, f"Deleted {len(filas)} rows ({len(requests)} ranges)"
     except HttpError as he:
+        if es_error_no_encontrado(he):
+            metadatos_sheets.invalidar(sheet_id)
         return False, f"Google API error: {he}"
     except Exception as e:
         tb = traceback.format_exc()
-        print("[ERROR] delete_row_by_id:", e)
+        print("[ERROR] delete_rows_by_ids:", e)
         print(tb)
         return False, str(e)
 
@@ -150,7 +146,7 @@ def subir_a_google_sheets(registros: List[Dict[str, Any]], sheet_id: str, sheet_
     """
     Reemplaza contenido de la hoja con 'registros'. DEBUG VERBOSE:
     - imprime headers y primeras filas que se enviarán
-    - después de write hace una lectura inmediata para verificar lo que quedó
+    - después de write verifica según google_sheets.verify_mode (ver _verificar_escritura)
     """
     if not _HAS_GOOGLE:
         return False, "google libraries not available"
@@ -160,24 +156,14 @@ def subir_a_google_sheets(registros: List[Dict[str, Any]], sheet_id: str, sheet_
         if err:
             return False, err
 
-        # obtener metadata
-        ss_meta = service.spreadsheets().get(spreadsheetId=sheet_id, fields="sheets.properties").execute()
-        sheets_meta = ss_meta.get("sheets", []) or []
-        sheet_titles = [s.get("properties", {}).get("title", "") for s in sheets_meta]
-
-        # determinar sheet_name
-        sheet_name = sheet_name or settings.get("google_sheets.sheet_name", "") or (sheet_titles[0] if sheet_titles else "Sheet1")
-        if sheet_name not in sheet_titles:
-            # intentar crear hoja si no existe (ya intentado en implementaciones anteriores)
-            try:
-                service.spreadsheets().batchUpdate(spreadsheetId=sheet_id, body={"requests":[{"addSheet":{"properties":{"title":sheet_name}}}] }).execute()
-                # refrescar
-                ss_meta = service.spreadsheets().get(spreadsheetId=sheet_id, fields="sheets.properties").execute()
-                sheets_meta = ss_meta.get("sheets", []) or []
-                sheet_titles = [s.get("properties", {}).get("title", "") for s in sheets_meta]
-            except Exception as e_add:
-                # no fatal, seguir con lo que haya
-                print(f"[WARN] subir_a_google_sheets: no se pudo crear '{sheet_name}': {e_add}")
+        # determinar sheet_name (metadatos desde el cache: sin llamada extra en el caso común)
+        sheet_name = sheet_name or settings.get("google_sheets.sheet_name", "") or metadatos_sheets.titulo(service, sheet_id) or "Sheet1"
+        try:
+            # crear la hoja si no existe (invalida el cache de metadatos)
+            metadatos_sheets.asegurar_hoja(service, sheet_id, sheet_name)
+        except Exception as e_add:
+            # no fatal, seguir con lo que haya
+            print(f"[WARN] subir_a_google_sheets: no se pudo crear '{sheet_name}': {e_add}")
 
         # determinar headers
         if header_order:
@@ -237,18 +223,15 @@ def subir_a_google_sheets(registros: List[Dict[str, Any]], sheet_id: str, sheet_
             ).execute()
         except Exception as e_upd:
             print("[ERROR] subir_a_google_sheets: update fail:", e_upd)
+            if es_error_no_encontrado(e_upd):
+                metadatos_sheets.invalidar(sheet_id)
             return False, str(e_upd)
 
-        # READBACK: leer inmediatamente lo escrito y comparar
-        try:
-            read_range = f"{name_for_range}"
-            resp = service.spreadsheets().values().get(spreadsheetId=sheet_id, range=read_range).execute()
-            read_values = resp.get("values", []) or []
-            print("[DEBUG] subir_a_google_sheets: readback filas leídas (incl header)=", len(read_values))
-            # mostrar primeras filas leídas
-            print("[DEBUG] subir_a_google_sheets: readback sample:", read_values[:6])
-        except Exception as e_rb:
-            print("[WARN] subir_a_google_sheets: readback failed:", e_rb)
+        # verificar (por defecto solo la cantidad de filas, leyendo la columna A)
+        escrito = f"{name_for_range}!A1:{_letra_columna(max(1, len(headers)))}{len(values)}"
+        ok_v, detalle = _verificar_escritura(service, sheet_id, sheet_name, _filas_con_id(values), [(escrito, values)])
+        if not ok_v:
+            return False, f"Wrote {len(values)-1} rows to '{sheet_name}', pero la verificación falló: {detalle}"
 
         return True, f"Wrote {len(values)-1} rows to '{sheet_name}'"
     except Exception as e:
@@ -258,115 +241,427 @@ def subir_a_google_sheets(registros: List[Dict[str, Any]], sheet_id: str, sheet_
 def sync_to_google_sheets(sheet_id: str) -> Tuple[bool, str]:
     """Push completo: sube todos los registros locales a la hoja sheet_id."""
     try:
-        from database.csv_handler import cargar_registros
+        from database.csv_handler import cargar_registros, ultimo_seq
+        seq = ultimo_seq()
         regs = cargar_registros()
-        return subir_a_google_sheets(regs, sheet_id)
+        ok, msg = subir_a_google_sheets(regs, sheet_id)
+        if ok:
+            # la hoja quedó igual al local: el próximo push por diferencias parte de acá
+            _marcar_subido(sheet_id, None, seq)
+        return ok, msg
     except Exception as e:
         return False, str(e)
 
-def sync_incremental_to_sheets(sheet_id: str, hours_window: int = 24) -> Tuple[bool, Dict[str, Any]]:
+# ---------------- verificación de escrituras ----------------
+#
+# google_sheets.verify_mode decide qué se lee después de escribir, siempre en un
+# solo batchGet y nunca la hoja entera salvo que se la haya reescrito:
+#   "off"   nada
+#   "count" solo la columna A, para comparar la cantidad de filas (por defecto)
+#   "full"  además los rangos escritos, comparando su huella (sha1) con lo enviado
+
+_MODOS_VERIFICACION = ("off", "count", "full")
+
+
+def _modo_verificacion() -> str:
+    modo = str(settings.get("google_sheets.verify_mode", "count") or "").strip().lower()
+    return modo if modo in _MODOS_VERIFICACION else "count"
+
+
+def _como_texto(valor: Any) -> str:
+    """Valor de una celda como lo devuelve Sheets al leer (FORMATTED_VALUE)."""
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "TRUE" if valor else "FALSE"
+    return str(valor)
+
+
+def huella_filas(filas: List[List[Any]]) -> str:
+    """sha1 de las filas como texto, sin las celdas ni filas vacías del final (Sheets no las devuelve)."""
+    normalizadas = []
+    for fila in filas:
+        celdas = [_como_texto(v) for v in fila]
+        while celdas and celdas[-1] == "":
+            celdas.pop()
+        normalizadas.append(celdas)
+    while normalizadas and not normalizadas[-1]:
+        normalizadas.pop()
+    return hashlib.sha1(json.dumps(normalizadas, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _filas_con_id(filas: List[List[Any]]) -> int:
+    """Largo de la columna A que devolvería Sheets para estas filas (hasta la última con valor)."""
+    for i in range(len(filas) - 1, -1, -1):
+        if filas[i] and _como_texto(filas[i][0]).strip():
+            return i + 1
+    return 0
+
+
+def _verificar_escritura(service, sheet_id: str, titulo: str, filas_esperadas: int,
+                         escritos: List[Tuple[str, List[List[Any]]]]) -> Tuple[bool, str]:
     """
-    Sincronización incremental inteligente hacia Google Sheets.
-    Solo procesa cambios recientes (últimas N horas).
-    
-    Args:
-        sheet_id: ID del spreadsheet
-        hours_window: Ventana de tiempo en horas para considerar cambios (default 24h)
-    
-    Returns:
-        (ok, stats_dict) con contadores de added/updated/deleted
+    Comprueba una escritura según verify_mode: filas_esperadas es el largo de la
+    columna A (encabezado incluido) y escritos los [(rango, filas enviadas)].
+    Devuelve (ok, detalle); si la lectura misma falla, avisa y no la da por fallida.
     """
-    print(f"[SYNC_INCREMENTAL] Iniciando sincronización incremental (ventana: {hours_window}h)")
-    
+    modo = _modo_verificacion()
+    if modo == "off":
+        return True, "sin verificar"
+    rangos = [f"{_nombre_para_rango(titulo)}!A:A"]
+    if modo == "full":
+        rangos += [rango for rango, _ in escritos]
     try:
-        from datetime import datetime, timedelta
-        from database.csv_handler import cargar_registros
-        
-        # 1. Cargar registros locales
-        local_records = cargar_registros()
-        print(f"[SYNC_INCREMENTAL] Cargados {len(local_records)} registros locales")
-        
-        # 2. Descargar registros remotos
-        ok, result = descargar_desde_google_sheets(sheet_id)
-        if not ok:
-            return False, {"error": f"Error descargando desde Sheets: {result}"}
-        remote_records = result or []
-        print(f"[SYNC_INCREMENTAL] Descargados {len(remote_records)} registros remotos")
-        
-        # 3. Indexar por ID
-        local_by_id = {str(r.get("id", "")): r for r in local_records if r.get("id")}
-        remote_by_id = {str(r.get("id", "")): r for r in remote_records if r.get("id")}
-        
-        # 4. Calcular fecha límite (solo registros de las últimas N horas)
-        now = datetime.now()
-        cutoff = now - timedelta(hours=hours_window)
-        print(f"[SYNC_INCREMENTAL] Fecha límite: {cutoff.isoformat()}")
-        
-        # 5. Encontrar cambios
-        local_ids = set(local_by_id.keys())
-        remote_ids = set(remote_by_id.keys())
-        
-        # Nuevos registros (existen local pero no remoto)
-        new_ids = local_ids - remote_ids
-        
-        # Registros eliminados (existen remoto pero no local)
-        deleted_ids = remote_ids - local_ids
-        
-        # Registros potencialmente modificados (existen en ambos)
-        common_ids = local_ids & remote_ids
-        
-        # Filtrar por ventana de tiempo solo para nuevos/modificados
-        recent_new_ids = set()
-        for rid in new_ids:
-            rec = local_by_id[rid]
-            fecha_str = str(rec.get("fecha_inscripcion", ""))
-            if fecha_str:
-                try:
-                    fecha = datetime.fromisoformat(fecha_str.replace("Z", "+00:00"))
-                    if fecha >= cutoff:
-                        recent_new_ids.add(rid)
-                except Exception:
-                    # Si no se puede parsear fecha, incluir de todas formas
-                    recent_new_ids.add(rid)
-            else:
-                # Sin fecha, incluir
-                recent_new_ids.add(rid)
-        
-        print(f"[SYNC_INCREMENTAL] Registros nuevos totales: {len(new_ids)}, recientes: {len(recent_new_ids)}")
-        print(f"[SYNC_INCREMENTAL] Registros eliminados: {len(deleted_ids)}")
-        
-        # 6. Aplicar cambios incrementales
-        stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": len(common_ids)}
-        
-        if not recent_new_ids and not deleted_ids:
-            print("[SYNC_INCREMENTAL] No hay cambios que sincronizar")
+        resp = service.spreadsheets().values().batchGet(spreadsheetId=sheet_id, ranges=rangos).execute()
+    except Exception as e:
+        print(f"[VERIFY] No se pudo verificar la escritura en '{titulo}': {e}")
+        return True, f"no se pudo verificar: {e}"
+    leidos = [vr.get("values", []) or [] for vr in resp.get("valueRanges", []) or []]
+    leidos += [[]] * (len(rangos) - len(leidos))
+
+    filas = len(leidos[0])
+    if filas != filas_esperadas:
+        detalle = f"la columna A tiene {filas} filas y se esperaban {filas_esperadas}"
+        print(f"[VERIFY] '{titulo}': {detalle}")
+        return False, detalle
+    distintos = [rango for (rango, enviadas), leidas in zip(escritos, leidos[1:])
+                 if huella_filas(enviadas) != huella_filas(leidas)] if modo == "full" else []
+    if distintos:
+        detalle = f"{len(distintos)} rango(s) no coinciden con lo enviado: {distintos[:3]}"
+        print(f"[VERIFY] '{titulo}': {detalle}")
+        return False, detalle
+    print(f"[VERIFY] '{titulo}' OK ({modo}: {filas} filas" + (f", {len(escritos)} rangos)" if modo == "full" else ")"))
+    return True, "verificado"
+
+
+# ---------------- push por diferencias ----------------
+#
+# La hoja se trata como una tabla con el id en la columna A. En vez de borrar y
+# reescribir todo, se lee solo la fila de encabezado y la columna A (un batchGet)
+# para saber en qué fila está cada id, y se envía:
+#   - modificados: un values.batchUpdate con los rangos de esas filas
+#   - eliminados:  un batchUpdate con un deleteDimension por tramo de filas
+#   - nuevos:      un values.append
+# Qué cambió sale del log de cambios (database/change_log.py): data/.sheets_sync.json
+# guarda, por hoja, el último seq ya subido.
+
+# con más cambios pendientes que esto conviene el push completo
+_MAX_CAMBIOS_DELTA = 5000
+
+_bloqueo_delta = BloqueoArchivo(SHEETS_SYNC_FILE.with_suffix(".lock"), timeout=120.0)
+
+
+class _EncabezadoIncompatible(Exception):
+    """La hoja está vacía o le faltan columnas locales: corresponde un push completo."""
+
+
+def _nombre_para_rango(titulo: str) -> str:
+    return "'" + titulo.replace("'", "''") + "'"
+
+
+def _letra_columna(numero: int) -> str:
+    """1 -> A, 27 -> AA."""
+    letras = ""
+    while numero > 0:
+        numero, resto = divmod(numero - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _clave_estado(sheet_id: str, sheet_name: Optional[str]) -> str:
+    return f"{sheet_id}|{sheet_name or settings.get('google_sheets.sheet_name', '') or ''}"
+
+
+def _leer_estado_sync() -> Dict[str, Any]:
+    try:
+        with open(SHEETS_SYNC_FILE, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        return datos if isinstance(datos, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _marcar_subido(sheet_id: str, sheet_name: Optional[str], seq: int) -> None:
+    """Registra que la hoja ya tiene todos los cambios hasta 'seq'."""
+    try:
+        with _bloqueo_delta:
+            estado = _leer_estado_sync()
+            estado[_clave_estado(sheet_id, sheet_name)] = int(seq)
+            tmp = SHEETS_SYNC_FILE.with_name(SHEETS_SYNC_FILE.name + ".tmp")
+            tmp.write_text(json.dumps(estado), encoding="utf-8")
+            os.replace(tmp, SHEETS_SYNC_FILE)
+    except Exception as e:
+        print(f"[WARN] No se pudo guardar el estado de sincronización: {e}")
+
+
+def _columnas_remotas(primera_fila: List[Any]) -> Tuple[List[str], bool]:
+    """(claves de cada columna, la hoja tiene fila de encabezado)."""
+    from config.settings import CSV_FIELDS
+    celdas = [str(c).strip() for c in primera_fila]
+    tiene_header = bool(celdas) and (settings.get("google_sheets.has_header_row", False)
+                                     or canonizar_encabezado(celdas[:1])[0] == ["id"])
+    if not tiene_header:
+        return list(CSV_FIELDS), False
+    columnas, _ = canonizar_encabezado(celdas)
+    faltan = [c for c in CSV_FIELDS if c not in columnas]
+    if faltan or not columnas or columnas[0] != "id":
+        raise _EncabezadoIncompatible(f"faltan columnas en la hoja: {faltan}" if faltan else "la columna A no es 'id'")
+    return columnas, True
+
+
+def _tramos(filas: List[int]) -> List[Tuple[int, int]]:
+    """Filas ordenadas -> [(primera, última)] de cada tramo de filas consecutivas."""
+    tramos: List[Tuple[int, int]] = []
+    for fila in filas:
+        if tramos and fila == tramos[-1][1] + 1:
+            tramos[-1] = (tramos[-1][0], fila)
+        else:
+            tramos.append((fila, fila))
+    return tramos
+
+
+def _solicitudes_borrado(numero: int, filas: List[int]) -> List[Dict[str, Any]]:
+    """deleteDimension para las filas (1-based): uno por tramo consecutivo, de abajo hacia arriba."""
+    return [{"deleteDimension": {"range": {"sheetId": numero, "dimension": "ROWS",
+                                           "startIndex": primera - 1, "endIndex": ultima}}}
+            for primera, ultima in reversed(_tramos(sorted(set(filas))))]
+
+
+def escribir_delta_en_sheets(sheet_id: str, registros: List[Dict[str, Any]], ids_eliminados: Optional[List[str]] = None,
+                             sheet_name: Optional[str] = None) -> Tuple[bool, Dict[str, Any]]:
+    """
+    Aplica en la hoja solo lo que cambió: 'registros' (todos los de cada id tocado)
+    se escriben, en orden, sobre las filas de su id; los que sobran se agregan al
+    final y las filas que sobran se borran, igual que las de 'ids_eliminados'.
+    Lee encabezado y columna A una vez; no descarga ni reescribe el resto.
+    Devuelve (ok, stats) con added/updated/deleted/filas_remotas, o (False, {"error",
+    "push_completo"}) donde push_completo indica que la hoja necesita reescribirse.
+    """
+    if not _HAS_GOOGLE:
+        return False, {"error": "google libraries not available"}
+    try:
+        service, err = get_sheets_service()
+        if err:
+            return False, {"error": err}
+        sheet_name = sheet_name or settings.get("google_sheets.sheet_name", "") or None
+
+        def leer(titulo):
+            nombre = _nombre_para_rango(titulo)
+            return service.spreadsheets().values().batchGet(
+                spreadsheetId=sheet_id, ranges=[f"{nombre}!1:1", f"{nombre}!A:A"]).execute()
+
+        try:
+            titulo, resp = _con_hoja(service, sheet_id, sheet_name, leer)
+        except _SinHojas:
+            return False, {"error": "Spreadsheet no contiene hojas", "push_completo": True}
+        rangos = resp.get("valueRanges", []) or []
+        primera_fila = ((rangos[0].get("values") or [[]])[0]) if rangos else []
+        columna_a = (rangos[1].get("values") or []) if len(rangos) > 1 else []
+        if not columna_a:
+            raise _EncabezadoIncompatible("la hoja está vacía")
+        columnas, tiene_header = _columnas_remotas(primera_fila)
+
+        # id -> filas (1-based) donde aparece
+        filas_por_id: Dict[str, List[int]] = {}
+        for idx, celda in enumerate(columna_a[1 if tiene_header else 0:], start=2 if tiene_header else 1):
+            rid = str(celda[0]).strip() if celda else ""
+            if rid:
+                filas_por_id.setdefault(rid, []).append(idx)
+
+        def fila_de(r):
+            return ["" if r.get(k) is None else r.get(k) for k in columnas]
+
+        nombre = _nombre_para_rango(titulo)
+        ultima_col = _letra_columna(len(columnas))
+        por_id: Dict[str, List[Dict[str, Any]]] = {}
+        for r in registros:
+            por_id.setdefault(str(r.get("id", "") or "").strip(), []).append(r)
+        a_escribir: Dict[int, List[Any]] = {}
+        a_borrar: List[int] = []
+        nuevos: List[List[Any]] = []
+        for rid, regs_id in por_id.items():
+            filas = filas_por_id.get(rid, []) if rid else []
+            for fila, r in zip(filas, regs_id):
+                a_escribir[fila] = fila_de(r)
+            nuevos.extend(fila_de(r) for r in regs_id[len(filas):])
+            a_borrar.extend(filas[len(regs_id):])
+        for rid in ids_eliminados or []:
+            a_borrar.extend(filas_por_id.get(str(rid).strip(), []))
+        a_borrar = sorted(set(a_borrar) - set(a_escribir), reverse=True)
+
+        stats = {"added": len(nuevos), "updated": len(a_escribir), "deleted": len(a_borrar),
+                 "filas_remotas": sum(len(f) for f in filas_por_id.values())}
+        if not (a_escribir or a_borrar or nuevos):
+            # p.ej. bajas que ya se borraron con delete_rows_by_ids
             return True, stats
-        
-        # Construir nueva lista remota
-        new_remote = []
-        
-        # Mantener registros remotos existentes que no fueron eliminados
-        for rid in remote_ids:
-            if rid not in deleted_ids:
-                new_remote.append(remote_by_id[rid])
-        
-        # Agregar nuevos registros recientes
-        for rid in recent_new_ids:
-            new_remote.append(local_by_id[rid])
-            stats["added"] += 1
-        
-        stats["deleted"] = len(deleted_ids)
-        
-        print(f"[SYNC_INCREMENTAL] Total registros a enviar a Sheets: {len(new_remote)}")
-        
-        # 7. Subir a Sheets
-        ok, msg = subir_a_google_sheets(new_remote, sheet_id)
-        if not ok:
-            return False, {"error": msg}
-        
-        print(f"[SYNC_INCREMENTAL] ✓ Sincronización completada: {stats}")
+
+        # el sheetId se resuelve antes de escribir nada: sin él no se toca la hoja
+        numero = None
+        if a_borrar:
+            numero = metadatos_sheets.sheet_id_numerico(service, sheet_id, titulo)
+            if numero is None:
+                return False, {"error": f"No se pudo determinar sheetId de la hoja '{titulo}'"}
+
+        escritos: List[Tuple[str, List[List[Any]]]] = []
+
+        # 1. modificados: las filas todavía están donde las leímos
+        if a_escribir:
+            data = []
+            for primera, ultima in _tramos(sorted(a_escribir)):
+                valores = [a_escribir[f] for f in range(primera, ultima + 1)]
+                data.append({"range": f"{nombre}!A{primera}:{ultima_col}{ultima}", "values": valores})
+                # para verificar: dónde queda el tramo después de borrar las filas de arriba
+                corrimiento = sum(1 for f in a_borrar if f < primera)
+                escritos.append((f"{nombre}!A{primera - corrimiento}:{ultima_col}{ultima - corrimiento}", valores))
+            service.spreadsheets().values().batchUpdate(
+                spreadsheetId=sheet_id, body={"valueInputOption": "RAW", "data": data}).execute()
+
+        # 2. eliminados (tramos de abajo hacia arriba para no correr los índices)
+        if a_borrar:
+            service.spreadsheets().batchUpdate(
+                spreadsheetId=sheet_id, body={"requests": _solicitudes_borrado(numero, a_borrar)}).execute()
+
+        # 3. nuevos al final de la tabla
+        if nuevos:
+            resp_append = service.spreadsheets().values().append(
+                spreadsheetId=sheet_id, range=f"{nombre}!A1", valueInputOption="RAW",
+                insertDataOption="INSERT_ROWS", body={"values": nuevos}).execute()
+            rango_agregado = (resp_append or {}).get("updates", {}).get("updatedRange")
+            if rango_agregado:
+                escritos.append((rango_agregado, nuevos))
+
+        print(f"[SYNC_DELTA] '{titulo}': +{stats['added']} ~{stats['updated']} -{stats['deleted']}")
+        ok_v, detalle = _verificar_escritura(service, sheet_id, titulo,
+                                             len(columna_a) - len(a_borrar) + len(nuevos), escritos)
+        if not ok_v:
+            return False, {"error": f"La verificación falló: {detalle}"}
         return True, stats
-        
+    except _EncabezadoIncompatible as e:
+        print(f"[SYNC_DELTA] Se necesita push completo: {e}")
+        return False, {"error": str(e), "push_completo": True}
+    except Exception as e:
+        if es_error_no_encontrado(e):
+            metadatos_sheets.invalidar(sheet_id)
+        traceback.print_exc()
+        return False, {"error": str(e)}
+
+
+def _cambios_pendientes(seq_previo: int) -> Optional[Tuple[List[Dict[str, Any]], List[str], int]]:
+    """
+    (registros a escribir, ids a borrar, último seq) según el log de cambios
+    posteriores a seq_previo; None si son demasiados para un push por diferencias.
+    """
+    from config.settings import CSV_FIELDS
+    from database.csv_handler import iter_registros, obtener_cambios_desde
+    cambios = obtener_cambios_desde(seq_previo, limite=_MAX_CAMBIOS_DELTA + 1)
+    if len(cambios) > _MAX_CAMBIOS_DELTA:
+        return None
+    if not cambios:
+        return [], [], seq_previo
+    # cuenta el estado actual de cada id tocado, no cada paso intermedio
+    ids = list({str(c.get("id", "")) for c in cambios if c.get("id")})
+    registros = list(iter_registros(filtros={"id": ids}, campos=CSV_FIELDS)) if ids else []
+    vigentes = {str(r.get("id", "")) for r in registros}
+    # los que ya no están (eliminados o archivados) salen de la hoja
+    return registros, [i for i in ids if i not in vigentes], max(int(c.get("seq", 0)) for c in cambios)
+
+
+def _diferencias_con_remoto(sheet_id: str, sheet_name: Optional[str]) -> Tuple[bool, Any]:
+    """
+    Sin estado previo: descarga la hoja y compara con todo el local (el seq que
+    se marca después cubre el store entero, así que no se filtra por fecha).
+    Devuelve (True, (registros a escribir, ids a borrar, sin_cambios)) o (False, error).
+    """
+    from database.csv_handler import cargar_registros_tipados
+
+    ok, result = descargar_desde_google_sheets(sheet_id, sheet_name)
+    if not ok:
+        return False, f"Error descargando desde Sheets: {result}"
+    # un id puede repetirse: se comparan todas sus filas, en orden
+    remotos: Dict[str, List[Dict[str, Any]]] = {}
+    for r in result or []:
+        if r.get("id"):
+            remotos.setdefault(str(r.get("id")), []).append(r)
+    locales: Dict[str, List[Any]] = {}
+    for reg in cargar_registros_tipados():
+        if reg.get("id"):
+            locales.setdefault(str(reg.get("id")), []).append(reg)
+    print(f"[SYNC_INCREMENTAL] {len(locales)} ids locales, {len(remotos)} remotos")
+
+    def distinto(d, remoto):
+        return any(str(d.get(k, "") or "") != str(remoto.get(k, "") or "") for k in d)
+
+    registros, sin_cambios = [], 0
+    for rid, regs in locales.items():
+        filas = remotos.get(rid)
+        if filas is None or len(filas) != len(regs) or any(distinto(r.a_dict(), f) for r, f in zip(regs, filas)):
+            registros.extend(r.a_dict() for r in regs)
+        else:
+            sin_cambios += len(regs)
+    eliminados = [rid for rid in remotos if rid not in locales]
+    return True, (registros, eliminados, sin_cambios)
+
+
+def sync_incremental_to_sheets(sheet_id: str, hours_window: int = 24,
+                               sheet_name: Optional[str] = None) -> Tuple[bool, Dict[str, Any]]:
+    """
+    Sincronización incremental: sube solo las altas, modificaciones y bajas
+    posteriores al último push (log de cambios) con escribir_delta_en_sheets.
+
+    La primera vez (o si se perdió el estado) compara todo el local contra la
+    hoja descargada. Si la hoja está vacía, le faltan columnas o hay demasiados
+    cambios pendientes, hace un push completo. hours_window se conserva por
+    compatibilidad: lo que se sube lo decide el log de cambios, no la fecha.
+
+    Returns:
+        (ok, stats_dict) con contadores de added/updated/deleted/unchanged
+    """
+    print("[SYNC_INCREMENTAL] Iniciando sincronización incremental")
+    try:
+        from database.csv_handler import ultimo_seq
+
+        with _bloqueo_delta:
+            seq_actual = ultimo_seq()
+            seq_previo = _leer_estado_sync().get(_clave_estado(sheet_id, sheet_name))
+            sin_cambios = None
+            pendientes = None
+            if isinstance(seq_previo, int) and 0 <= seq_previo <= seq_actual:
+                pendientes = _cambios_pendientes(seq_previo)
+                if pendientes is None:
+                    print("[SYNC_INCREMENTAL] Demasiados cambios pendientes: push completo")
+            else:
+                ok, result = _diferencias_con_remoto(sheet_id, sheet_name)
+                if not ok:
+                    return False, {"error": result}
+                registros, eliminados, sin_cambios = result
+                pendientes = (registros, eliminados, seq_actual)
+
+            if pendientes is not None:
+                registros, eliminados, seq_nuevo = pendientes
+                if not registros and not eliminados:
+                    print("[SYNC_INCREMENTAL] No hay cambios que sincronizar")
+                    _marcar_subido(sheet_id, sheet_name, seq_nuevo)
+                    return True, {"added": 0, "updated": 0, "deleted": 0, "unchanged": sin_cambios or 0}
+                ok, stats = escribir_delta_en_sheets(sheet_id, registros, eliminados, sheet_name)
+                if ok:
+                    _marcar_subido(sheet_id, sheet_name, seq_nuevo)
+                    remotas = stats.pop("filas_remotas", 0)
+                    if sin_cambios is None:
+                        sin_cambios = max(0, remotas - stats["updated"] - stats["deleted"])
+                    stats["unchanged"] = sin_cambios
+                    print(f"[SYNC_INCREMENTAL] ✓ Sincronización completada: {stats}")
+                    return True, stats
+                if not stats.get("push_completo"):
+                    return False, stats
+
+            # push completo (hoja vacía, encabezado distinto o demasiados cambios)
+            from database.csv_handler import cargar_registros
+            regs = cargar_registros()
+            ok, msg = subir_a_google_sheets(regs, sheet_id, sheet_name)
+            if not ok:
+                return False, {"error": msg}
+            _marcar_subido(sheet_id, sheet_name, seq_actual)
+            return True, {"added": len(regs), "updated": 0, "deleted": 0, "unchanged": 0, "mode": "full"}
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -383,18 +678,17 @@ def descargar_desde_google_sheets(sheet_id: str, sheet_name: Optional[str] = Non
             print(f"[DOWNLOAD] Error obteniendo servicio: {err}")
             return False, err
         sheet_name = sheet_name or settings.get("google_sheets.sheet_name", "") or None
-        print(f"[DOWNLOAD] Obteniendo metadata de la hoja...")
-        ss_meta = service.spreadsheets().get(spreadsheetId=sheet_id, fields="sheets.properties").execute()
-        sheets = ss_meta.get("sheets", []) or []
-        if not sheets:
+
+        def leer(titulo):
+            print(f"[DOWNLOAD] Descargando rango: '{titulo}'")
+            return service.spreadsheets().values().get(spreadsheetId=sheet_id, range=f"'{titulo}'").execute()
+
+        try:
+            sheet_name, resp = _con_hoja(service, sheet_id, sheet_name, leer)
+        except _SinHojas:
             print("[DOWNLOAD] No se encontraron hojas en el spreadsheet")
             return True, []
-        if not sheet_name:
-            sheet_name = sheets[0].get("properties", {}).get("title", "Sheet1")
         print(f"[DOWNLOAD] Usando sheet_name: {sheet_name}")
-        range_name = f"'{sheet_name}'"
-        print(f"[DOWNLOAD] Descargando rango: {range_name}")
-        resp = service.spreadsheets().values().get(spreadsheetId=sheet_id, range=range_name).execute()
         values = resp.get("values", []) or []
         print(f"[DOWNLOAD] Total filas descargadas (incluyendo header si existe): {len(values)}")
         if not values:
@@ -408,6 +702,8 @@ def descargar_desde_google_sheets(sheet_id: str, sheet_name: Optional[str] = Non
         if has_header_row:
             # La primera fila son headers
             headers = [h.strip() if isinstance(h, str) else str(h) for h in values[0]]
+            # columnas con nombres viejos (mail, domicilio, año...) -> canónicas, una sola vez
+            headers, pares_legado = canonizar_encabezado(headers)
             rows = values[1:]
             print(f"[DOWNLOAD] Usando headers de la primera fila: {headers[:10]}..." if len(headers) > 10 else f"[DOWNLOAD] Headers: {headers}")
         else:
@@ -422,6 +718,7 @@ def descargar_desde_google_sheets(sheet_id: str, sheet_name: Optional[str] = Non
                 print("[DOWNLOAD] ERROR: No hay CSV_FIELDS definido y la hoja no tiene headers")
                 return False, "No se pueden mapear los datos sin headers"
             
+            pares_legado = []
             rows = values  # Todas las filas son datos
             print(f"[DOWNLOAD] NO hay header en Sheets, usando CSV_FIELDS: {headers[:10]}..." if len(headers) > 10 else f"[DOWNLOAD] CSV_FIELDS: {headers}")
         
@@ -436,6 +733,9 @@ def descargar_desde_google_sheets(sheet_id: str, sheet_name: Optional[str] = Non
             d = {}
             for i, h in enumerate(headers):
                 d[h] = row[i] if i < len(row) else ""
+            for vieja, nueva in pares_legado:
+                if not d.get(nueva):
+                    d[nueva] = d.get(vieja, "")
             results.append(d)
             
             # Log de muestra para los primeros registros
@@ -556,12 +856,9 @@ def load_local_backup() -> Tuple[bool, Any]:
                 pass
         
         # Cargar registros
-        import csv
-        registros = []
-        with open(backup_file, 'r', encoding='utf-8-sig', newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                registros.append(dict(row))
+        from database.csv_handler import cargar_csv_paralelo
+        filas, _ = cargar_csv_paralelo(backup_file)
+        registros = [r.a_dict() for r in filas]
         
         print(f"[BACKUP] ✓ Cargados {len(registros)} registros del respaldo (última sync: {last_sync})")
         return True, registros
@@ -590,9 +887,7 @@ def smart_sync_to_sheets(sheet_id: str, force_full: bool = False) -> Tuple[bool,
         
         if force_full or sync_mode == "full":
             print("[SMART_SYNC] Usando sincronización COMPLETA")
-            from database.csv_handler import cargar_registros
-            registros = cargar_registros()
-            ok, msg = subir_a_google_sheets(registros, sheet_id)
+            ok, msg = sync_to_google_sheets(sheet_id)
             return ok, {"mode": "full", "message": msg} if ok else (False, msg)
         else:
             print(f"[SMART_SYNC] Usando sincronización INCREMENTAL (ventana: {sync_window}h)")
@@ -608,13 +903,16 @@ def sincronizar_bidireccional(sheet_id: str, sheet_name: Optional[str] = None) -
     Sincronización bidireccional con Google Sheets.
     1. Descarga TODOS los registros desde Google Sheets (rango abierto)
     2. Guarda en CSV local
-    3. Sube cambios locales a Google Sheets
+    3. Sube a Google Sheets solo lo que difiere (sync_incremental_to_sheets)
     Devuelve (ok, mensaje).
     """
     try:
         print("[DEBUG] sincronizar_bidireccional: Sincronizando desde Google Sheets...")
         
         # 1. Descargar desde Sheets con rango abierto
+        from database.csv_handler import guardar_todos_registros, cargar_registros, ultimo_seq
+        # lo que se cargue en el formulario mientras tanto no se pisa al guardar
+        seq_inicio = ultimo_seq()
         ok, data = descargar_desde_google_sheets(sheet_id, sheet_name)
         if not ok:
             return False, f"Error descargando desde Sheets: {data}"
@@ -623,14 +921,13 @@ def sincronizar_bidireccional(sheet_id: str, sheet_name: Optional[str] = None) -
         print(f"[DEBUG] sincronizar_bidireccional: Descargados {len(registros_remotos)} registros")
         
         # 2. Guardar en CSV local
-        from database.csv_handler import guardar_todos_registros, cargar_registros
-        ok_save, msg_save = guardar_todos_registros(registros_remotos)
+        ok_save, msg_save = guardar_todos_registros(registros_remotos, desde_seq=seq_inicio)
         if not ok_save:
             return False, f"Error guardando CSV local: {msg_save}"
         
-        # 3. Subir cambios locales (si los hay) - push completo para asegurar consistencia
+        # 3. Subir cambios locales (si los hay) - solo las filas que cambiaron
         registros_locales = cargar_registros()
-        ok_upload, msg_upload = subir_a_google_sheets(registros_locales, sheet_id, sheet_name)
+        ok_upload, msg_upload = sync_incremental_to_sheets(sheet_id, sheet_name=sheet_name)
         if not ok_upload:
             print(f"[WARN] sincronizar_bidireccional: Error subiendo a Sheets: {msg_upload}")
             # No es crítico, ya tenemos los datos locales actualizados
@@ -656,7 +953,7 @@ def sync_remote_to_local(sheet_key: Optional[str] = None, sheet_name: Optional[s
     try:
         # imports locales para evitar NameError si no están en top-level
         try:
-            from database.csv_handler import cargar_registros, guardar_todos_registros
+            from database.csv_handler import cargar_registros, guardar_todos_registros, guardar_registros_lote, ultimo_seq
         except Exception as e_imp:
             print("[WARN] sync_remote_to_local: no se pudieron importar helpers CSV:", e_imp)
             return False, f"No se encontraron helpers CSV: {e_imp}"
@@ -670,6 +967,8 @@ def sync_remote_to_local(sheet_key: Optional[str] = None, sheet_name: Optional[s
         print(f"[SYNC] sheet_key: {sk[:20]}... (truncado)")
 
         print("[SYNC] Descargando datos desde Google Sheets...")
+        # altas/bajas locales hechas durante la descarga se conservan al reemplazar
+        seq_inicio = ultimo_seq()
         ok, result = descargar_desde_google_sheets(sk)  # uses sheet_name from settings if needed
         if not ok:
             print(f"[SYNC] Error descargando desde Sheets: {result}")
@@ -720,8 +1019,13 @@ def sync_remote_to_local(sheet_key: Optional[str] = None, sheet_name: Optional[s
         # fallback a uuid si no hay generar_id
         import uuid
 
+        # las filas de ciclos ya archivados no vuelven a la partición activa
+        from database.archivo import archivo
+        ids_archivados = archivo.ids()
+
         remote_by_id = {}
         skipped = 0
+        archived = 0
         records_without_id = 0
         empty_records = 0
         
@@ -769,12 +1073,17 @@ def sync_remote_to_local(sheet_key: Optional[str] = None, sheet_name: Optional[s
                 print(f"[SYNC] Registro {idx+1} no pudo obtener ID, saltando...")
                 skipped += 1
                 continue
+            if rid in ids_archivados:
+                archived += 1
+                continue
             remote_by_id[rid] = r
 
         print(f"[SYNC] Procesados {len(remote_by_id)} registros remotos con ID")
         print(f"[SYNC] Registros sin ID inicial: {records_without_id}")
         print(f"[SYNC] Registros completamente vacíos: {empty_records}")
         print(f"[SYNC] Total skipped: {skipped}")
+        if archived:
+            print(f"[SYNC] Registros de ciclos archivados (ignorados): {archived}")
         if remote_by_id:
             first_remote_id = list(remote_by_id.keys())[0]
             first_remote_rec = remote_by_id[first_remote_id]
@@ -791,6 +1100,7 @@ def sync_remote_to_local(sheet_key: Optional[str] = None, sheet_name: Optional[s
         common_ids = local_ids & remote_ids
 
         updated_count = 0
+        updated_ids = set()
         for cid in common_ids:
             local_r = local_by_id.get(cid, {})
             remote_r = remote_by_id.get(cid, {})
@@ -805,6 +1115,7 @@ def sync_remote_to_local(sheet_key: Optional[str] = None, sheet_name: Optional[s
                     break
             if changed:
                 updated_count += 1
+                updated_ids.add(cid)
 
         # build new local list (mirror or merge)
         new_local = []
@@ -823,7 +1134,7 @@ def sync_remote_to_local(sheet_key: Optional[str] = None, sheet_name: Optional[s
             # remote_by_id is not ordered by original order, so iterate remote_records to preserve order
             for rec in remote_records:
                 rid = str(rec.get("id", "") or "")
-                if not rid:
+                if not rid or rid in ids_archivados:
                     continue
                 # ensure we include all ordered_keys (fill missing with "")
                 nr = {k: ("" if rec.get(k) is None else rec.get(k)) for k in ordered_keys}
@@ -860,7 +1171,14 @@ def sync_remote_to_local(sheet_key: Optional[str] = None, sheet_name: Optional[s
         if new_local:
             print(f"[SYNC] Muestra del primer registro: {list(new_local[0].keys())[:5]}")
         
-        ok_save, msg_save = guardar_todos_registros(new_local)
+        if replace_local:
+            ok_save, msg_save = guardar_todos_registros(new_local, desde_seq=seq_inicio)
+        else:
+            # merge: solo los registros nuevos/modificados, en una escritura al journal
+            # (no se reescribe el CSV, así no se pisan altas hechas en otros puestos)
+            ids_cambiados = updated_ids | added_ids
+            cambios = [r for r in new_local if str(r.get("id", "") or "") in ids_cambiados]
+            ok_save, msg_save = guardar_registros_lote(cambios) if cambios else (True, "Sin cambios")
         if not ok_save:
             print(f"[ERROR] sync_remote_to_local: Error guardando CSV: {msg_save}")
             return False, f"Error guardando CSV local: {msg_save}"
@@ -29,12 +29,95 @@ def _get_unique_pdf_path(base_path):
         counter += 1
 
 
-def generar_certificado_pdf(registro, output_path=None):
+def _en_lista_espera(m):
+    valor = str(m.get("en_lista_espera", "No") or "")
+    return valor.lower() in ("sí", "si", "yes", "s", "1", "true")
+
+
+def _dibujar_materia(c, m, margin_left, y):
+    """Dibuja los datos de una materia (certificado de una sola inscripción). Devuelve la nueva y."""
+    # Año
+    anio = m.get("anio", "")
+    if anio:
+        c.drawString(margin_left, y, f"Año: {anio}°")
+        y -= 15
+    
+    # Turno
+    turno = m.get("turno", "N/A")
+    c.drawString(margin_left, y, f"Turno: {turno}")
+    y -= 15
+    
+    # Materia
+    materia = m.get("materia", "N/A")
+    # Si la materia es muy larga, cortarla o usar multi-línea
+    if len(materia) > 70:
+        c.drawString(margin_left, y, f"Materia: {materia[:70]}")
+        y -= 15
+        c.drawString(margin_left + 60, y, materia[70:])
+        y -= 15
+    else:
+        c.drawString(margin_left, y, f"Materia: {materia}")
+        y -= 15
+    
+    # Profesor/a
+    profesor = m.get("profesor", "N/A")
+    c.drawString(margin_left, y, f"Profesor/a: {profesor}")
+    y -= 15
+    
+    # Comisión
+    comision = m.get("comision", "N/A")
+    c.drawString(margin_left, y, f"Comisión: {comision}")
+    y -= 15
+    
+    # Horario (si existe)
+    horario = m.get("horario", "")
+    if horario:
+        c.drawString(margin_left, y, f"Horario: {horario}")
+        y -= 15
+    
+    # En lista de espera
+    if _en_lista_espera(m):
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(margin_left, y, "⚠ EN LISTA DE ESPERA")
+        c.setFont("Helvetica", 10)
+        y -= 15
+    return y
+
+
+def _dibujar_materia_compacta(c, m, margin_left, y):
+    """Dibuja una materia en formato resumido (certificado con varias materias). Devuelve la nueva y."""
+    materia = m.get("materia", "N/A") or "N/A"
+    anio = m.get("anio", "")
+    encabezado = f"• {materia}" + (f" ({anio}° año)" if anio else "")
+    if len(encabezado) > 80:
+        encabezado = encabezado[:77] + "..."
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(margin_left, y, encabezado)
+    y -= 14
+    c.setFont("Helvetica", 9)
+    detalle = f"Profesor/a: {m.get('profesor', '') or 'N/A'}  -  Comisión: {m.get('comision', '') or 'N/A'}"
+    horario = m.get("horario", "")
+    if horario:
+        detalle += f"  -  Horario: {horario}"
+    c.drawString(margin_left + 12, y, detalle[:100])
+    y -= 12
+    if _en_lista_espera(m):
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(margin_left + 12, y, "⚠ EN LISTA DE ESPERA")
+        y -= 12
+    c.setFont("Helvetica", 10)
+    return y - 4
+
+
+def generar_certificado_pdf(registro, output_path=None, materias=None):
     """
     Genera certificado de inscripción en PDF con logo y firma.
     Args:
         registro (dict): Datos del alumno
         output_path (str, optional): Ruta de salida
+        materias (list, optional): Inscripciones a incluir (una por materia).
+            Si trae más de una se emite un único certificado con todas;
+            si no se indica se usa la materia del propio registro.
     Returns:
         tuple(bool, str): (exito, ruta_archivo)
     """
@@ -162,7 +245,7 @@ def generar_certificado_pdf(registro, output_path=None):
             y -= 15
         
         # Domicilio
-        domicilio = registro.get("direccion", "") or registro.get("domicilio", "")
+        domicilio = registro.get("direccion", "")
         if domicilio:
             c.drawString(margin_left, y, f"Domicilio: {domicilio}")
             y -= 15
@@ -174,7 +257,7 @@ def generar_certificado_pdf(registro, output_path=None):
             y -= 15
         
         # Mail
-        mail = registro.get("email", "") or registro.get("mail", "")
+        mail = registro.get("email", "")
         if mail:
             c.drawString(margin_left, y, f"Mail: {mail}")
             y -= 15
@@ -209,58 +292,27 @@ def generar_certificado_pdf(registro, output_path=None):
         y -= 10
         
         # === DATOS DE INSCRIPCIÓN ===
+        materias = [m for m in (materias or []) if m] or [registro]
         c.setFont("Helvetica-Bold", 11)
-        c.drawString(margin_left, y, "Datos de Inscripción:")
+        if len(materias) > 1:
+            c.drawString(margin_left, y, f"Datos de Inscripción ({len(materias)} materias):")
+        else:
+            c.drawString(margin_left, y, "Datos de Inscripción:")
         y -= 20
         
         c.setFont("Helvetica", 10)
         
-        # Año
-        anio = registro.get("anio", "") or registro.get("año", "")
-        if anio:
-            c.drawString(margin_left, y, f"Año: {anio}°")
-            y -= 15
-        
-        # Turno
-        turno = registro.get("turno", "N/A")
-        c.drawString(margin_left, y, f"Turno: {turno}")
-        y -= 15
-        
-        # Materia
-        materia = registro.get("materia", "N/A")
-        # Si la materia es muy larga, cortarla o usar multi-línea
-        if len(materia) > 70:
-            c.drawString(margin_left, y, f"Materia: {materia[:70]}")
-            y -= 15
-            c.drawString(margin_left + 60, y, materia[70:])
-            y -= 15
+        if len(materias) == 1:
+            y = _dibujar_materia(c, materias[0], margin_left, y)
         else:
-            c.drawString(margin_left, y, f"Materia: {materia}")
-            y -= 15
-        
-        # Profesor/a
-        profesor = registro.get("profesor", "N/A")
-        c.drawString(margin_left, y, f"Profesor/a: {profesor}")
-        y -= 15
-        
-        # Comisión
-        comision = registro.get("comision", "N/A")
-        c.drawString(margin_left, y, f"Comisión: {comision}")
-        y -= 15
-        
-        # Horario (si existe)
-        horario = registro.get("horario", "")
-        if horario:
-            c.drawString(margin_left, y, f"Horario: {horario}")
-            y -= 15
-        
-        # En lista de espera
-        en_lista_espera = registro.get("en_lista_espera", "No")
-        if en_lista_espera and en_lista_espera.lower() in ("sí", "si", "yes", "s", "1", "true"):
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(margin_left, y, "⚠ EN LISTA DE ESPERA")
-            c.setFont("Helvetica", 10)
-            y -= 15
+            # Una entrada compacta por materia (2-3 líneas cada una)
+            for m in materias:
+                if y < 230:
+                    # no pisar la zona de firma: seguir en otra hoja
+                    c.showPage()
+                    y = height - margin_top
+                    c.setFont("Helvetica", 10)
+                y = _dibujar_materia_compacta(c, m, margin_left, y)
         
         y -= 10
         
@@ -580,13 +632,13 @@ def generar_listado_pdf(registros, output_path, filtro_materia=None, filtro_prof
                 reg.get('apellido', '')[:15],
                 reg.get('nombre', '')[:15],
                 reg.get('dni', ''),
-                reg.get('email', '')[:30] or reg.get('mail', '')[:30],
+                reg.get('email', '')[:30],
                 reg.get('legajo', '')[:15],
                 #reg.get('materia', '')[:30],
                 #reg.get('profesor', '')[:20],
                 reg.get('comision', ''),
                 reg.get('turno', '')[:10],
-                reg.get('anio', '') or reg.get('año', '')
+                reg.get('anio', '')
             ]
             data.append(row)
 
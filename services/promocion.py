@@ -0,0 +1,316 @@
+"""
+Promoción anual: reinscribe en el año siguiente, en un solo lote, a los alumnos
+que cursaron un año en el ciclo anterior.
+
+proponer_promocion(anio) arma, para cada alumno con inscripciones activas (fuera
+de lista de espera) de 'anio' en el ciclo de origen, las inscripciones de anio+1
+según models.materias.get_materias_por_anio:
+    - las materias comunes del año siguiente (las que no son de un instrumento), y
+    - las de su instrumento ("...2: Piano" para quien cursó "...1: Piano").
+Los registros no guardan notas: se promueve a todos los inscriptos, salvo los
+DNI de 'excluir' (o solo los de 'aprobados', si se indica).
+
+Cupos por comisión: el de instruments.json (get_info_completa) menos los
+inscriptos activos del ciclo destino (services/analitica.py). Se prefiere la
+comisión de un profesor que el alumno ya tuvo y, si no, la de más vacantes. Sin
+vacantes en ninguna comisión, la inscripción va a lista de espera. Los alumnos
+se atienden por orden de inscripción en el ciclo de origen.
+
+Las materias en las que el alumno ya está inscripto en el ciclo destino se
+omiten, así que volver a correr la promoción no duplica filas.
+
+aplicar_promocion() guarda todo con guardar_registros_lote (una línea de journal
+o una transacción SQLite) y hace un único push a Google Sheets.
+"""
+import csv
+import re
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from config.settings import CAMPOS_ALUMNO, REPORTS_DIR, settings
+from database.archivo import ciclo_actual, ciclo_de
+from database.csv_handler import generar_id, guardar_registros_lote, iter_registros
+from models.materias import (
+    get_comisiones_profesor, get_horario, get_info_completa,
+    get_materias_por_anio, get_profesores_materia
+)
+from models.registro import es_lista_espera, parsear_fecha
+from services import analitica
+
+# "Técnica Instrumental ... 1: Piano" / "Taller de Repertorio ... 1: : Viola"
+# y la variante sin dos puntos "Técnica Instrumental ... 1 Oboe"
+_SIN_DOS_PUNTOS = re.compile(r"^.*\d+\s+([^\d:]+)$")
+
+CAMPOS_REPORTE = [
+    "dni", "apellido", "nombre", "anio", "materia", "profesor", "comision",
+    "horario", "en_lista_espera",
+]
+
+
+def _normalizar(texto: str) -> str:
+    sin_acentos = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sin_acentos.lower().split())
+
+
+def instrumento_de(materia: str) -> Optional[str]:
+    """Instrumento de una materia (normalizado) o None si es una materia común."""
+    nombre = str(materia or "").strip()
+    if ":" in nombre:
+        instrumento = _normalizar(nombre.rsplit(":", 1)[1])
+        return instrumento or None
+    encontrado = _SIN_DOS_PUNTOS.match(nombre)
+    return _normalizar(encontrado.group(1)) if encontrado else None
+
+
+def _mismo_instrumento(a: str, b: str) -> bool:
+    # "saxo"/"saxofon", "acordeon"/"acordeon a piano", "trombon"/"trombón"
+    return a.startswith(b) or b.startswith(a)
+
+
+def _cupo(materia: str, profesor: str, comision: str) -> Optional[int]:
+    info = get_info_completa(materia, profesor, comision)
+    if not info or info.get("cupo") is None:
+        return None
+    try:
+        return int(info.get("cupo"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _oferta(anio: int) -> Dict[str, List[Tuple[str, str]]]:
+    """{materia: [(profesor, comision)]} del año indicado."""
+    oferta: Dict[str, List[Tuple[str, str]]] = {}
+    for materia in get_materias_por_anio(anio):
+        comisiones: List[Tuple[str, str]] = []
+        for profesor in get_profesores_materia(materia, anio):
+            for comision in get_comisiones_profesor(materia, profesor, anio) or [""]:
+                comisiones.append((profesor, comision))
+        if comisiones:
+            oferta[materia] = comisiones
+    return oferta
+
+
+def _alumnos_origen(anio: int, ciclo_origen: int, incluir_sin_fecha: bool) -> Tuple[Dict[str, List[Dict[str, Any]]], int]:
+    """({dni: [inscripciones activas de 'anio' en el ciclo]}, filas sin fecha omitidas)."""
+    por_dni: Dict[str, List[Dict[str, Any]]] = {}
+    sin_fecha = 0
+    for r in iter_registros(filtros={"anio": str(anio)}, incluir_archivo=True):
+        dni = str(r.get("dni", "")).strip()
+        if not dni or es_lista_espera(r.get("en_lista_espera")):
+            continue
+        ciclo = ciclo_de(r)
+        if ciclo is None:
+            if not incluir_sin_fecha:
+                sin_fecha += 1
+                continue
+        elif ciclo != ciclo_origen:
+            continue
+        por_dni.setdefault(dni, []).append(r)
+    return por_dni, sin_fecha
+
+
+def _inscriptos_destino(ciclo_destino: int) -> Set[Tuple[str, str]]:
+    """(dni, materia normalizada) ya inscriptos en el ciclo destino."""
+    ya = set()
+    for r in iter_registros(campos=["dni", "materia", "fecha_inscripcion"]):
+        if ciclo_de(r) == ciclo_destino:
+            ya.add((str(r.get("dni", "")).strip(), _normalizar(r.get("materia", ""))))
+    return ya
+
+
+def proponer_promocion(anio: int, ciclo_origen: Optional[int] = None,
+                       excluir: Optional[Iterable[str]] = None,
+                       aprobados: Optional[Iterable[str]] = None,
+                       incluir_sin_fecha: bool = False) -> Dict[str, Any]:
+    """
+    Propuesta (sin guardar nada) de inscripciones en anio+1 para los alumnos de
+    'anio' del ciclo de origen (por defecto el anterior al actual).
+    - excluir / aprobados: DNI a dejar afuera / únicos DNI a promover
+    - incluir_sin_fecha: tomar también las inscripciones de 'anio' sin fecha
+    Devuelve un dict con 'asignaciones' (registros listos para guardar),
+    'lista_espera' (las que quedaron en espera), 'comisiones' (ocupación por
+    materia/profesor/comisión) y contadores para el reporte.
+    """
+    anio = int(anio)
+    ciclo_destino = ciclo_actual()
+    ciclo_origen = int(ciclo_origen) if ciclo_origen is not None else ciclo_destino - 1
+    excluir = {str(d).strip() for d in (excluir or [])}
+    aprobados = {str(d).strip() for d in aprobados} if aprobados is not None else None
+
+    oferta = _oferta(anio + 1)
+    por_dni, sin_fecha = _alumnos_origen(anio, ciclo_origen, incluir_sin_fecha)
+    ya_inscriptos = _inscriptos_destino(ciclo_destino)
+
+    # ocupación actual por comisión (activos del ciclo destino)
+    ocupados = analitica.conteos(["materia", "profesor", "comision"],
+                                 filtros={"en_espera": False, "ciclo": ciclo_destino})
+    comisiones: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for materia, opciones in oferta.items():
+        for profesor, comision in opciones:
+            comisiones[(materia, profesor, comision)] = {
+                "cupo": _cupo(materia, profesor, comision),
+                "ocupados": int(ocupados.get((materia, profesor, comision), 0)),
+                "asignados": 0,
+                "espera": 0,
+            }
+
+    def vacantes(clave) -> float:
+        c = comisiones[clave]
+        if c["cupo"] is None:
+            return float("inf")
+        return c["cupo"] - c["ocupados"] - c["asignados"]
+
+    # primero quienes se inscribieron antes en el ciclo de origen
+    def antiguedad(item):
+        fechas = [parsear_fecha(r.get("fecha_inscripcion")) for r in item[1]]
+        fechas = [f for f in fechas if f is not None]
+        return (min(fechas) if fechas else datetime.max, item[0])
+
+    fecha = datetime.now().isoformat()
+    ids: Set[str] = set()
+    asignaciones: List[Dict[str, Any]] = []
+    espera: List[Dict[str, Any]] = []
+    sin_instrumento: List[str] = []
+    omitidos = 0
+    excluidos = 0
+
+    for dni, inscripciones in sorted(por_dni.items(), key=antiguedad):
+        if dni in excluir or (aprobados is not None and dni not in aprobados):
+            excluidos += 1
+            continue
+        # datos del alumno: los de su inscripción más reciente
+        ultima = max(inscripciones, key=lambda r: str(r.get("fecha_inscripcion", "")))
+        perfil = {campo: ultima.get(campo, "") for campo in CAMPOS_ALUMNO}
+        instrumentos = {i for i in (instrumento_de(r.get("materia", "")) for r in inscripciones) if i}
+        profesores = {str(r.get("profesor", "")).strip() for r in inscripciones}
+        if not instrumentos:
+            sin_instrumento.append(dni)
+
+        for materia, opciones in oferta.items():
+            instrumento = instrumento_de(materia)
+            if instrumento and not any(_mismo_instrumento(instrumento, i) for i in instrumentos):
+                continue
+            if (dni, _normalizar(materia)) in ya_inscriptos:
+                omitidos += 1
+                continue
+            claves = [(materia, p, c) for p, c in opciones]
+            preferidas = [k for k in claves if k[1] in profesores]
+            preferidas_libres = [k for k in preferidas if vacantes(k) > 0]
+            libres = [k for k in claves if vacantes(k) > 0]
+            if preferidas_libres or libres:
+                clave = preferidas_libres[0] if preferidas_libres else max(libres, key=vacantes)
+                en_espera = False
+                comisiones[clave]["asignados"] += 1
+            else:
+                clave = (preferidas or claves)[0]
+                en_espera = True
+                comisiones[clave]["espera"] += 1
+
+            nuevo_id = generar_id(perfil)
+            while nuevo_id in ids:
+                nuevo_id = generar_id(perfil)
+            ids.add(nuevo_id)
+            _, profesor, comision = clave
+            registro = dict(perfil)
+            registro.update({
+                "id": nuevo_id,
+                "fecha_inscripcion": fecha,
+                "anio": str(anio + 1),
+                "materia": materia,
+                "profesor": profesor,
+                "comision": comision,
+                "horario": get_horario(materia, profesor, comision),
+                "en_lista_espera": "Sí" if en_espera else "No",
+                "observaciones": f"Promoción desde {anio}° año (ciclo {ciclo_origen})"
+                                 + (" | Inscrito en lista de espera" if en_espera else ""),
+            })
+            asignaciones.append(registro)
+            if en_espera:
+                espera.append(registro)
+
+    return {
+        "anio_origen": anio,
+        "anio_destino": anio + 1,
+        "ciclo_origen": ciclo_origen,
+        "ciclo_destino": ciclo_destino,
+        "alumnos": len(por_dni) - excluidos,
+        "excluidos": excluidos,
+        "sin_fecha_omitidas": sin_fecha,
+        "ya_inscriptas_omitidas": omitidos,
+        "sin_instrumento": sin_instrumento,
+        "asignaciones": asignaciones,
+        "lista_espera": espera,
+        "comisiones": {k: v for k, v in comisiones.items() if v["asignados"] or v["espera"]},
+    }
+
+
+def resumen(reporte: Dict[str, Any]) -> str:
+    """Texto del reporte (para consola o un messagebox)."""
+    lineas = [
+        f"Promoción {reporte['anio_origen']}° -> {reporte['anio_destino']}° "
+        f"(ciclo {reporte['ciclo_origen']} -> {reporte['ciclo_destino']})",
+        f"Alumnos: {reporte['alumnos']} (excluidos: {reporte['excluidos']}, "
+        f"sin instrumento: {len(reporte['sin_instrumento'])})",
+        f"Inscripciones propuestas: {len(reporte['asignaciones'])} "
+        f"(en lista de espera: {len(reporte['lista_espera'])})",
+    ]
+    if reporte["ya_inscriptas_omitidas"]:
+        lineas.append(f"Ya inscriptas en el ciclo destino (omitidas): {reporte['ya_inscriptas_omitidas']}")
+    if reporte["sin_fecha_omitidas"]:
+        lineas.append(f"Inscripciones sin fecha no consideradas: {reporte['sin_fecha_omitidas']}")
+    for (materia, profesor, comision), c in sorted(reporte["comisiones"].items()):
+        cupo = "libre" if c["cupo"] is None else f"{c['ocupados'] + c['asignados']}/{c['cupo']}"
+        linea = f"  {materia} - {profesor} - com. {comision}: +{c['asignados']} ({cupo})"
+        if c["espera"]:
+            linea += f", {c['espera']} en espera"
+        lineas.append(linea)
+    return "\n".join(lineas)
+
+
+def guardar_reporte(reporte: Dict[str, Any], path: Optional[Path] = None) -> Path:
+    """Escribe las asignaciones propuestas en un CSV (data/reports/ por defecto)."""
+    if path is None:
+        REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+        fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = REPORTS_DIR / f"promocion_{reporte['anio_origen']}_a_{reporte['anio_destino']}_{fecha}.csv"
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CAMPOS_REPORTE, extrasaction="ignore")
+        writer.writeheader()
+        for r in sorted(reporte["asignaciones"], key=lambda r: (r.get("apellido", ""), r.get("nombre", ""), r["materia"])):
+            writer.writerow(r)
+    return Path(path)
+
+
+def aplicar_promocion(anio: int, ciclo_origen: Optional[int] = None,
+                      excluir: Optional[Iterable[str]] = None,
+                      aprobados: Optional[Iterable[str]] = None,
+                      incluir_sin_fecha: bool = False,
+                      sincronizar: bool = True) -> Tuple[bool, str]:
+    """
+    Calcula la promoción (igual que proponer_promocion) y la guarda en un solo
+    lote; después, si hay hoja configurada, hace un único push a Google Sheets.
+    """
+    try:
+        reporte = proponer_promocion(anio, ciclo_origen, excluir, aprobados, incluir_sin_fecha)
+        registros = reporte["asignaciones"]
+        if not registros:
+            return True, "Sin inscripciones para agregar\n" + resumen(reporte)
+
+        ok, msg = guardar_registros_lote(registros)
+        if not ok:
+            return False, msg
+        print(f"[PROMOCION] Guardadas {len(registros)} inscripciones de {reporte['alumnos']} alumnos")
+
+        if sincronizar:
+            sheet_key = settings.get("google_sheets.sheet_key", "") or settings.get("spreadsheet_id", "")
+            if sheet_key:
+                from services.google_sheets import sync_incremental_to_sheets
+                ok_push, msg_push = sync_incremental_to_sheets(sheet_key)
+                if not ok_push:
+                    error = msg_push.get("error", msg_push) if isinstance(msg_push, dict) else msg_push
+                    return True, f"Guardado local OK, pero falló la sincronización: {error}\n" + resumen(reporte)
+        return True, resumen(reporte)
+    except Exception as e:
+        return False, f"Error en la promoción: {e}"
@@ -0,0 +1,307 @@
+"""
+Cliente de Google Sheets compartido por todo el proceso.
+
+Antes, cada operación (push, lectura de verificación, borrado de cada fila...)
+releía la cuenta de servicio, pedía un token nuevo y volvía a armar el cliente
+de discovery. Ahora:
+
+- Las credenciales se crean una vez y se reutilizan. Se rehacen solo si cambia
+  el archivo de credenciales (ruta, fecha o tamaño) o la configuración
+  (google_sheets.credentials_file / credentials_path / token_cache).
+- El cliente (build("sheets", "v4")) se arma una vez por hilo: httplib2 no admite
+  uso concurrente, así que cada hilo tiene su propia sesión HTTP autorizada y
+  todas comparten las mismas credenciales y su token.
+- El token de acceso se guarda en data/.sheets_token.json (solo lectura para el
+  usuario) hasta que vence, así un arranque nuevo no vuelve a pedirlo.
+  Si el cliente HTTP lo renueva por su cuenta (401 o vencimiento durante una
+  llamada), el token nuevo se guarda en la siguiente llamada a servicio().
+  google_sheets.token_cache = false lo desactiva.
+
+Uso: services.google_sheets.get_sheets_service() delega en pool_sheets.servicio().
+
+metadatos_sheets guarda, por spreadsheet, las propiedades de sus hojas (título y
+sheetId) durante google_sheets.metadata_ttl segundos (300 por defecto), así
+resolver la hoja no cuesta un spreadsheets().get por operación. Se invalida al
+crear una hoja y cuando la API responde que una hoja o rango no existe.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import DATA_DIR, SHEETS_TOKEN_FILE, settings
+
+try:
+    import httplib2
+    from google.oauth2 import service_account
+    from google_auth_httplib2 import AuthorizedHttp, Request
+    from googleapiclient.discovery import build
+    _HAS_GOOGLE = True
+except Exception:
+    _HAS_GOOGLE = False
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+# un token que vence antes de este margen se renueva antes de usarlo
+_MARGEN_TOKEN = timedelta(minutes=5)
+
+
+def resolver_credenciales(credentials_file: Optional[str] = None) -> str:
+    """Ruta del archivo de credenciales según el argumento o la configuración ("" si no hay)."""
+    creds_path = (credentials_file or settings.get("google_sheets.credentials_file", "")
+                  or settings.get("google_sheets.credentials_path", "") or "")
+    if creds_path and not os.path.isabs(creds_path):
+        candidate = os.path.abspath(creds_path)
+        if os.path.exists(candidate):
+            return candidate
+        candidate2 = str(DATA_DIR / creds_path)
+        if os.path.exists(candidate2):
+            return candidate2
+    return creds_path
+
+
+class PoolClientesSheets:
+    """Credenciales compartidas + un cliente de Sheets por hilo, con cache de token en disco."""
+
+    def __init__(self, token_path=SHEETS_TOKEN_FILE):
+        self.token_path = token_path
+        self._lock = threading.RLock()
+        self._clave: Optional[Tuple[Any, ...]] = None
+        self._creds = None
+        # se incrementa al rehacer las credenciales: invalida los clientes de los hilos
+        self._generacion = 0
+        self._local = threading.local()
+        self._token_guardado: Optional[str] = None
+        self._stats = {
+            "credenciales_creadas": 0,
+            "clientes_creados": 0,
+            "clientes_reutilizados": 0,
+            "tokens_desde_cache": 0,
+            "tokens_renovados": 0,
+        }
+
+    # ---------------- credenciales ----------------
+
+    @staticmethod
+    def _clave_para(creds_path: str) -> Tuple[Any, ...]:
+        usar_cache = bool(settings.get("google_sheets.token_cache", True))
+        if creds_path and os.path.exists(creds_path):
+            st = os.stat(creds_path)
+            return ("archivo", creds_path, st.st_mtime_ns, st.st_size, usar_cache)
+        return ("adc", creds_path, usar_cache)
+
+    def _crear_credenciales(self, creds_path: str):
+        if creds_path and os.path.exists(creds_path):
+            return service_account.Credentials.from_service_account_file(creds_path, scopes=SCOPES)
+        from google.auth import default
+        try:
+            creds, _ = default(scopes=SCOPES)
+        except Exception as e_adc:
+            raise RuntimeError(
+                f"No se encontraron credenciales (service account file {creds_path} no existe y ADC falló): {e_adc}"
+            )
+        return creds
+
+    def _huella(self) -> str:
+        """Identifica a quién pertenece el token guardado (cuenta + scopes)."""
+        cuenta = getattr(self._creds, "service_account_email", "") or "adc"
+        return hashlib.sha1(f"{cuenta}|{' '.join(SCOPES)}".encode("utf-8")).hexdigest()
+
+    def _leer_token(self) -> None:
+        try:
+            with open(self.token_path, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+            if datos.get("huella") != self._huella():
+                return
+            expiry = datetime.fromisoformat(datos["expiry"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        # google-auth usa datetimes UTC sin zona
+        if expiry - _MARGEN_TOKEN > datetime.utcnow():
+            self._creds.token = datos.get("token")
+            self._creds.expiry = expiry
+            self._token_guardado = self._creds.token
+            self._stats["tokens_desde_cache"] += 1
+
+    def _guardar_token(self) -> None:
+        token = getattr(self._creds, "token", None)
+        expiry = getattr(self._creds, "expiry", None)
+        if not token or expiry is None or token == self._token_guardado:
+            return
+        directorio = os.path.dirname(str(self.token_path)) or "."
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix="tmp_token_", dir=directorio)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"huella": self._huella(), "token": token, "expiry": expiry.isoformat()}, f)
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, self.token_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._token_guardado = token
+        except OSError as e:
+            print(f"[SHEETS] No se pudo guardar el token en {self.token_path}: {e}")
+
+    def _token_al_dia(self) -> None:
+        """Renueva el token si falta o está por vencer (con _lock tomado)."""
+        expiry = getattr(self._creds, "expiry", None)
+        if self._creds.token and (expiry is None or expiry - _MARGEN_TOKEN > datetime.utcnow()):
+            return
+        self._creds.refresh(Request(httplib2.Http()))
+        self._stats["tokens_renovados"] += 1
+
+    def _preparar(self, creds_path: str) -> None:
+        """Credenciales al día para creds_path (con _lock tomado)."""
+        clave = self._clave_para(creds_path)
+        if clave != self._clave or self._creds is None:
+            self._creds = self._crear_credenciales(creds_path)
+            self._token_guardado = None
+            self._clave = clave
+            self._generacion += 1
+            self._stats["credenciales_creadas"] += 1
+            print(f"[SHEETS] Credenciales cargadas ({'cuenta de servicio' if clave[0] == 'archivo' else 'ADC'})")
+            if clave[-1]:
+                self._leer_token()
+        self._token_al_dia()
+        if clave[-1]:
+            # también el que haya renovado AuthorizedHttp en otro hilo (no pasa por _lock);
+            # _guardar_token no escribe si es el mismo que ya está en disco
+            self._guardar_token()
+
+    # ---------------- API ----------------
+
+    def servicio(self, credentials_file: Optional[str] = None) -> Tuple[Optional[Any], Optional[str]]:
+        """(service, error_msg) listo para usar desde el hilo actual."""
+        if not _HAS_GOOGLE:
+            return None, "google-api-python-client o google-auth no están instalados"
+        try:
+            creds_path = resolver_credenciales(credentials_file)
+            with self._lock:
+                self._preparar(creds_path)
+                generacion = self._generacion
+                creds = self._creds
+                propio = getattr(self._local, "cliente", None)
+                if propio is not None and propio[0] == generacion:
+                    self._stats["clientes_reutilizados"] += 1
+                    return propio[1], None
+                self._stats["clientes_creados"] += 1
+            http = AuthorizedHttp(creds, http=httplib2.Http())
+            service = build("sheets", "v4", http=http, cache_discovery=False)
+            self._local.cliente = (generacion, service)
+            return service, None
+        except Exception as e:
+            return None, f"Error inicializando cliente Google Sheets: {e}"
+
+    def invalidar(self) -> None:
+        """Descarta credenciales, clientes y token guardado (p.ej. tras un error de autorización)."""
+        with self._lock:
+            self._creds = None
+            self._clave = None
+            self._generacion += 1
+            self._token_guardado = None
+            try:
+                os.remove(self.token_path)
+            except OSError:
+                pass
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+pool_sheets = PoolClientesSheets()
+
+
+def es_error_no_encontrado(error: Exception) -> bool:
+    """True si la API indica que la hoja, el rango o el spreadsheet no existen."""
+    status = getattr(getattr(error, "resp", None), "status", None)
+    texto = str(error).lower()
+    return status == 404 or "unable to parse range" in texto or "not found" in texto
+
+
+class CacheMetadatos:
+    """Propiedades de las hojas de cada spreadsheet (título, sheetId), con vencimiento."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # spreadsheet id -> (momento de la lectura, [properties de cada hoja])
+        self._cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._stats = {"aciertos": 0, "lecturas": 0, "invalidaciones": 0}
+
+    @staticmethod
+    def _ttl() -> float:
+        try:
+            return float(settings.get("google_sheets.metadata_ttl", 300))
+        except (TypeError, ValueError):
+            return 300.0
+
+    def hojas(self, service, sheet_id: str, refrescar: bool = False) -> List[Dict[str, Any]]:
+        """Properties de las hojas del spreadsheet, en orden (desde el cache si está vigente)."""
+        with self._lock:
+            previo = self._cache.get(sheet_id)
+            if not refrescar and previo is not None and time.monotonic() - previo[0] < self._ttl():
+                self._stats["aciertos"] += 1
+                return previo[1]
+        meta = service.spreadsheets().get(spreadsheetId=sheet_id, fields="sheets.properties").execute()
+        hojas = [h.get("properties", {}) for h in (meta.get("sheets", []) or [])]
+        with self._lock:
+            self._cache[sheet_id] = (time.monotonic(), hojas)
+            self._stats["lecturas"] += 1
+        return hojas
+
+    def titulos(self, service, sheet_id: str) -> List[str]:
+        return [h.get("title", "") for h in self.hojas(service, sheet_id)]
+
+    def titulo(self, service, sheet_id: str, sheet_name: Optional[str] = None) -> Optional[str]:
+        """sheet_name si se indica; si no, el título de la primera hoja (None si no hay hojas)."""
+        if sheet_name:
+            return sheet_name
+        titulos = self.titulos(service, sheet_id)
+        return titulos[0] if titulos else None
+
+    def sheet_id_numerico(self, service, sheet_id: str, sheet_name: Optional[str] = None) -> Optional[int]:
+        """
+        sheetId de la hoja con ese título (sin título, el de la primera). Si no
+        aparece se relee una vez sin cache (p. ej. la renombraron) y si sigue sin
+        aparecer devuelve None: nunca otra hoja, que recibiría los borrados.
+        """
+        for refrescar in (False, True):
+            hojas = self.hojas(service, sheet_id, refrescar=refrescar)
+            if not sheet_name:
+                return hojas[0].get("sheetId") if hojas else None
+            for h in hojas:
+                if h.get("title") == sheet_name:
+                    return h.get("sheetId")
+        return None
+
+    def asegurar_hoja(self, service, sheet_id: str, sheet_name: str) -> None:
+        """Crea la hoja si no existe; el cache del spreadsheet se invalida al crearla."""
+        if sheet_name in self.titulos(service, sheet_id):
+            return
+        try:
+            service.spreadsheets().batchUpdate(
+                spreadsheetId=sheet_id,
+                body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]}
+            ).execute()
+        finally:
+            self.invalidar(sheet_id)
+
+    def invalidar(self, sheet_id: Optional[str] = None) -> None:
+        """Olvida un spreadsheet (o todos)."""
+        with self._lock:
+            if sheet_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(sheet_id, None)
+            self._stats["invalidaciones"] += 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+metadatos_sheets = CacheMetadatos()
@@ -28,6 +28,20 @@ class InscripcionApp:
         except Exception:
             pass
         
+        # Backups automáticos (app.auto_backup / app.backup_interval_days) en segundo plano
+        try:
+            from services.backup import iniciar_respaldo_automatico
+            iniciar_respaldo_automatico()
+        except Exception as e:
+            print(f"[WARN] No se pudo iniciar el backup automático: {e}")
+        
+        # Snapshot columnar para estadísticas/cupos, mantenido en segundo plano
+        try:
+            from services.analitica import iniciar_actualizacion_automatica
+            iniciar_actualizacion_automatica()
+        except Exception as e:
+            print(f"[WARN] No se pudo iniciar el snapshot de analítica: {e}")
+        
     def _setup_style(self):
         """Configura estilos de la aplicación."""
         # Aplicar tema con alto contraste
@@ -8,9 +8,10 @@ import re
 import threading
 from ui.base_tab import BaseTab
 from database.csv_handler import (
-    cargar_registros, guardar_registro,
-    actualizar_registro, eliminar_registro,
-    generar_id, contar_inscripciones_materia
+    cargar_registros,
+    actualizar_registro, eliminar_registro, eliminar_registros_lote,
+    guardar_registros_lote, generar_id, contar_inscripciones_materia, iter_registros,
+    buscar_por_id, resolver_id, obtener_alumno
 )
 from models.materias import (
     get_todas_materias,
@@ -29,12 +30,12 @@ from services.email_service import send_certificado_via_email, get_smtp_config
 # sync helper is optional; call wrapped in try/except when used
 from config.settings import settings, CERTIFICATES_DIR
 
-# Detectar pandas
+# Detectar openpyxl (exportación a Excel en modo write_only)
 try:
-    import pandas as pd
-    _HAS_PANDAS = True
+    import openpyxl
+    _HAS_OPENPYXL = True
 except ImportError:
-    _HAS_PANDAS = False
+    _HAS_OPENPYXL = False
 
 # ScrollableFrame
 try:
@@ -101,6 +102,9 @@ class FormTab(BaseTab):
         ttk.Label(frame, text="DNI:").grid(row=2, column=0, sticky="e", padx=2, pady=2)
         self.entries["dni"] = ttk.Entry(frame, width=25)
         self.entries["dni"].grid(row=2, column=1, sticky="ew", padx=2, pady=2)
+        # reinscripción: al salir del DNI se completan los datos del alumno
+        self.entries["dni"].bind("<FocusOut>", self._autocompletar_por_dni)
+        self.entries["dni"].bind("<Return>", self._autocompletar_por_dni)
 
         ttk.Label(frame, text="Legajo:").grid(row=3, column=0, sticky="e", padx=2, pady=2)
         self.entries["legajo"] = ttk.Entry(frame, width=25)
@@ -235,6 +239,21 @@ class FormTab(BaseTab):
             highlightcolor="#4A4A4A", highlightbackground="#4A4A4A"
         )
         self.observaciones_text.grid(row=4, column=1, columnspan=5, sticky="ew", padx=2, pady=2)
+
+        # Materias acumuladas para guardar juntas (una sola escritura + una sincronización)
+        self.materias_pendientes = []
+        ttk.Label(frame, text="A inscribir:").grid(row=5, column=0, sticky="ne", padx=2, pady=2)
+        self.materias_listbox = tk.Listbox(
+            frame, height=4, bg="#3C3C3C", fg="#FFFFFF",
+            selectbackground="#505050", selectforeground="#FFFFFF",
+            borderwidth=1, relief="solid", highlightthickness=1,
+            highlightcolor="#4A4A4A", highlightbackground="#4A4A4A"
+        )
+        self.materias_listbox.grid(row=5, column=1, columnspan=4, sticky="ew", padx=2, pady=2)
+        materias_btns = ttk.Frame(frame)
+        materias_btns.grid(row=5, column=5, sticky="nw", padx=2, pady=2)
+        ttk.Button(materias_btns, text="➕ Agregar materia", command=self._agregar_materia).pack(fill=tk.X, pady=(0, 2))
+        ttk.Button(materias_btns, text="➖ Quitar", command=self._quitar_materia).pack(fill=tk.X)
         frame.columnconfigure(5, weight=1)
 
         # Inicializar cupo al construir la UI
@@ -333,6 +352,22 @@ class FormTab(BaseTab):
             return ""
         return str(vals[0])
 
+    def _registro_de_item(self, item_id, titulo="Error", silencioso=False):
+        """
+        Registro completo de un item de la tabla, a partir del ID completo (id_map)
+        o truncado (columna ID). Avisa si no existe o si el prefijo es ambiguo.
+        """
+        reg_id = self._get_id_from_item(item_id)
+        if not reg_id:
+            if not silencioso:
+                self.show_error(titulo, "No se pudo obtener el ID del item seleccionado")
+            return None
+        ok, resultado = resolver_id(reg_id)
+        registro = buscar_por_id(resultado) if ok else None
+        if registro is None and not silencioso:
+            self.show_error(titulo, resultado if not ok else "No se encontró el registro completo")
+        return registro
+
     def _filtrar_tabla(self):
         """Filtra la tabla según el texto de búsqueda (robusto ante tipos mixtos)."""
         search_text = (self.search_var.get() or "").lower()
@@ -378,21 +413,8 @@ class FormTab(BaseTab):
             self.show_warning("Editar", "Edición solo funciona con UN registro.\nSelecciona solo uno.")
             return
 
-        item_id = selection[0]
-        reg_id = self._get_id_from_item(item_id)
-        if not reg_id:
-            self.show_error("Error", "No se pudo obtener el ID del item seleccionado")
-            return
-
-        registros = cargar_registros()
-        registro = None
-        for reg in registros:
-            if str(reg.get("id", "")) == str(reg_id) or str(reg.get("id", "")).startswith(str(reg_id)):
-                registro = reg
-                break
-
+        registro = self._registro_de_item(selection[0])
         if not registro:
-            self.show_error("Error", "No se encontró el registro completo")
             return
 
         # Load fields (robust: check keys exist)
@@ -483,38 +505,13 @@ class FormTab(BaseTab):
         except Exception:
             pass
 
-        reg_id = self._get_id_from_item(item_id)
-        if not reg_id:
-            return
-
-        registros = cargar_registros()
-        registro = None
-        for reg in registros:
-            if str(reg.get("id", "")) == str(reg_id) or str(reg.get("id", "")).startswith(str(reg_id)):
-                registro = reg
-                break
-
+        registro = self._registro_de_item(item_id, silencioso=True)
         if not registro:
             return
 
         # Load only personal/responsible fields (no materia)
         try:
-            self.entries["nombre"].delete(0, tk.END); self.entries["nombre"].insert(0, registro.get("nombre", ""))
-            self.entries["apellido"].delete(0, tk.END); self.entries["apellido"].insert(0, registro.get("apellido", ""))
-            self.entries["dni"].delete(0, tk.END); self.entries["dni"].insert(0, registro.get("dni", ""))
-            self.entries["legajo"].delete(0, tk.END); self.entries["legajo"].insert(0, registro.get("legajo", ""))
-            self.entries["telefono"].delete(0, tk.END); self.entries["telefono"].insert(0, registro.get("telefono", ""))
-            self.entries["edad"].delete(0, tk.END); self.entries["edad"].insert(0, registro.get("edad", ""))
-            self.entries["direccion"].delete(0, tk.END); self.entries["direccion"].insert(0, registro.get("direccion", ""))
-            self.entries["email"].delete(0, tk.END); self.entries["email"].insert(0, registro.get("email", ""))
-            self.entries["fecha_nacimiento"].delete(0, tk.END); self.entries["fecha_nacimiento"].insert(0, registro.get("fecha_nacimiento", ""))
-            self.entries["nombre_padre"].delete(0, tk.END); self.entries["nombre_padre"].insert(0, registro.get("nombre_padre", ""))
-            self.entries["nombre_madre"].delete(0, tk.END); self.entries["nombre_madre"].insert(0, registro.get("nombre_madre", ""))
-            self.entries["telefono_emergencia"].delete(0, tk.END); self.entries["telefono_emergencia"].insert(0, registro.get("telefono_emergencia", ""))
-            self.entries["obra_social"].delete(0, tk.END); self.entries["obra_social"].insert(0, registro.get("obra_social", ""))
-            self.entries["monto"].delete(0, tk.END); self.entries["monto"].insert(0, registro.get("monto", ""))
-            self.saeta_var.set(registro.get("saeta", "No")); self.seguro_escolar_var.set(registro.get("seguro_escolar", "No"))
-            self.pago_voluntario_var.set(registro.get("pago_voluntario", "No")); self.permiso_var.set(registro.get("permiso", "No"))
+            self._completar_datos_alumno(registro)
         except Exception:
             pass
 
@@ -526,6 +523,33 @@ class FormTab(BaseTab):
 
         self.show_info("Datos cargados", f"Datos de {registro.get('nombre')} {registro.get('apellido')} cargados.\nSelecciona nueva materia para reinscribir.")
 
+    def _completar_datos_alumno(self, datos):
+        """Carga en el formulario los datos personales/responsable presentes en 'datos' (no toca la materia)."""
+        for campo in ("nombre", "apellido", "dni", "legajo", "telefono", "edad", "direccion", "email",
+                      "fecha_nacimiento", "nombre_padre", "nombre_madre", "telefono_emergencia",
+                      "obra_social", "monto"):
+            if campo in datos and campo in self.entries:
+                self.entries[campo].delete(0, tk.END)
+                self.entries[campo].insert(0, datos.get(campo, ""))
+        for campo, var in (("saeta", "saeta_var"), ("seguro_escolar", "seguro_escolar_var"),
+                           ("pago_voluntario", "pago_voluntario_var"), ("permiso", "permiso_var")):
+            if campo in datos and hasattr(self, var):
+                getattr(self, var).set(datos.get(campo, "No"))
+
+    def _autocompletar_por_dni(self, event=None):
+        """Si el DNI ya tiene inscripciones y el formulario está vacío, completa los datos del alumno."""
+        dni = self.entries["dni"].get().strip()
+        if not dni or self.entries["nombre"].get().strip() or self.entries["apellido"].get().strip():
+            return
+        try:
+            datos = obtener_alumno(dni)
+        except Exception as e:
+            print(f"[WARN] _autocompletar_por_dni: {e}")
+            return
+        if datos:
+            self._completar_datos_alumno(datos)
+            print(f"[FORM] Datos del alumno con DNI {dni} autocompletados")
+
     def _eliminar_seleccionado(self):
         """Elimina el/los registro(s) seleccionado(s), guarda localmente y sincroniza SÍNCRONAMENTE con Google Sheets."""
         selection = self.tree.selection()
@@ -537,45 +561,25 @@ class FormTab(BaseTab):
         if not self.ask_yes_no("Confirmar eliminación", f"¿Estás seguro de eliminar {count} inscripción(es)?"):
             return
 
-        # Resolver IDs completos a partir de la selección (usar id_map/_get_id_from_item para mayor fiabilidad)
-        try:
-            registros = cargar_registros()
-        except Exception:
-            registros = []
-
+        # Resolver IDs completos a partir de la selección (id_map o ID truncado vía índice)
         full_ids_to_delete = []
         registros_eliminados = []
+        no_resueltos = []
 
         for iid in list(selection):
-            try:
-                reg_id = self._get_id_from_item(iid)
-            except Exception:
-                reg_id = ""
+            reg_id = self._get_id_from_item(iid)
+            ok_id, resultado = resolver_id(reg_id) if reg_id else (False, f"No pude determinar ID para item {iid}")
+            if not ok_id:
+                print(f"[WARN] _eliminar_seleccionado: {resultado}")
+                no_resueltos.append(resultado)
+                continue
+            full_ids_to_delete.append(resultado)
+            reg = buscar_por_id(resultado)
+            if reg is not None:
+                registros_eliminados.append(reg)
 
-            if not reg_id:
-                try:
-                    vals = self.tree.item(iid).get("values") or []
-                    reg_id = str(vals[0]) if vals else ""
-                except Exception:
-                    reg_id = ""
-
-            matched_full = None
-            for reg in registros:
-                rid = str(reg.get("id", "") or "")
-                if not rid:
-                    continue
-                if rid == reg_id or (reg_id and rid.startswith(reg_id)):
-                    matched_full = rid
-                    registros_eliminados.append(reg)
-                    break
-
-            if matched_full:
-                full_ids_to_delete.append(matched_full)
-            else:
-                if reg_id:
-                    full_ids_to_delete.append(reg_id)
-                else:
-                    print(f"[WARN] _eliminar_seleccionado: No pude determinar ID para item {iid}")
+        if no_resueltos:
+            self.show_warning("Eliminar", "No se eliminarán estos registros:\n" + "\n".join(no_resueltos[:5]))
 
         print("[DEBUG] _eliminar_seleccionado: full_ids_to_delete:", full_ids_to_delete)
         print("[DEBUG] _eliminar_seleccionado: registros_eliminados_count:", len(registros_eliminados))
@@ -596,29 +600,14 @@ class FormTab(BaseTab):
             except Exception:
                 pass
 
-        # 4) Filtrar registros locales y guardar el CSV (atomic write)
-        registros_actuales = cargar_registros()
-        def deberia_eliminar(r):
-            rid = str(r.get("id", "") or "")
-            for fid in full_ids_to_delete:
-                if not fid:
-                    continue
-                if rid == fid or rid.startswith(str(fid)):
-                    return True
-            return False
-
-        registros_filtrados = [r for r in registros_actuales if not deberia_eliminar(r)]
-
-        from database.csv_handler import guardar_todos_registros
-        print("[DEBUG] eliminar_seleccionado: registros antes:", len(registros_actuales), "después:", len(registros_filtrados))
-        ok, msg = guardar_todos_registros(registros_filtrados)
-        print("[DEBUG] guardar_todos_registros ->", ok, msg)
+        # 4) Eliminar localmente en una sola operación (matching exacto por conjunto de IDs)
+        ok, msg = eliminar_registros_lote(full_ids_to_delete)
+        print("[DEBUG] eliminar_registros_lote ->", ok, msg)
         if not ok:
             self.show_error("Error", f"No se pudo actualizar el archivo local: {msg}")
             self.refresh()
             return
-
-        # ==== SINCRONIZACIÓN SÍNCRONA (delete por ID + push completo + verify + retry) ====
+        # ==== SINCRONIZACIÓN SÍNCRONA (un solo batchUpdate con todas las filas + retry con push completo) ====
         try:
             sheet_key = settings.get("google_sheets.sheet_key", "") or settings.get("spreadsheet_id", "") or settings.get("sheet_key", "")
         except Exception:
@@ -626,45 +615,19 @@ class FormTab(BaseTab):
 
         if sheet_key:
             try:
-                from services.google_sheets import delete_row_by_id, sync_to_google_sheets, verify_remote_sync
+                from services.google_sheets import delete_rows_by_ids, sync_to_google_sheets
                 import time
-                # 1) delete por ID (intentar para cada id)
-                for reg in registros_eliminados:
-                    idv = str(reg.get("id", "") or "")
-                    if not idv:
-                        continue
-                    try:
-                        okd, msgd = delete_row_by_id(sheet_key, idv)
-                        print(f"[INFO] delete_row_by_id id={idv} ->", okd, msgd)
-                    except Exception as e:
-                        print(f"[WARN] delete_row_by_id exception id={idv}:", e)
-
-                # 2) push completo sincronizado
-                ok_push, msg_push = sync_to_google_sheets(sheet_key)
-                print("[DEBUG] _eliminar_seleccionado: sync_to_google_sheets ->", ok_push, msg_push)
-
-                # 3) verify readback
-                ok_v, values = verify_remote_sync(sheet_key)
-                if ok_v:
-                    remote_rows = max(0, len(values) - 1) if len(values) > 0 else 0
-                    local_rows = len(cargar_registros())
-                    print(f"[DEBUG] _eliminar_seleccionado: verify -> remote_rows={remote_rows} local_rows={local_rows}")
-                    if remote_rows != local_rows:
-                        # retry one time
-                        print("[DEBUG] _eliminar_seleccionado: mismatch counts, retrying push once...")
-                        time.sleep(1)
-                        ok_push2, msg_push2 = sync_to_google_sheets(sheet_key)
-                        print("[DEBUG] _eliminar_seleccionado: retry sync ->", ok_push2, msg_push2)
-                        ok_v2, values2 = verify_remote_sync(sheet_key)
-                        if ok_v2:
-                            remote_rows2 = max(0, len(values2) - 1) if len(values2) > 0 else 0
-                            if remote_rows2 != local_rows:
-                                self.show_warning("Sincronización parcial", f"Tras borrar, la hoja remota ({remote_rows2}) no coincide con el local ({local_rows}). Revisa permisos/otro equipo.")
-                        else:
-                            self.show_warning("Sincronización", f"Push realizado pero no se pudo verificar el resultado: {values2}")
-                else:
-                    print("[WARN] _eliminar_seleccionado: verify_remote_sync falló:", values)
-                    self.show_warning("Sincronización", f"Push realizado pero no se pudo verificar el resultado: {values}")
+                # 1) borrar las filas de todos los IDs: lee la columna A una vez y manda un batchUpdate
+                ok_del, msg_del = delete_rows_by_ids(sheet_key, full_ids_to_delete)
+                print("[INFO] delete_rows_by_ids ->", ok_del, msg_del)
+                if not ok_del:
+                    # 2) retry one time: push completo (verificado según google_sheets.verify_mode)
+                    print("[DEBUG] _eliminar_seleccionado: delete remoto falló, retrying con push completo...")
+                    time.sleep(1)
+                    ok_push, msg_push = sync_to_google_sheets(sheet_key)
+                    print("[DEBUG] _eliminar_seleccionado: retry sync ->", ok_push, msg_push)
+                    if not ok_push:
+                        self.show_warning("Sincronización parcial", f"Tras borrar, la hoja remota no quedó al día: {msg_push}. Revisa permisos/otro equipo.")
             except Exception as e:
                 print("[WARN] _eliminar_seleccionado: error sincronizando remoto:", e)
         else:
@@ -681,78 +644,6 @@ class FormTab(BaseTab):
         except Exception:
             pass
 
-        # Lanzar una sola sincronización robusta en background: deletes puntuales + push completo
-        def sync_worker(deleted_regs, updated_list):
-            lock = getattr(self, "_sync_lock", None)
-            if lock:
-                lock.acquire()
-            try:
-                try:
-                    sheet_key = settings.get("google_sheets.sheet_key", "") or settings.get("spreadsheet_id", "") or settings.get("sheet_key", "")
-                except Exception:
-                    sheet_key = ""
-
-                if not sheet_key:
-                    print("[INFO] sync_worker: No sheet_key configurado, no se sincroniza remotamente")
-                    return
-
-                # 1) Intentar delete por ID (services preferred)
-                deleted_ids = [str(r.get("id", "")) for r in (deleted_regs or [])]
-                print("[INFO] sync_worker: intentar deletes remotos para IDs:", deleted_ids)
-
-                try:
-                    from services.google_sheets import delete_row_by_id as svc_delete
-                except Exception:
-                    svc_delete = None
-
-                for reg in (deleted_regs or []):
-                    idv = str(reg.get("id", "") or "")
-                    if not idv:
-                        continue
-                    try:
-                        if svc_delete:
-                            okd, msgd = svc_delete(sheet_key, idv)
-                            print(f"[INFO] delete_row_by_id (services) id={idv} ->", okd, msgd)
-                        else:
-                            try:
-                                from database.google_sheets import delete_row_by_id as db_delete
-                                okd, msgd = db_delete(sheet_key, idv)
-                                print(f"[INFO] delete_row_by_id (database) id={idv} ->", okd, msgd)
-                            except Exception as e_db:
-                                print(f"[WARN] No hay helper de delete disponible para id={idv}: {e_db}")
-                    except Exception as e:
-                        print(f"[WARN] Excepción al intentar borrar id={idv}:", e)
-
-                # 2) Forzar push completo del CSV actualizado (remote <- local)
-                try:
-                    from database.google_sheets import subir_a_google_sheets
-                    print("[INFO] sync_worker: forzando push completo del CSV actualizado (remote <- local), filas:", len(updated_list))
-                    ok2, msg2 = subir_a_google_sheets(updated_list, sheet_key)
-                    print("[INFO] push completo ->", ok2, msg2)
-                    if not ok2:
-                        print("[WARN] push completo devolvió fallo:", msg2)
-                except Exception as e:
-                    print("[ERROR] sync_worker: error al forzar push completo:", e)
-            finally:
-                if lock:
-                    try:
-                        lock.release()
-                    except Exception:
-                        pass
-
-        threading.Thread(target=sync_worker, args=(registros_eliminados, registros_filtrados), daemon=True).start()
-
-        # feedback y refrescos
-        self.show_info("Eliminado", f"{len(full_ids_to_delete)} registro(s) eliminado(s) localmente. Sincronizando hoja remota...")
-        try:
-            self.refresh()
-        except Exception:
-            pass
-        try:
-            self.app.refresh_all()
-        except Exception:
-            pass
-
     def _enviar_certificado_seleccionado(self):
         """Genera y envía certificado del registro seleccionado en la tabla."""
         sel = self.tree.selection()
@@ -760,32 +651,8 @@ class FormTab(BaseTab):
             self.show_warning("Sin selección", "Selecciona un registro de la tabla")
             return
 
-        item = self.tree.item(sel[0])
-        values = item.get("values") or []
-        if not values:
-            return
-        id_corto = str(values[0])
-
-        # Buscar registro seleccionado de forma robusta (evita TypeError si id es int/None)
-        registros = cargar_registros()
-        registro = None
-        for r in registros:
-            try:
-                rid = r.get("id", "")
-            except Exception:
-                rid = ""
-            if rid is None:
-                continue
-            try:
-                if str(rid).startswith(str(id_corto)):
-                    registro = r
-                    break
-            except Exception:
-                # si por algún motivo no se puede convertir/comparar, continuar con el siguiente registro
-                continue
-
+        registro = self._registro_de_item(sel[0])
         if not registro:
-            self.show_error("Error", "No se encontró el registro seleccionado")
             return
 
         if not registro.get("email"):
@@ -1094,72 +961,203 @@ class FormTab(BaseTab):
         except Exception:
             pass
 
-    def _guardar(self):
-        """Guarda la inscripción (validaciones mínimas + guardado + sincronización SÍNCRONA con Google Sheets)."""
-        # Validar campos obligatorios
-        if not self.entries.get("nombre") or not self.entries["nombre"].get().strip():
-            self.show_warning("Validación", "El nombre es obligatorio")
-            return
+    def _anio_turno_limpios(self):
+        """(año, turno) del formulario sin decoraciones ("Año: 1°" -> "1")."""
+        # Extraer solo el número del año
+        año_raw = self.anio_var.get() if hasattr(self, "anio_var") else ""
+        año_limpio = ""
+        if año_raw:
+            # Si viene "Año: 1°" o "1°" -> extraer solo el "1"
+            match = re.search(r'\d+', año_raw)
+            if match:
+                año_limpio = match.group(0)  # Solo el número
 
-        if not self.entries.get("apellido") or not self.entries["apellido"].get().strip():
-            self.show_warning("Validación", "El apellido es obligatorio")
-            return
+        # Limpiar el turno (eliminar "Año: " y "°")
+        turno_raw = self.turno_var.get() if hasattr(self, "turno_var") else ""
+        turno_limpio = turno_raw
+        if "Año:" in turno_limpio:
+            turno_limpio = ""  # Si viene con "Año:" es que está mal, vaciar
+        elif "°" in turno_limpio:
+            turno_limpio = turno_limpio.replace("°", "").strip()
+        return año_limpio, turno_limpio
 
-        if not self.entries.get("dni") or not self.entries["dni"].get().strip():
-            self.show_warning("Validación", "El DNI es obligatorio")
-            return
+    def _seleccion_materia_actual(self):
+        """Materia elegida en los combos (dict) o None si no hay materia seleccionada."""
+        materia = (self.materia_var.get() if hasattr(self, "materia_var") else "") or ""
+        if not materia:
+            return None
+        año_limpio, turno_limpio = self._anio_turno_limpios()
+        return {
+            "anio": año_limpio,
+            "turno": turno_limpio,
+            "materia": materia,
+            "profesor": (self.profesor_var.get() if hasattr(self, "profesor_var") else ""),
+            "comision": (self.comision_var.get() if hasattr(self, "comision_var") else ""),
+            "horario": (self.horario_var.get() if hasattr(self, "horario_var") else ""),
+        }
 
+    def _validar_seleccion_materia(self):
+        """Avisa qué falta en la materia de los combos. True si está completa."""
         if not (hasattr(self, "anio_var") and self.anio_var.get()):
             self.show_warning("Validación", "El año es obligatorio")
-            return
+            return False
 
         if not (hasattr(self, "materia_var") and self.materia_var.get()):
             self.show_warning("Validación", "La materia es obligatoria")
-            return
+            return False
 
         if not (hasattr(self, "profesor_var") and self.profesor_var.get()):
             self.show_warning("Validación", "El profesor es obligatorio")
-            return
+            return False
 
         if not (hasattr(self, "comision_var") and self.comision_var.get()):
             self.show_warning("Validación", "La comisión es obligatoria")
+            return False
+        return True
+
+    @staticmethod
+    def _clave_materia(sel):
+        return (sel.get("materia", ""), sel.get("profesor", ""), sel.get("comision", ""))
+
+    def _selecciones_materia(self):
+        """Materias agregadas a la lista más la elegida en los combos (sin repetir)."""
+        selecciones = list(getattr(self, "materias_pendientes", []) or [])
+        actual = self._seleccion_materia_actual()
+        if actual and self._clave_materia(actual) not in {self._clave_materia(m) for m in selecciones}:
+            selecciones.append(actual)
+        return selecciones
+
+    def _refrescar_materias_pendientes(self):
+        if not hasattr(self, "materias_listbox"):
             return
-
-        # Generar ID
-        nuevo_id = None
+        self.materias_listbox.delete(0, tk.END)
+        for m in self.materias_pendientes:
+            texto = f"{m.get('materia', '')} - {m.get('profesor', '')} - Com. {m.get('comision', '')}"
+            if m.get("horario"):
+                texto += f" ({m.get('horario')})"
+            self.materias_listbox.insert(tk.END, texto)
+
+    def _limpiar_seleccion_materia(self):
+        """Vacía materia/profesor/comisión/horario (conserva el año para elegir otra materia)."""
+        for nombre in ("materia_var", "profesor_var", "comision_var", "horario_var"):
+            try:
+                if hasattr(self, nombre):
+                    getattr(self, nombre).set("")
+            except Exception:
+                pass
         try:
-            nuevo_id = generar_id({
-                "legajo": (self.entries.get("legajo") and self.entries["legajo"].get().strip()) or "",
-                "dni": (self.entries.get("dni") and self.entries["dni"].get().strip()) or ""
-            })
-            if not nuevo_id:
-                raise Exception("generar_id devolvió vacío")
+            if hasattr(self, "cupo_label"):
+                self.cupo_label.config(text="Sin cupo definido", foreground="green")
         except Exception:
-            import uuid
-            nuevo_id = str(uuid.uuid4())
+            pass
 
-        # Limpiar valores de anio y turno antes de guardar
-        # Extraer solo el número del año
-        año_raw = self.anio_var.get() if hasattr(self, "anio_var") else ""
-        año_limpio = ""
-        if año_raw:
-            # Si viene "Año: 1°" o "1°" -> extraer solo el "1"
-            match = re.search(r'\d+', año_raw)
-            if match:
-                año_limpio = match.group(0)  # Solo el número
+    def _agregar_materia(self):
+        """Suma la materia elegida a la lista de la inscripción en curso."""
+        if not self._validar_seleccion_materia():
+            return
+        actual = self._seleccion_materia_actual()
+        if self._clave_materia(actual) in {self._clave_materia(m) for m in self.materias_pendientes}:
+            self.show_warning("Materias", "Esa materia/comisión ya está en la lista")
+            return
+        self.materias_pendientes.append(actual)
+        self._refrescar_materias_pendientes()
+        self._limpiar_seleccion_materia()
 
-        # Limpiar el turno (eliminar "Año: " y "°")
-        turno_raw = self.turno_var.get() if hasattr(self, "turno_var") else ""
-        turno_limpio = turno_raw
-        if "Año:" in turno_limpio:
-            turno_limpio = ""  # Si viene con "Año:" es que está mal, vaciar
-        elif "°" in turno_limpio:
-            turno_limpio = turno_limpio.replace("°", "").strip()
+    def _quitar_materia(self):
+        """Quita la materia seleccionada de la lista (o la última si no hay selección)."""
+        if not self.materias_pendientes:
+            return
+        seleccion = self.materias_listbox.curselection() if hasattr(self, "materias_listbox") else ()
+        indice = seleccion[0] if seleccion else len(self.materias_pendientes) - 1
+        del self.materias_pendientes[indice]
+        self._refrescar_materias_pendientes()
 
-        # Construir registro
-        registro = {
-            "id": str(nuevo_id),
-            "fecha_inscripcion": datetime.now().isoformat(),
+    def _verificar_cupos(self, registros):
+        """
+        Verifica el cupo de todas las materias de la inscripción en una pasada:
+        cuenta los inscriptos una vez por materia/profesor/comisión, suma las
+        elegidas antes en el mismo envío y, si alguna está completa, pregunta una
+        sola vez por la lista de espera. Devuelve False si el usuario cancela.
+        """
+        completas = []
+        ocupados = {}
+        for registro in registros:
+            try:
+                materia = registro.get("materia", "")
+                profesor = registro.get("profesor", "")
+                comision = registro.get("comision", "")
+                clave = (materia, profesor, comision)
+                cupo_val = None
+
+                # intentar obtener cupo por materia/profesor/comision desde instruments (get_info_completa)
+                try:
+                    info = get_info_completa(materia, profesor, comision)
+                    if info and ("cupo" in info and info.get("cupo") is not None):
+                        try:
+                            cupo_val = int(info.get("cupo"))
+                        except Exception:
+                            cupo_val = None
+                except Exception:
+                    info = None
+
+                if clave not in ocupados:
+                    # contar inscritos (filtrado por materia/profesor/comision si es posible)
+                    try:
+                        ocupados[clave] = contar_inscripciones_materia(materia, profesor if profesor else None, comision if comision else None)
+                    except Exception:
+                        ocupados[clave] = 0
+
+                restante = None if cupo_val is None else max(0, cupo_val - ocupados[clave])
+                ocupados[clave] += 1
+                if cupo_val is not None and restante <= 0:
+                    completas.append(registro)
+            except Exception as e:
+                print("[WARN] error verificando cupo:", e)
+
+        if not completas:
+            return True
+
+        # cupos completos -> preguntar lista de espera (una vez para todas)
+        detalle = "\n".join(f"- {r.get('materia', '')} / com. {r.get('comision', '')}" for r in completas)
+        if not self.ask_yes_no("Cupo completo", f"No quedan vacantes en:\n{detalle}\n\nDesea inscribir en lista de espera?"):
+            # usuario canceló, abortar guardado
+            self.show_info("Cancelado", "Inscripción cancelada por el usuario.")
+            return False
+        for registro in completas:
+            registro["en_lista_espera"] = "Sí"
+            # agregar observación automática si no existe
+            obs = registro.get("observaciones", "") or ""
+            if "Lista de espera" not in obs:
+                registro["observaciones"] = (obs + " | Inscrito en lista de espera").strip().lstrip("|").strip()
+        return True
+
+    def _guardar(self):
+        """
+        Guarda la inscripción en todas las materias elegidas (las de la lista más la
+        de los combos) como un solo lote: una verificación de cupos, una escritura y
+        una sincronización SÍNCRONA con Google Sheets.
+        """
+        # Validar campos obligatorios
+        if not self.entries.get("nombre") or not self.entries["nombre"].get().strip():
+            self.show_warning("Validación", "El nombre es obligatorio")
+            return
+
+        if not self.entries.get("apellido") or not self.entries["apellido"].get().strip():
+            self.show_warning("Validación", "El apellido es obligatorio")
+            return
+
+        if not self.entries.get("dni") or not self.entries["dni"].get().strip():
+            self.show_warning("Validación", "El DNI es obligatorio")
+            return
+
+        # La materia de los combos se valida si está elegida o si no hay otras en la lista
+        if (hasattr(self, "materia_var") and self.materia_var.get()) or not self.materias_pendientes:
+            if not self._validar_seleccion_materia():
+                return
+        selecciones = self._selecciones_materia()
+
+        # Datos del alumno y de la inscripción, comunes a todas las materias
+        base = {
             "nombre": (self.entries.get("nombre") and self.entries["nombre"].get().strip()) or "",
             "apellido": (self.entries.get("apellido") and self.entries["apellido"].get().strip()) or "",
             "dni": (self.entries.get("dni") and self.entries["dni"].get().strip()) or "",
@@ -1178,66 +1176,42 @@ class FormTab(BaseTab):
             "pago_voluntario": (self.pago_voluntario_var.get() if hasattr(self, "pago_voluntario_var") else "No"),
             "monto": (self.entries.get("monto") and self.entries["monto"].get().strip()) or "",
             "permiso": (self.permiso_var.get() if hasattr(self, "permiso_var") else "No"),
-            "anio": año_limpio,
-            "turno": turno_limpio,
-            "materia": (self.materia_var.get() if hasattr(self, "materia_var") else ""),
-            "profesor": (self.profesor_var.get() if hasattr(self, "profesor_var") else ""),
-            "comision": (self.comision_var.get() if hasattr(self, "comision_var") else ""),
-            "horario": (self.horario_var.get() if hasattr(self, "horario_var") else ""),
             "observaciones": (self.observaciones_text.get("1.0", tk.END).strip() if hasattr(self, "observaciones_text") else ""),
             "en_lista_espera": "No"
         }
 
-        # ===== Verificar cupo antes de guardar =====
-        try:
-            materia = registro.get("materia", "")
-            profesor = registro.get("profesor", "")
-            comision = registro.get("comision", "")
-            cupo_val = None
-            inscritos = 0
-
-            # intentar obtener cupo por materia/profesor/comision desde instruments (get_info_completa)
-            try:
-                info = get_info_completa(materia, profesor, comision)
-                if info and ("cupo" in info and info.get("cupo") is not None):
-                    try:
-                        cupo_val = int(info.get("cupo"))
-                    except Exception:
-                        cupo_val = None
-            except Exception:
-                info = None
-
-            # contar inscritos (filtrado por materia/profesor/comision si es posible)
+        # Construir un registro por materia (IDs distintos aunque se generen en el mismo segundo)
+        fecha = datetime.now().isoformat()
+        registros = []
+        ids = set()
+        for sel in selecciones:
+            nuevo_id = None
             try:
-                inscritos = contar_inscripciones_materia(materia, profesor if profesor else None, comision if comision else None)
+                while not nuevo_id or nuevo_id in ids:
+                    nuevo_id = generar_id({"legajo": base["legajo"], "dni": base["dni"]})
+                    if not nuevo_id:
+                        raise Exception("generar_id devolvió vacío")
             except Exception:
-                inscritos = 0
+                import uuid
+                nuevo_id = str(uuid.uuid4())
+            ids.add(nuevo_id)
+            registros.append({"id": str(nuevo_id), "fecha_inscripcion": fecha, **base, **sel})
 
-            restante = None if cupo_val is None else max(0, cupo_val - inscritos)
-
-            # si cupo definido y completo -> preguntar lista de espera
-            if cupo_val is not None and restante <= 0:
-                if not self.ask_yes_no("Cupo completo", f"No quedan vacantes en {materia} / com. {comision}. Desea inscribir en lista de espera?"):
-                    # usuario canceló, abortar guardado
-                    self.show_info("Cancelado", "Inscripción cancelada por el usuario.")
-                    return
-                else:
-                    registro["en_lista_espera"] = "Sí"
-                    # agregar observación automática si no existe
-                    obs = registro.get("observaciones", "") or ""
-                    if "Lista de espera" not in obs:
-                        registro["observaciones"] = (obs + " | Inscrito en lista de espera").strip().lstrip("|").strip()
-        except Exception as e:
-            print("[WARN] error verificando cupo:", e)
+        # ===== Verificar cupos antes de guardar =====
+        if not self._verificar_cupos(registros):
+            return
 
-        # Guardar localmente
+        # Guardar localmente (un solo lote)
         try:
-            ok_local, msg_local = guardar_registro(registro)
+            ok_local, msg_local = guardar_registros_lote(registros)
         except Exception as e:
             self.show_error("Error", f"No se pudo guardar: {e}")
             return
+        if not ok_local:
+            self.show_error("Error", f"No se pudo guardar: {msg_local}")
+            return
 
-        print("[DEBUG] _guardar: guardado local ok:", ok_local, "msg:", msg_local, "id:", registro.get("id"))
+        print("[DEBUG] _guardar: guardado local ok:", ok_local, "msg:", msg_local, "ids:", [r.get("id") for r in registros])
 
         # Preparar sheet_key
         try:
@@ -1247,40 +1221,22 @@ class FormTab(BaseTab):
 
         print("[DEBUG] _guardar: sheet_key actual:", sheet_key)
 
-        # Si hay sheet_key, hacer push SÍNCRONO + readback + retry 1 vez
+        # Si hay sheet_key, hacer push SÍNCRONO (verificado según google_sheets.verify_mode) + retry 1 vez
         if sheet_key:
             try:
-                from services.google_sheets import sync_to_google_sheets, verify_remote_sync
-                import time, json
-                # intento 1
-                ok_push, msg_push = sync_to_google_sheets(sheet_key)
-                print("[DEBUG] _guardar: sync_to_google_sheets ->", ok_push, msg_push)
-
-                # readback para verificar conteo (header + rows)
-                ok_v, values = verify_remote_sync(sheet_key)
-                if ok_v:
-                    # calcular filas de datos leídas (excluir header si existe)
-                    remote_rows = max(0, len(values) - 1) if len(values) > 0 else 0
-                    from database.csv_handler import cargar_registros
-                    local_rows = len(cargar_registros())
-                    print(f"[DEBUG] _guardar: verify_remote_sync -> remote_rows={remote_rows} local_rows={local_rows}")
-                    if remote_rows != local_rows:
-                        # retry una vez
-                        print("[DEBUG] _guardar: mismatch counts, reintentando push completo (retry 1)...")
-                        time.sleep(1)
-                        ok_push2, msg_push2 = sync_to_google_sheets(sheet_key)
-                        print("[DEBUG] _guardar: retry sync_to_google_sheets ->", ok_push2, msg_push2)
-                        ok_v2, values2 = verify_remote_sync(sheet_key)
-                        if ok_v2:
-                            remote_rows2 = max(0, len(values2) - 1) if len(values2) > 0 else 0
-                            print(f"[DEBUG] _guardar: post-retry remote_rows={remote_rows2}")
-                            if remote_rows2 != local_rows:
-                                self.show_warning("Sincronización parcial", f"Se intentó sincronizar, pero las filas remotas ({remote_rows2}) no coinciden con las locales ({local_rows}). Revisa conexión/permisos.")
-                        else:
-                            self.show_warning("Sincronización", f"Push realizado pero no se pudo verificar el resultado: {values2}")
-                else:
-                    print("[WARN] _guardar: verify_remote_sync falló:", values)
-                    self.show_warning("Sincronización", f"Push realizado pero no se pudo verificar el resultado: {values}")
+                from services.google_sheets import sync_incremental_to_sheets, sync_to_google_sheets
+                import time
+                # intento 1: solo las filas nuevas (append)
+                ok_push, msg_push = sync_incremental_to_sheets(sheet_key)
+                print("[DEBUG] _guardar: sync_incremental_to_sheets ->", ok_push, msg_push)
+                if not ok_push:
+                    # retry una vez, reescribiendo la hoja
+                    print("[DEBUG] _guardar: push incremental falló, reintentando push completo (retry 1)...")
+                    time.sleep(1)
+                    ok_push2, msg_push2 = sync_to_google_sheets(sheet_key)
+                    print("[DEBUG] _guardar: retry sync_to_google_sheets ->", ok_push2, msg_push2)
+                    if not ok_push2:
+                        self.show_warning("Sincronización parcial", f"Se intentó sincronizar, pero la hoja remota no quedó al día: {msg_push2}. Revisa conexión/permisos.")
             except Exception as e:
                 print("[WARN] _guardar: error al sincronizar:", e)
                 # No bloquear al usuario por un fallo de red; ya guardamos localmente
@@ -1289,9 +1245,13 @@ class FormTab(BaseTab):
 
         # Feedback al usuario y refresco UI
         try:
-            self.show_info("Éxito", f"Inscripción guardada correctamente\nID: {str(nuevo_id)[:8]}")
+            if len(registros) == 1:
+                self.show_info("Éxito", f"Inscripción guardada correctamente\nID: {registros[0]['id'][:8]}")
+            else:
+                materias_txt = "\n".join(f"- {r.get('materia', '')}" for r in registros)
+                self.show_info("Éxito", f"Se guardaron {len(registros)} inscripciones:\n{materias_txt}")
         except Exception:
-            print("[INFO] Inscripción guardada, ID:", str(nuevo_id)[:8])
+            print("[INFO] Inscripciones guardadas, IDs:", [r["id"][:8] for r in registros])
 
         try:
             self._limpiar()
@@ -1389,6 +1349,13 @@ class FormTab(BaseTab):
         except Exception:
             pass
 
+        # Materias acumuladas
+        try:
+            self.materias_pendientes = []
+            self._refrescar_materias_pendientes()
+        except Exception:
+            pass
+
         # Label de cupo (si existe)
         try:
             if hasattr(self, "cupo_label"):
@@ -1461,8 +1428,8 @@ class FormTab(BaseTab):
             **campos
         }
         
-        # Generar PDF
-        ok, result = generar_certificado_pdf(registro)
+        # Generar PDF (un solo certificado con todas las materias elegidas)
+        ok, result = generar_certificado_pdf(registro, materias=self._selecciones_materia() or None)
         if not ok:
             self.show_error("Error al generar", result)
             return
@@ -1513,7 +1480,7 @@ class FormTab(BaseTab):
             **campos
         }
         
-        ok, result = generar_certificado_pdf(registro)
+        ok, result = generar_certificado_pdf(registro, materias=self._selecciones_materia() or None)
         if not ok:
             self.show_error("Error", result)
             return
@@ -1532,31 +1499,32 @@ class FormTab(BaseTab):
         except Exception as e:
             print(f"[WARN] No se pudo abrir el PDF: {e}")
 
+    def _materias_seleccionadas(self, selection, registro):
+        """Registros de la selección de la tabla que son del mismo alumno que 'registro'."""
+        materias = [registro]
+        for item in selection[1:]:
+            otro = self._registro_de_item(item, silencioso=True)
+            if otro and str(otro.get("dni", "")) == str(registro.get("dni", "")):
+                materias.append(otro)
+        return materias
+
     def _generar_certificado_seleccionado(self):
-        """Genera el certificado del registro seleccionado (sin enviarlo)."""
+        """
+        Genera el certificado del registro seleccionado (sin enviarlo). Con varias
+        filas del mismo alumno seleccionadas sale un único certificado con todas.
+        """
         selection = self.tree.selection()
         if not selection:
             self.show_warning("Certificado", "Selecciona un registro de la tabla")
             return
 
-        # Tomar la primera selección (la UI original usaba edición por 1)
-        item = self.tree.item(selection[0])
-        values = item.get("values") or []
-        if not values:
-            self.show_warning("Certificado", "El item seleccionado no tiene valores")
-            return
-
-        id_corto = str(values[0])
-
-        # Buscar el registro completo en el CSV local
-        registros = cargar_registros()
-        registro = next((reg for reg in registros if str(reg.get("id", "")).startswith(id_corto)), None)
+        # El alumno es el de la primera selección
+        registro = self._registro_de_item(selection[0], titulo="Certificado")
         if not registro:
-            self.show_error("Error", "No se encontró el registro seleccionado")
             return
 
         try:
-            ok, result = generar_certificado_pdf(registro)
+            ok, result = generar_certificado_pdf(registro, materias=self._materias_seleccionadas(selection, registro))
             if ok:
                 # result suele ser la ruta al PDF o mensaje de éxito
                 self.show_info("Certificado", f"Certificado generado: {result}")
@@ -1578,13 +1546,14 @@ class FormTab(BaseTab):
             self.show_error("Error", f"Ocurrió un error al generar el certificado: {e}")
 
     def _exportar_excel(self):
-        """Exporta todos los registros a Excel."""
-        registros = cargar_registros()
-        if not registros:
+        """Exporta todos los registros a Excel (fila a fila, sin cargar todo en memoria)."""
+        from config.settings import CSV_FIELDS
+        
+        if next(iter_registros(campos=["id"]), None) is None:
             self.show_info("Sin datos", "No hay registros para exportar")
             return
         
-        if _HAS_PANDAS:
+        if _HAS_OPENPYXL:
             # Exportar a Excel
             out_path = filedialog.asksaveasfilename(
                 defaultextension=".xlsx",
@@ -1596,15 +1565,19 @@ class FormTab(BaseTab):
                 return
             
             try:
-                df = pd.DataFrame(registros)
-                df.to_excel(out_path, index=False)
+                wb = openpyxl.Workbook(write_only=True)
+                ws = wb.create_sheet("Inscripciones")
+                ws.append(CSV_FIELDS)
+                for r in iter_registros(campos=CSV_FIELDS):
+                    ws.append([r[k] for k in CSV_FIELDS])
+                wb.save(out_path)
                 self.show_info("Exportado", f"Exportado a: {out_path}")
             except Exception as e:
                 self.show_error("Error", f"No se pudo crear Excel: {e}")
         else:
             # Ofrecer CSV como alternativa
-            if self.ask_yes_no("Pandas no instalado", 
-                              "pandas no está instalado.\n¿Desea exportar a CSV en su lugar?"):
+            if self.ask_yes_no("openpyxl no instalado", 
+                              "openpyxl no está instalado.\n¿Desea exportar a CSV en su lugar?"):
                 out_path = filedialog.asksaveasfilename(
                     defaultextension=".csv",
                     filetypes=[("CSV", "*.csv")],
@@ -1616,19 +1589,18 @@ class FormTab(BaseTab):
                 
                 try:
                     import csv
-                    from config.settings import CSV_FIELDS
                     
                     with open(out_path, "w", newline="", encoding="utf-8") as f:
                         writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
                         writer.writeheader()
-                        for r in registros:
+                        for r in iter_registros(campos=CSV_FIELDS):
                             writer.writerow(r)
                     
                     self.show_info("Exportado", f"CSV exportado: {out_path}")
                 except Exception as e:
                     self.show_error("Error", f"No se pudo exportar: {e}")
             else:
-                self.show_info("Cancelado", "Instalá pandas para exportar a Excel:\npip install pandas openpyxl")
+                self.show_info("Cancelado", "Instalá openpyxl para exportar a Excel:\npip install openpyxl")
 
     def _abrir_carpeta_certificados(self):
         """Abre la carpeta de certificados en el explorador."""
@@ -1655,21 +1627,9 @@ class FormTab(BaseTab):
             self.show_warning("Sin selección", "Selecciona un registro de la tabla")
             return
         
-        iid = sel[0]
-        item = self.tree.item(iid)
-        values = item['values']
-        id_corto = values[0]
-        
-        # Buscar registro completo
-        registros = cargar_registros()
-        registro = None
-        for r in registros:
-            if r.get("id", "").startswith(id_corto):
-                registro = r
-                break
-        
+        # Buscar registro completo (ID de id_map o truncado)
+        registro = self._registro_de_item(sel[0])
         if not registro:
-            self.show_error("Error", "No se encontró el registro seleccionado")
             return
         
         # Validar email
@@ -1678,8 +1638,8 @@ class FormTab(BaseTab):
                              f"{registro.get('nombre')} {registro.get('apellido')} no tiene email configurado")
             return
         
-        # Generar PDF
-        ok, result = generar_certificado_pdf(registro)
+        # Generar PDF (las filas seleccionadas del mismo alumno van en un solo certificado)
+        ok, result = generar_certificado_pdf(registro, materias=self._materias_seleccionadas(sel, registro))
         if not ok:
             self.show_error("Error al generar", result)
             return
@@ -1754,6 +1714,7 @@ class FormTab(BaseTab):
                     if ok and isinstance(result, dict):
                         msg = (f"Sincronización incremental completada:\n\n" +
                                f"• Agregados: {result.get('added', 0)}\n" +
+                               f"• Modificados: {result.get('updated', 0)}\n" +
                                f"• Eliminados: {result.get('deleted', 0)}\n" +
                                f"• Sin cambios: {result.get('unchanged', 0)}")
                     else:
@@ -3,7 +3,7 @@ import tkinter as tk
 from tkinter import ttk
 from datetime import datetime
 from ui.base_tab import BaseTab
-from database.csv_handler import obtener_historial_alumno, buscar_por_dni, cargar_registros
+from database.csv_handler import obtener_historial_alumno, iter_registros
 from services.pdf_generator import generar_certificado_pdf
 
 class HistorialTab(BaseTab):
@@ -74,14 +74,13 @@ class HistorialTab(BaseTab):
             self.show_warning("Búsqueda", "Ingresá DNI o nombre para buscar.")
             return
         
-        # Buscar registros
+        # Buscar registros (incluye los ciclos archivados)
         if dni:
-            registros = buscar_por_dni(dni)
+            registros = obtener_historial_alumno(dni)
         else:
             # Buscar por nombre/apellido
-            todos = cargar_registros()
             registros = [
-                r for r in todos
+                r for r in iter_registros(incluir_archivo=True)
                 if nombre in r.get("nombre", "").lower() or nombre in r.get("apellido", "").lower()
             ]
         
@@ -3,8 +3,9 @@ import tkinter as tk
 from tkinter import ttk, filedialog
 from datetime import datetime
 from ui.base_tab import BaseTab
-from database.csv_handler import cargar_registros, exportar_listado
+from database.csv_handler import exportar_listado, iter_registros
 from models.materias import get_todas_materias, get_profesores_materia
+from services import analitica
 import csv
 from pathlib import Path
 
@@ -38,18 +39,9 @@ class ListadosTab(BaseTab):
     
     def _build_filtros(self, parent):
         """Construye sección de filtros."""
-        # Cargar registros para obtener materias/profesores con inscripciones
-        registros = cargar_registros()
-        
-        # Extraer materias únicas que tienen inscripciones
-        materias_con_inscripciones = sorted(set(
-            reg.get("materia", "") for reg in registros if reg.get("materia")
-        ))
-        
-        # Extraer profesores únicos con inscripciones (inicialización)
-        profesores_con_inscripciones = sorted(set(
-            reg.get("profesor", "") for reg in registros if reg.get("profesor")
-        ))
+        # Materias y profesores con inscripciones (valores distintos del snapshot)
+        materias_con_inscripciones = sorted(m for m in analitica.conteos("materia") if m)
+        profesores_con_inscripciones = self._profesores_con_inscripciones()
         
         # Grid layout para filtros
         row = 0
@@ -83,12 +75,6 @@ class ListadosTab(BaseTab):
         self.profesor_combo.grid(row=row, column=1, columnspan=3, sticky="ew", padx=5, pady=5)
         self.profesor_combo.set("(Todos)")
         
-        # Inicializar profesores con todos los que tienen inscripciones
-        profesores_con_inscripciones = sorted(set(
-            reg.get("profesor", "") for reg in registros if reg.get("profesor")
-        ))
-        self.profesor_combo['values'] = ["(Todos)"] + profesores_con_inscripciones
-        
         row += 1
         
         # Botón aplicar filtros
@@ -201,21 +187,17 @@ class ListadosTab(BaseTab):
         
         if materia == "(Todas)":
             # Mostrar todos los profesores con inscripciones
-            registros = cargar_registros()
-            profesores_con_inscripciones = sorted(set(
-                reg.get("profesor", "") for reg in registros if reg.get("profesor")
-            ))
-            self.profesor_combo['values'] = ["(Todos)"] + profesores_con_inscripciones
-            self.filtro_profesor_var.set("(Todos)")
+            profesores_con_inscripciones = self._profesores_con_inscripciones()
         else:
             # Filtrar profesores por materia seleccionada con inscripciones
-            registros = cargar_registros()
-            profesores_con_inscripciones = sorted(set(
-                reg.get("profesor", "") for reg in registros 
-                if reg.get("materia") == materia and reg.get("profesor")
-            ))
-            self.profesor_combo['values'] = ["(Todos)"] + profesores_con_inscripciones
-            self.filtro_profesor_var.set("(Todos)")
+            profesores_con_inscripciones = self._profesores_con_inscripciones(materia)
+        self.profesor_combo['values'] = ["(Todos)"] + profesores_con_inscripciones
+        self.filtro_profesor_var.set("(Todos)")
+    
+    def _profesores_con_inscripciones(self, materia=None):
+        """Profesores distintos con inscripciones (de una materia, si se indica)."""
+        filtros = {"materia": materia} if materia else None
+        return sorted(p for p in analitica.conteos("profesor", filtros) if p)
     
     def _aplicar_filtros(self):
         """Aplica filtros y actualiza tabla."""
@@ -230,7 +212,8 @@ class ListadosTab(BaseTab):
         if profesor and profesor != "(Todos)":
             filtros["profesor"] = profesor
         
-        # Obtener registros filtrados
+        # Obtener registros filtrados (los filtros se reusan al exportar)
+        self._filtros_actuales = filtros
         registros = exportar_listado(filtros)
         self._actualizar_tabla(registros)
     
@@ -239,11 +222,7 @@ class ListadosTab(BaseTab):
         self.filtro_materia_var.set("(Todas)")
         self.filtro_profesor_var.set("(Todos)")
         # Recargar profesores con todas las inscripciones
-        registros = cargar_registros()
-        profesores_con_inscripciones = sorted(set(
-            reg.get("profesor", "") for reg in registros if reg.get("profesor")
-        ))
-        self.profesor_combo['values'] = ["(Todos)"] + profesores_con_inscripciones
+        self.profesor_combo['values'] = ["(Todos)"] + self._profesores_con_inscripciones()
         self._aplicar_filtros()
     
     def _actualizar_tabla(self, registros):
@@ -295,14 +274,17 @@ class ListadosTab(BaseTab):
             return
         
         try:
-            # Guardar CSV
+            # Guardar CSV fila a fila desde el origen
             from config.settings import CSV_FIELDS
+            total = 0
             with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
                 writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
                 writer.writeheader()
-                writer.writerows(self._registros_actuales)
+                for reg in iter_registros(self._filtros_actuales, campos=CSV_FIELDS):
+                    writer.writerow(reg)
+                    total += 1
             
-            self.show_info("Exportar", f"Exportado: {len(self._registros_actuales)} registros\n\n{filename}")
+            self.show_info("Exportar", f"Exportado: {total} registros\n\n{filename}")
         except Exception as e:
             self.show_error("Error", f"No se pudo exportar: {e}")
     
@@ -334,37 +316,34 @@ class ListadosTab(BaseTab):
             return
         
         try:
-            # Crear workbook
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Inscripciones"
+            from config.settings import CSV_FIELDS
+            from openpyxl.utils import get_column_letter
+            
+            # Primera pasada: anchos de columna (sin guardar filas)
+            anchos = [len(field) for field in CSV_FIELDS]
+            for reg in iter_registros(self._filtros_actuales, campos=CSV_FIELDS):
+                for i, field in enumerate(CSV_FIELDS):
+                    anchos[i] = max(anchos[i], len(str(reg[field])))
+            
+            # Workbook en modo write_only: las filas se escriben sin quedar en memoria
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet("Inscripciones")
+            for i, ancho in enumerate(anchos, 1):
+                ws.column_dimensions[get_column_letter(i)].width = min(ancho + 2, 50)
             
             # Headers
-            from config.settings import CSV_FIELDS
             ws.append(CSV_FIELDS)
             
             # Datos
-            for reg in self._registros_actuales:
-                row = [reg.get(field, "") for field in CSV_FIELDS]
-                ws.append(row)
-            
-            # Ajustar anchos
-            for col in ws.columns:
-                max_length = 0
-                column = col[0].column_letter
-                for cell in col:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(cell.value)
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column].width = adjusted_width
+            total = 0
+            for reg in iter_registros(self._filtros_actuales, campos=CSV_FIELDS):
+                ws.append([reg[field] for field in CSV_FIELDS])
+                total += 1
             
             # Guardar
             wb.save(filename)
             
-            self.show_info("Exportar", f"Exportado: {len(self._registros_actuales)} registros\n\n{filename}")
+            self.show_info("Exportar", f"Exportado: {total} registros\n\n{filename}")
         except Exception as e:
             self.show_error("Error", f"No se pudo exportar: {e}")
     
@@ -411,30 +390,13 @@ class ListadosTab(BaseTab):
             self.show_warning("Estadísticas", "Primero aplicá filtros.")
             return
         
-        # Calcular estadísticas
-        total = len(self._registros_actuales)
-        
-        materias = {}
-        profesores = {}
-        turnos = {}
-        anios = {}
-        
-        for reg in self._registros_actuales:
-            # Por materia
-            mat = reg.get("materia", "N/A")
-            materias[mat] = materias.get(mat, 0) + 1
-            
-            # Por profesor
-            prof = reg.get("profesor", "N/A")
-            profesores[prof] = profesores.get(prof, 0) + 1
-            
-            # Por turno
-            turno = reg.get("turno", "N/A")
-            turnos[turno] = turnos.get(turno, 0) + 1
-            
-            # Por año
-            anio = reg.get("anio", "N/A")
-            anios[anio] = anios.get(anio, 0) + 1
+        # Calcular estadísticas (agrupados sobre el snapshot columnar, services/analitica.py)
+        stats = analitica.estadisticas(getattr(self, "_filtros_actuales", None))
+        total = stats["total"]
+        materias = stats["materia"]
+        profesores = stats["profesor"]
+        turnos = stats["turno"]
+        anios = stats["anio"]
         
         # Ventana de estadísticas
         stats_window = tk.Toplevel(self.frame)